@@ -0,0 +1,134 @@
+"""
+PicSort - 振り分けルールの診断
+最初に一致したルールが使われるため、先に並ぶルールの条件を含むルールは一致することがありません。
+こうした隠れているルール・重複しているルールを全パターンのオートマトンでまとめて検出し、
+実行履歴のルールごとの移動数から、長い間一度も一致していないルールも見つけます。
+不要なルールは最後に1回だけ設定を保存して削除します。
+"""
+
+import json
+import os
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from organizer import Config
+from matcher import RuleMatcher, normalize_text
+
+# 一致していないルールを調べる実行履歴の回数
+DEFAULT_HISTORY_RUNS = 100
+
+# 診断の種類 → 表示名
+KIND_LABELS = {
+    "duplicate": "重複",
+    "shadowed": "隠れている",
+    "never_hit": "一致なし",
+}
+
+
+def _conditions_key(mapping: Dict[str, Any]) -> str:
+    """追加条件の比較用キー（条件がなければ空文字）"""
+    conditions = mapping.get("conditions")
+    return json.dumps(conditions, sort_keys=True) if conditions else ""
+
+
+def find_dead_rules(mappings: List[Dict[str, Any]], normalize: bool = False) -> List[Dict[str, Any]]:
+    """
+    先に並ぶルールのために一致することがないルールを探す
+
+    追加条件ごとにパターンのオートマトンを作り、各パターン自身を通して、自分より前に
+    「条件のないルール」または「同じ追加条件のルール」が見つかれば一致しないと判定します。
+    パターンの長さの合計にほぼ比例した時間で判定できます。
+
+    Returns:
+        {"index", "pattern", "kind"（duplicate / shadowed）, "by"（先に一致するルールの条件）} のリスト
+    """
+    groups: Dict[str, List[int]] = {}
+    for index, mapping in enumerate(mappings):
+        groups.setdefault(_conditions_key(mapping), []).append(index)
+    matchers = {
+        key: RuleMatcher([{"pattern": mappings[index]["pattern"]} for index in indices], normalize=normalize)
+        for key, indices in groups.items()
+    }
+
+    def same(a: str, b: str) -> bool:
+        return normalize_text(a) == normalize_text(b) if normalize else a == b
+
+    dead = []
+    for index, mapping in enumerate(mappings):
+        first = None
+        for key in {"", _conditions_key(mapping)}:
+            if key not in groups:
+                continue
+            found = matchers[key].match_index(mapping["pattern"])
+            if found is not None and groups[key][found] < index:
+                candidate = groups[key][found]
+                first = candidate if first is None else min(first, candidate)
+        if first is not None:
+            by_pattern = mappings[first]["pattern"]
+            dead.append({"index": index, "pattern": mapping["pattern"],
+                         "kind": "duplicate" if same(mapping["pattern"], by_pattern) else "shadowed",
+                         "by": by_pattern})
+    return dead
+
+
+def load_rule_hits(config: Config, max_runs: int = DEFAULT_HISTORY_RUNS) -> Tuple[Dict[str, int], int]:
+    """
+    実行履歴からルールの条件ごとの移動数を合計
+
+    Returns:
+        (条件 → 移動数, 合計した実行回数)。実行履歴がない場合は ({}, 0)
+    """
+    from history import RunHistory, HISTORY_FILE
+
+    path = config.get_state_path(HISTORY_FILE)
+    if not config.get_history_settings()["enabled"] or not os.path.exists(path):
+        return {}, 0
+    hits: Dict[str, int] = {}
+    with RunHistory(path) as history:
+        runs = history.recent(max_runs)
+    for run in runs:
+        for pattern, count in run["rule_hits"].items():
+            hits[pattern] = hits.get(pattern, 0) + count
+    return hits, len(runs)
+
+
+def analyze_rules(mappings: List[Dict[str, Any]], normalize: bool = False,
+                  hits: Optional[Dict[str, int]] = None, runs: int = 0) -> List[Dict[str, Any]]:
+    """
+    振り分けルールを診断
+
+    Args:
+        mappings: 振り分けルール
+        normalize: True なら NFKC 正規化 + 大文字小文字を無視して比較する
+        hits: 条件ごとの移動数（load_rule_hits の結果）
+        runs: hits を合計した実行回数（0 なら一致なしの判定はしない）
+
+    Returns:
+        ルールの並び順の診断結果。一致なし（never_hit）の "by" は None
+    """
+    results = find_dead_rules(mappings, normalize)
+    if hits is not None and runs:
+        dead = {result["index"] for result in results}
+        results.extend(
+            {"index": index, "pattern": mapping["pattern"], "kind": "never_hit", "by": None}
+            for index, mapping in enumerate(mappings)
+            if index not in dead and not hits.get(mapping["pattern"])
+        )
+        results.sort(key=lambda result: result["index"])
+    return results
+
+
+def prune_rules(config: Config, indices: Iterable[int]) -> int:
+    """
+    指定したインデックスのルールをまとめて削除（設定の保存は1回だけ）
+
+    Returns:
+        削除したルール数
+    """
+    remove = set(indices)
+    mappings = config.get_mappings()
+    kept = [mapping for index, mapping in enumerate(mappings) if index not in remove]
+    removed = len(mappings) - len(kept)
+    if removed:
+        config.data["mappings"] = kept
+        config.save()
+    return removed
@@ -0,0 +1,153 @@
+"""
+PicSort - ZIP アーカイブ内の画像の振り分け
+アーカイブを一時フォルダに展開せず、ルールに一致した画像だけを zipfile から
+振り分け先へ直接書き出します。メンバー数の多いアーカイブは複数スレッドで並行して書き出します
+（zlib の展開中は GIL が解放されるため、スレッドでも並列に処理できます）。
+"""
+
+import os
+import time
+import shutil
+import zipfile
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+# 振り分け対象のアーカイブの拡張子
+ARCHIVE_EXTENSIONS = (".zip",)
+
+# この数以上のメンバーを書き出す場合にスレッドを使う
+PARALLEL_THRESHOLD = 32
+
+# 書き出し時のバッファサイズ
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# ZIP の UTF-8 ファイル名フラグ
+_UTF8_FLAG = 0x800
+
+
+def member_filename(info: zipfile.ZipInfo) -> str:
+    """
+    メンバーのファイル名（フォルダ部分を除く）を返す
+
+    UTF-8 フラグのない ZIP（日本語版 Windows で作成したものなど）は cp437 として
+    読まれて文字化けするため、cp932 で読み直します。
+    """
+    name = info.filename
+    if not info.flag_bits & _UTF8_FLAG:
+        try:
+            name = name.encode("cp437").decode("cp932")
+        except (UnicodeEncodeError, UnicodeDecodeError):
+            pass
+    return posixpath.basename(name.replace("\\", "/"))
+
+
+def member_mtime(info: zipfile.ZipInfo) -> float:
+    """メンバーの更新日時（ZIP に記録された日時）を返す"""
+    try:
+        return time.mktime(info.date_time + (0, 0, -1))
+    except (OverflowError, ValueError):
+        return time.time()
+
+
+def _create_unique(folder: str, filename: str) -> Tuple[str, object]:
+    """
+    同名ファイルがあれば番号を付けて、振り分け先に新しいファイルを作成
+
+    排他的に作成するため、複数のスレッドが同じ名前を選ぶことはありません。
+
+    Returns:
+        (作成したファイルのパス, 書き込み用に開いたファイル)
+    """
+    base, ext = os.path.splitext(filename)
+    path = os.path.join(folder, filename)
+    counter = 1
+    while True:
+        try:
+            return path, open(path, "xb")
+        except FileExistsError:
+            path = os.path.join(folder, f"{base}_{counter}{ext}")
+            counter += 1
+
+
+def _extract_to(zf: zipfile.ZipFile, info: zipfile.ZipInfo, filename: str, folder: str) -> str:
+    """メンバーを1つ振り分け先へ書き出し、作成したファイルのパスを返す"""
+    os.makedirs(folder, exist_ok=True)
+    path, dst = _create_unique(folder, filename)
+    try:
+        with dst, zf.open(info) as src:
+            shutil.copyfileobj(src, dst, COPY_BUFFER_SIZE)
+    except BaseException:
+        os.remove(path)
+        raise
+    mtime = member_mtime(info)
+    os.utime(path, (mtime, mtime))
+    return path
+
+
+# 書き出し結果: (メンバーのファイル名, 作成したファイルのパス, エラー)
+ExtractResult = Tuple[str, Optional[str], Optional[BaseException]]
+
+
+def _extract_batch(archive_path: str, jobs: List[Tuple[zipfile.ZipInfo, str, str]]) -> List[ExtractResult]:
+    """アーカイブを1回開き、割り当てられたメンバーを順に書き出す"""
+    results: List[ExtractResult] = []
+    with zipfile.ZipFile(archive_path) as zf:
+        for info, filename, folder in jobs:
+            try:
+                results.append((filename, _extract_to(zf, info, filename, folder), None))
+            except Exception as e:
+                results.append((filename, None, e))
+    return results
+
+
+def extract_matching(archive_path: str, extensions: Tuple[str, ...],
+                     assign: Callable[[str, float], Optional[str]],
+                     workers: int = 4) -> Tuple[int, List[ExtractResult]]:
+    """
+    アーカイブ内の画像のうち、振り分け先が決まったものを書き出す
+
+    Args:
+        archive_path: ZIP ファイルのパス
+        extensions: 対象とする画像の拡張子（小文字、ドット付き）
+        assign: (メンバーのファイル名, 更新日時) から振り分け先フォルダを返す関数
+                （振り分けない場合は None）
+        workers: 書き出しに使うスレッド数
+
+    Returns:
+        (アーカイブ内の画像の数, 書き出し結果のリスト)
+
+    Raises:
+        zipfile.BadZipFile: ZIP として読めない場合
+    """
+    jobs = []
+    images = 0
+    with zipfile.ZipFile(archive_path) as zf:
+        for info in zf.infolist():
+            # フォルダと暗号化されたメンバーは対象外
+            if info.is_dir() or info.flag_bits & 0x1:
+                continue
+            filename = member_filename(info)
+            if not filename.lower().endswith(extensions):
+                continue
+            images += 1
+            folder = assign(filename, member_mtime(info))
+            if folder is not None:
+                jobs.append((info, filename, folder))
+
+        if len(jobs) < PARALLEL_THRESHOLD or workers <= 1:
+            results = []
+            for info, filename, folder in jobs:
+                try:
+                    results.append((filename, _extract_to(zf, info, filename, folder), None))
+                except Exception as e:
+                    results.append((filename, None, e))
+            return images, results
+
+    # スレッドごとにアーカイブを開き直し、メンバーを分担して書き出す
+    batches = [jobs[i::workers] for i in range(workers)]
+    results = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="picsort-zip") as pool:
+        for batch_results in pool.map(lambda batch: _extract_batch(archive_path, batch), batches):
+            results.extend(batch_results)
+    return images, results
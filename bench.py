@@ -0,0 +1,177 @@
+"""
+PicSort - ベンチマークツール
+大量のダミーファイルを生成して振り分け処理の性能を計測し、
+README に記載した上限値を満たしているかを確認します。
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+
+from organizer import Config, FileOrganizer
+
+# メモリ節約モードのピークRSS上限（MB）。README の記載と合わせること
+BOUNDED_MEMORY_CEILING_MB = 64
+# CLI の起動から最初の走査完了までのうち、Python 本体の起動を除いた分の予算（ミリ秒）。
+# 計測値は空き状態で約 24 ms、負荷のある状態で約 38 ms。README の記載と合わせること
+STARTUP_BUDGET_MS = 40
+
+
+def peak_rss_mb() -> float:
+    """プロセスのピークRSS（MB）を取得"""
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [
+                ("cb", wintypes.DWORD),
+                ("PageFaultCount", wintypes.DWORD),
+                ("PeakWorkingSetSize", ctypes.c_size_t),
+                ("WorkingSetSize", ctypes.c_size_t),
+                ("QuotaPeakPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                ("PagefileUsage", ctypes.c_size_t),
+                ("PeakPagefileUsage", ctypes.c_size_t),
+            ]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        handle = ctypes.windll.kernel32.GetCurrentProcess()
+        ctypes.windll.psapi.GetProcessMemoryInfo(handle, ctypes.byref(counters), counters.cb)
+        return counters.PeakWorkingSetSize / (1024 * 1024)
+
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS はバイト、Linux は KB 単位
+    if sys.platform == "darwin":
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+
+def create_dummy_files(folder: str, count: int, patterns: int):
+    """ダミーファイルを生成（約半数がいずれかのルールにマッチする）"""
+    for i in range(count):
+        if i % 2 == 0:
+            name = f"artist{i % patterns}_{i}.png"
+        else:
+            name = f"unmatched_{i}.png"
+        open(os.path.join(folder, name), "wb").close()
+
+
+def _busy_move(source_path: str, destination_path: str):
+    """すべてのファイルが他のアプリで使用中の場合の移動（一時的なエラーを送出）"""
+    import errno
+    raise OSError(errno.EBUSY, "使用中", source_path)
+
+
+def bench_memory(args) -> bool:
+    """メモリ節約モードのピークRSSを計測"""
+    work_dir = tempfile.mkdtemp(prefix="picsort_bench_")
+    try:
+        source = os.path.join(work_dir, "source")
+        os.makedirs(source)
+        print(f"ダミーファイルを生成中: {args.files} 件")
+        create_dummy_files(source, args.files, args.rules)
+
+        config_path = os.path.join(work_dir, "config.json")
+        with open(config_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "source_folder": source,
+                "bounded_memory": True,
+                "history": {"enabled": False},
+                # --busy では待たずに再試行を使い切り、次回の実行への持ち越しを計測する
+                "retry": {"base_delay": 0, "max_delay": 0},
+                "mappings": [
+                    {"pattern": f"artist{i}_", "destination": os.path.join(work_dir, f"dest{i}")}
+                    for i in range(args.rules)
+                ]
+            }, f)
+
+        organizer = FileOrganizer(Config(config_path), lambda message: None)
+        if args.busy:
+            organizer.move_func = _busy_move
+        start = time.perf_counter()
+        stats = organizer.organize()
+        elapsed = time.perf_counter() - start
+        peak = peak_rss_mb()
+
+        print(f"対象ファイル数: {stats['total_files']}, 移動: {stats['moved_files']}, エラー: {stats['errors']}")
+        if args.busy:
+            with open(organizer.config.get_state_path("retry.jsonl"), 'r', encoding='utf-8') as f:
+                print(f"次回に持ち越した再試行: {sum(1 for _ in f)} 件")
+        print(f"処理時間: {elapsed:.2f} 秒 ({stats['total_files'] / max(elapsed, 1e-9):.0f} ファイル/秒)")
+        print(f"ピークRSS: {peak:.1f} MB (上限: {BOUNDED_MEMORY_CEILING_MB} MB)")
+        return peak <= BOUNDED_MEMORY_CEILING_MB
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def bench_startup(args) -> bool:
+    """CLI のコールドスタート時間（起動から空フォルダの走査完了まで）を計測"""
+    import subprocess
+    import statistics
+
+    work_dir = tempfile.mkdtemp(prefix="picsort_bench_")
+    try:
+        source = os.path.join(work_dir, "source")
+        os.makedirs(source)
+        config_path = os.path.join(work_dir, "config.json")
+        with open(config_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "source_folder": source,
+                "mappings": [{"pattern": "artist_", "destination": os.path.join(work_dir, "dest")}]
+            }, f)
+
+        cli_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "picsort.py")
+        command = [sys.executable, cli_path, "plan", "--quiet", "--config", config_path]
+        # Python 本体の起動時間（PicSort では短くできない分）も交互に計測する
+        bare = [sys.executable, "-c", "pass"]
+        timings = []
+        bare_timings = []
+        for _ in range(args.runs):
+            for target, results in ((command, timings), (bare, bare_timings)):
+                start = time.perf_counter()
+                subprocess.run(target, check=True, stdout=subprocess.DEVNULL)
+                results.append((time.perf_counter() - start) * 1000)
+
+        # 交互に計測した組ごとの差を取り、マシンの速さや負荷の影響を除く
+        overhead = statistics.median(cli - bare_ms for cli, bare_ms in zip(timings, bare_timings))
+        print(f"起動時間: 中央値 {statistics.median(timings):.1f} ms, 最小 {min(timings):.1f} ms "
+              f"(Python 本体の起動: 中央値 {statistics.median(bare_timings):.1f} ms, {args.runs} 回)")
+        print(f"PicSort 自体の起動: 中央値 {overhead:.1f} ms (予算: {STARTUP_BUDGET_MS} ms)")
+        return overhead <= STARTUP_BUDGET_MS
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def main():
+    """メイン関数"""
+    parser = argparse.ArgumentParser(description="PicSort ベンチマーク")
+    subparsers = parser.add_subparsers(dest="bench", required=True)
+
+    memory = subparsers.add_parser("memory", help="メモリ節約モードのピークRSSを計測")
+    memory.add_argument("--files", type=int, default=200000, help="生成するファイル数")
+    memory.add_argument("--rules", type=int, default=50, help="振り分けルール数")
+    memory.add_argument("--busy", action="store_true",
+                        help="マッチしたファイルをすべて使用中として扱い、再試行の持ち越しを含めて計測")
+    memory.set_defaults(func=bench_memory)
+
+    startup = subparsers.add_parser("startup", help="CLI の起動時間を計測")
+    startup.add_argument("--runs", type=int, default=20, help="計測回数")
+    startup.set_defaults(func=bench_startup)
+
+    args = parser.parse_args()
+    ok = args.func(args)
+    print("OK" if ok else "NG: 上限を超えました")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+PicSort - 振り分けたファイルのカタログ（SQLite）
+移動したファイルごとに元のファイル名・移動先・サイズ・更新日時・ルール・実行ID・ハッシュを記録し、
+「このファイルはどこへ行ったか」「ルールごとのファイル数」「ハッシュが同じファイル」を
+インデックスを使って即座に検索できるようにします。
+書き込みはまとめて1つのトランザクションで行います。
+"""
+
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# カタログのファイル名（設定ファイルと同じフォルダに保存）
+CATALOG_FILE = "catalog.db"
+
+# この件数たまったらまとめて書き込む
+CATALOG_BATCH_SIZE = 1000
+
+# 検索結果の既定の上限
+DEFAULT_LIMIT = 100
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    rule TEXT,
+    run_id TEXT NOT NULL,
+    hash TEXT
+);
+CREATE INDEX IF NOT EXISTS files_name ON files (name);
+CREATE INDEX IF NOT EXISTS files_path ON files (path);
+CREATE INDEX IF NOT EXISTS files_run ON files (run_id);
+CREATE INDEX IF NOT EXISTS files_hash ON files (hash) WHERE hash IS NOT NULL;
+-- ルールごとの集計（全件を数え直さずに済むよう書き込み時に更新）
+CREATE TABLE IF NOT EXISTS rule_stats (
+    rule TEXT PRIMARY KEY,
+    files INTEGER NOT NULL,
+    bytes INTEGER NOT NULL
+);
+"""
+
+_COLUMNS = ("name", "path", "size", "mtime", "rule", "run_id", "hash")
+
+
+class Catalog:
+    """振り分けたファイルのカタログ"""
+
+    def __init__(self, path: str):
+        """
+        初期化
+
+        Args:
+            path: データベースファイルのパス（なければ作成）
+        """
+        self.path = path
+        # 非同期版の振り分けでは executor のスレッドから追記されるため、ロックで保護して共有する
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        self._pending: List[Tuple[Any, ...]] = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def add(self, name: str, path: str, size: int, mtime: float, rule: Optional[str],
+            run_id: str, digest: Optional[str] = None):
+        """移動したファイルを1件追加（CATALOG_BATCH_SIZE 件ごとにまとめて書き込む）"""
+        with self._lock:
+            self._pending.append((name, path, size, mtime, rule, run_id, digest))
+            if len(self._pending) >= CATALOG_BATCH_SIZE:
+                self._flush_locked()
+
+    def flush(self):
+        """未書き込みの行を書き込む"""
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        """未書き込みの行を1つのトランザクションで書き込む（ロック取得済みで呼ぶ）"""
+        if not self._pending:
+            return
+        rows = self._pending
+        self._pending = []
+        totals: Dict[str, List[int]] = {}
+        for row in rows:
+            total = totals.setdefault(row[4] or "", [0, 0])
+            total[0] += 1
+            total[1] += row[2]
+        with self._conn:
+            self._conn.executemany(
+                f"INSERT INTO files ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})", rows
+            )
+            self._add_rule_stats(totals)
+
+    def _add_rule_stats(self, totals: Dict[str, List[int]]):
+        """ルールごとの集計に加算（負の値で減算）"""
+        self._conn.executemany("INSERT OR IGNORE INTO rule_stats (rule, files, bytes) VALUES (?, 0, 0)",
+                               [(rule,) for rule in totals])
+        self._conn.executemany("UPDATE rule_stats SET files = files + ?, bytes = bytes + ? WHERE rule = ?",
+                               [(files, size, rule) for rule, (files, size) in totals.items()])
+
+    def remove_paths(self, paths: Iterable[str]) -> int:
+        """
+        移動先のパスに一致する行を削除（取り消しで元に戻したファイル）
+
+        Returns:
+            削除した行数
+        """
+        with self._lock:
+            self._flush_locked()
+            removed = 0
+            totals: Dict[str, List[int]] = {}
+            with self._conn:
+                for path in paths:
+                    for row_id, rule, size in self._conn.execute(
+                        "SELECT id, rule, size FROM files WHERE path = ?", (path,)
+                    ).fetchall():
+                        self._conn.execute("DELETE FROM files WHERE id = ?", (row_id,))
+                        total = totals.setdefault(rule or "", [0, 0])
+                        total[0] -= 1
+                        total[1] -= size
+                        removed += 1
+                self._add_rule_stats(totals)
+            return removed
+
+    def close(self):
+        """未書き込みの行を書き込んで閉じる"""
+        if self._conn is not None:
+            self.flush()
+            self._conn.close()
+            self._conn = None
+
+    def find(self, name: str, limit: int = DEFAULT_LIMIT) -> List[Dict[str, Any]]:
+        """
+        ファイル名で検索（完全一致または前方一致）
+
+        前方一致はインデックスの範囲検索で行うため、行数が多くても即座に返ります。
+
+        Returns:
+            新しい順の行のリスト
+        """
+        cursor = self._conn.execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM files WHERE name >= ? AND name < ? "
+            "ORDER BY id DESC LIMIT ?",
+            (name, name + "\U0010ffff", limit)
+        )
+        return [dict(zip(_COLUMNS, row)) for row in cursor]
+
+    def rule_stats(self) -> List[Dict[str, Any]]:
+        """ルールごとのファイル数と合計サイズ（ファイル数の多い順）"""
+        cursor = self._conn.execute(
+            "SELECT rule, files, bytes FROM rule_stats WHERE files > 0 ORDER BY files DESC, rule"
+        )
+        return [{"rule": rule or None, "files": files, "bytes": size} for rule, files, size in cursor]
+
+    def duplicates(self, limit: int = DEFAULT_LIMIT) -> List[Dict[str, Any]]:
+        """
+        ハッシュが同じファイルのグループ（ハッシュを記録した行のみ）
+
+        Returns:
+            {"hash", "count", "paths"} のリスト（件数の多い順）
+        """
+        groups = self._conn.execute(
+            "SELECT hash, COUNT(*) AS n FROM files WHERE hash IS NOT NULL "
+            "GROUP BY hash HAVING n > 1 ORDER BY n DESC LIMIT ?", (limit,)
+        ).fetchall()
+        return [
+            {"hash": digest, "count": count,
+             "paths": [row[0] for row in self._conn.execute("SELECT path FROM files WHERE hash = ?", (digest,))]}
+            for digest, count in groups
+        ]
+
+    def summary(self) -> Dict[str, int]:
+        """カタログ全体のファイル数と合計サイズ"""
+        files, size = self._conn.execute(
+            "SELECT COALESCE(SUM(files), 0), COALESCE(SUM(bytes), 0) FROM rule_stats"
+        ).fetchone()
+        return {"files": files, "bytes": size}
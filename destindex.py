@@ -0,0 +1,323 @@
+"""
+PicSort - 振り分け先フォルダの索引（SQLite）
+振り分け先フォルダにあるファイルの名前・サイズ・更新日時を保存しておき、
+フォルダの更新日時が変わったフォルダだけを読み直します（読み直しは複数スレッドで並行して行う）。
+同名ファイルの確認や「振り分け済み」の判定を、大きなフォルダを毎回走査せずにメモリ上で行えます。
+"""
+
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, Optional, Set, Tuple
+
+# 索引のファイル名（設定ファイルと同じフォルダに保存）
+DESTINATION_INDEX_FILE = "destination_index.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS folders (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    folder TEXT NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    PRIMARY KEY (folder, name)
+) WITHOUT ROWID;
+"""
+
+# フォルダ内のファイル: 比較用の名前（Windows では小文字） → (サイズ, 更新日時（ナノ秒）)
+Entries = Dict[str, Tuple[int, int]]
+
+
+def _folder_key(folder: str) -> str:
+    """フォルダの比較用キー"""
+    return os.path.normcase(os.path.abspath(folder))
+
+
+def scan_folder(folder: str) -> Optional[Tuple[int, Entries]]:
+    """
+    フォルダを走査
+
+    Returns:
+        (フォルダの更新日時, ファイル一覧)。フォルダがない場合は None。
+        走査中にフォルダが変更された場合、更新日時は 0（次回は必ず読み直す）
+    """
+    try:
+        before = os.stat(folder).st_mtime_ns
+        entries: Entries = {}
+        with os.scandir(folder) as it:
+            for entry in it:
+                try:
+                    if entry.is_file():
+                        st = entry.stat()
+                        entries[os.path.normcase(entry.name)] = (st.st_size, st.st_mtime_ns)
+                except OSError:
+                    continue
+        after = os.stat(folder).st_mtime_ns
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    return (before if before == after else 0), entries
+
+
+class DestinationIndex:
+    """振り分け先フォルダの索引（実行ごとに1回開く）"""
+
+    def __init__(self, path: str, max_workers: int = 8):
+        """
+        初期化
+
+        Args:
+            path: データベースファイルのパス（なければ作成）
+            max_workers: フォルダの読み直しに使うスレッド数
+        """
+        self.path = path
+        self.max_workers = max_workers
+        # 非同期版の振り分けでは executor のスレッドから参照されるため、ロックで保護して共有する
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.RLock()
+        # フォルダのキー → 保存済みの更新日時
+        self._stored: Dict[str, int] = dict(self._conn.execute("SELECT path, mtime_ns FROM folders"))
+        # メモリ上に読み込んだフォルダ（None はフォルダがない）
+        self._folders: Dict[str, Optional[Entries]] = {}
+        # 読み直したフォルダ（保存時に全件を書き直す） → 走査時の更新日時
+        self._scanned: Dict[str, int] = {}
+        # 今回の実行で追加したファイル（保存時に追記する）
+        self._added: Dict[str, Set[str]] = {}
+        # 読み直しが必要になったフォルダ
+        self._invalid: Set[str] = set()
+        # 索引に反映済みの変更（走査・今回の移動）の後のフォルダの更新日時
+        self._expected: Dict[str, int] = {}
+        # 予約してから update() / release() されていないファイル（変更中のフォルダは更新日時を確認しない）
+        self._pending: Dict[str, Set[str]] = {}
+        # 索引の外で変更されたフォルダ（次回の実行で読み直す）
+        self._stale: Set[str] = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """変更を保存して閉じる"""
+        if self._conn is not None:
+            try:
+                self.save()
+            finally:
+                self._conn.close()
+                self._conn = None
+
+    def refresh(self, folders: Iterable[str] = ()) -> int:
+        """
+        更新日時が変わったフォルダを並行して読み直す
+
+        Args:
+            folders: 索引にまだないフォルダも含めて確認するフォルダ（索引にあるフォルダは常に確認する）
+
+        Returns:
+            読み直したフォルダの数
+        """
+        keys = set(self._stored)
+        keys.update(_folder_key(folder) for folder in folders)
+        keys.difference_update(self._folders)
+
+        def check(key: str) -> Optional[Tuple[str, Optional[Tuple[int, Entries]]]]:
+            try:
+                mtime_ns = os.stat(key).st_mtime_ns
+            except OSError:
+                return key, None
+            if mtime_ns == self._stored.get(key):
+                return None
+            return key, scan_folder(key)
+
+        rescanned = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="picsort-index") as pool:
+            for result in pool.map(check, sorted(keys)):
+                if result is None:
+                    continue
+                key, scanned = result
+                with self._lock:
+                    self._apply_scan(key, scanned)
+                rescanned += 1
+        return rescanned
+
+    def _apply_scan(self, key: str, scanned: Optional[Tuple[int, Entries]]):
+        """走査結果をメモリ上の索引に反映"""
+        if scanned is None:
+            self._folders[key] = None
+            self._scanned[key] = 0
+            self._expected.pop(key, None)
+        else:
+            self._scanned[key], self._folders[key] = scanned
+            self._expected[key] = self._scanned[key]
+        self._added.pop(key, None)
+        self._stale.discard(key)
+
+    def _entries(self, key: str) -> Optional[Entries]:
+        """フォルダのファイル一覧（初回は保存済みの索引から読み込み、変わっていれば走査する）"""
+        if key in self._folders:
+            return self._folders[key]
+        stored = self._stored.get(key)
+        try:
+            current = os.stat(key).st_mtime_ns
+        except OSError:
+            current = None
+        if current is not None and current == stored:
+            rows = self._conn.execute("SELECT name, size, mtime_ns FROM entries WHERE folder = ?", (key,))
+            entries = self._folders[key] = {name: (size, mtime_ns) for name, size, mtime_ns in rows}
+            self._expected[key] = current
+            return entries
+        self._apply_scan(key, scan_folder(key) if current is not None else None)
+        return self._folders[key]
+
+    def has_folder(self, folder: str) -> bool:
+        """フォルダが存在するかどうか"""
+        with self._lock:
+            return self._entries(_folder_key(folder)) is not None
+
+    def lookup(self, folder: str, filename: str) -> Optional[Tuple[int, int]]:
+        """フォルダ内のファイルの (サイズ, 更新日時)（ない場合は None）"""
+        with self._lock:
+            entries = self._entries(_folder_key(folder))
+            return entries.get(os.path.normcase(filename)) if entries is not None else None
+
+    def reserve(self, folder: str, filename: str) -> str:
+        """
+        フォルダ内で使われていないファイル名を決めて予約（同名があれば _1, _2 … を付ける）
+
+        予約した名前は移動に成功したら update()、失敗したら release() する。
+        """
+        with self._lock:
+            key = _folder_key(folder)
+            entries = self._entries(key)
+            if entries is None:
+                # 移動先フォルダは呼び出し側で作成済み
+                entries = self._folders[key] = {}
+                self._scanned[key] = 0
+                self._expected[key] = self._folder_mtime(key)
+            name = filename
+            if os.path.normcase(name) in entries:
+                base, ext = os.path.splitext(filename)
+                counter = 1
+                while os.path.normcase(name) in entries:
+                    name = f"{base}_{counter}{ext}"
+                    counter += 1
+            entries[os.path.normcase(name)] = (-1, -1)
+            self._added.setdefault(key, set()).add(os.path.normcase(name))
+            self._begin_change(key, os.path.normcase(name))
+            return name
+
+    def expect(self, path: str):
+        """
+        索引の外で行う自分の変更（再圧縮など）を予告
+
+        完了したら settle() する。予告した変更は、他のプロセスによる変更とみなさない。
+        """
+        folder, name = os.path.split(path)
+        with self._lock:
+            self._begin_change(_folder_key(folder), os.path.normcase(name))
+
+    def settle(self, path: str):
+        """予約・予告した変更が終わったことを記録"""
+        folder, name = os.path.split(path)
+        with self._lock:
+            self._end_change(_folder_key(folder), os.path.normcase(name))
+
+    def _begin_change(self, key: str, name: str):
+        """変更を始める前に、前回の変更の後で他のプロセスがフォルダを変更していないか確認"""
+        pending = self._pending.setdefault(key, set())
+        if not pending and key not in self._stale and self._folder_mtime(key) != self._expected.get(key):
+            self._stale.add(key)
+        pending.add(name)
+
+    def _end_change(self, key: str, name: str):
+        """変更後のフォルダの更新日時を、索引に反映済みのものとして記録"""
+        pending = self._pending.get(key)
+        if pending is not None:
+            pending.discard(name)
+        self._expected[key] = self._folder_mtime(key)
+
+    @staticmethod
+    def _folder_mtime(key: str) -> int:
+        """フォルダの更新日時（ない場合は 0）"""
+        try:
+            return os.stat(key).st_mtime_ns
+        except OSError:
+            return 0
+
+    def update(self, path: str, size: int, mtime_ns: int):
+        """移動したファイルのサイズと更新日時を記録"""
+        folder, name = os.path.split(path)
+        with self._lock:
+            key = _folder_key(folder)
+            entries = self._entries(key)
+            if entries is not None:
+                entries[os.path.normcase(name)] = (size, mtime_ns)
+                self._added.setdefault(key, set()).add(os.path.normcase(name))
+            self._end_change(key, os.path.normcase(name))
+
+    def release(self, path: str):
+        """移動できなかったファイルの予約を取り消す"""
+        folder, name = os.path.split(path)
+        with self._lock:
+            key = _folder_key(folder)
+            entries = self._folders.get(key)
+            if entries is not None:
+                entries.pop(os.path.normcase(name), None)
+                self._added.get(key, set()).discard(os.path.normcase(name))
+            self._end_change(key, os.path.normcase(name))
+
+    def invalidate(self, folder: str):
+        """索引を使わずに変更したフォルダを、次に参照するときに読み直す"""
+        with self._lock:
+            key = _folder_key(folder)
+            self._folders.pop(key, None)
+            self._scanned.pop(key, None)
+            self._added.pop(key, None)
+            self._stored.pop(key, None)
+            self._pending.pop(key, None)
+            self._invalid.add(key)
+
+    def save(self):
+        """読み直したフォルダと追加したファイルを1つのトランザクションで保存"""
+        with self._lock:
+            dirty = set(self._scanned) | set(self._added) | self._invalid
+            if not dirty:
+                return
+            with self._conn:
+                for key in sorted(dirty):
+                    entries = self._folders.get(key)
+                    if entries is None or key in self._scanned:
+                        self._conn.execute("DELETE FROM entries WHERE folder = ?", (key,))
+                    if entries is None:
+                        # フォルダがない・読み直しが必要
+                        self._conn.execute("DELETE FROM folders WHERE path = ?", (key,))
+                        self._stored.pop(key, None)
+                        continue
+                    names = entries if key in self._scanned else self._added[key]
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO entries (folder, name, size, mtime_ns) VALUES (?, ?, ?, ?)",
+                        [(key, name) + entries[name] for name in names
+                         if name in entries and entries[name][0] >= 0]
+                    )
+                    if key in self._added:
+                        # 今回の移動で変わった更新日時を保存する。索引の外で変更された場合は
+                        # （他のプロセスが追加したファイルを見落とさないよう）0 を保存して次回に読み直す
+                        mtime_ns = self._folder_mtime(key)
+                        if key in self._stale or mtime_ns != self._expected.get(key):
+                            mtime_ns = 0
+                    else:
+                        mtime_ns = self._scanned[key]
+                    self._conn.execute("INSERT OR REPLACE INTO folders (path, mtime_ns) VALUES (?, ?)",
+                                       (key, mtime_ns))
+                    self._stored[key] = mtime_ns
+            self._scanned.clear()
+            self._added.clear()
+            self._invalid.clear()
+            self._stale.clear()
@@ -0,0 +1,279 @@
+"""
+PicSort - ファイルハッシュ計算サービス
+大きなファイルはメモリマップ、小さなファイルは再利用バッファで読み込み、
+プロセスプールで並列にハッシュを計算します。
+"""
+
+import os
+import json
+import mmap
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+
+# メモリマップで読み込むファイルサイズの下限
+MMAP_THRESHOLD = 8 * 1024 * 1024
+# プロセスプールに回すファイルサイズの下限（これ未満は呼び出し元プロセスで計算）
+POOL_THRESHOLD = 1 * 1024 * 1024
+# 読み込みバッファ / メモリマップ走査のチャンクサイズ
+CHUNK_SIZE = 1024 * 1024
+# 部分フィンガープリントで読む先頭・末尾のバイト数
+PARTIAL_SIZE = 64 * 1024
+# キャッシュに保持する最大件数（超えた分は最も古く使われた項目から捨てる）
+DEFAULT_MAX_CACHE = 20000
+
+# スレッドごとに再利用する読み込みバッファ（非同期版の振り分けでは複数のスレッドから同時に読み込む）
+_local = threading.local()
+
+
+def _get_buffer() -> memoryview:
+    """このスレッドの再利用バッファを取得"""
+    buf = getattr(_local, "buffer", None)
+    if buf is None:
+        buf = _local.buffer = memoryview(bytearray(CHUNK_SIZE))
+    return buf
+
+
+def file_key(st: os.stat_result) -> Tuple[int, int, int, int]:
+    """キャッシュキー (dev, inode, size, mtime) を作成"""
+    return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def partial_fingerprint(path: str, size: Optional[int] = None) -> str:
+    """
+    先頭と末尾のみを読み込んだ高速フィンガープリントを計算
+
+    Args:
+        path: ファイルパス
+        size: ファイルサイズ（既知の場合）
+
+    Returns:
+        16進数のダイジェスト
+    """
+    if size is None:
+        size = os.path.getsize(path)
+    h = hashlib.blake2b(str(size).encode("ascii"))
+    with open(path, "rb") as f:
+        h.update(f.read(PARTIAL_SIZE))
+        if size > PARTIAL_SIZE * 2:
+            f.seek(-PARTIAL_SIZE, os.SEEK_END)
+            h.update(f.read(PARTIAL_SIZE))
+        elif size > PARTIAL_SIZE:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def full_digest(path: str, size: Optional[int] = None) -> str:
+    """
+    ファイル全体のダイジェストを計算
+
+    Args:
+        path: ファイルパス
+        size: ファイルサイズ（既知の場合）
+
+    Returns:
+        16進数のダイジェスト
+    """
+    if size is None:
+        size = os.path.getsize(path)
+    h = hashlib.blake2b()
+    with open(path, "rb") as f:
+        if size >= MMAP_THRESHOLD:
+            # 大きなファイルはメモリマップしてコピーなしで渡す
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                view = memoryview(m)
+                try:
+                    for offset in range(0, len(m), CHUNK_SIZE):
+                        h.update(view[offset:offset + CHUNK_SIZE])
+                finally:
+                    view.release()
+        else:
+            buf = _get_buffer()
+            while True:
+                n = f.readinto(buf)
+                if not n:
+                    break
+                h.update(buf[:n])
+    return h.hexdigest()
+
+
+def _hash_job(path: str, size: int, full: bool) -> str:
+    """プロセスプールで実行するジョブ"""
+    if full:
+        return full_digest(path, size)
+    return partial_fingerprint(path, size)
+
+
+class FileHasher:
+    """ハッシュ計算サービス"""
+
+    def __init__(self, max_workers: Optional[int] = None, max_pending: Optional[int] = None,
+                 cache_path: Optional[str] = None, max_cache: int = DEFAULT_MAX_CACHE):
+        """
+        初期化
+
+        Args:
+            max_workers: プロセスプールのワーカー数（省略時はCPU数）
+            max_pending: 同時に投入するジョブ数の上限（省略時はワーカー数の2倍）
+            cache_path: キャッシュの保存先（省略時はメモリ内のみ）
+            max_cache: キャッシュに保持する最大件数（監視モードで長時間動かしてもメモリを使い続けない）
+        """
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_pending = max_pending or self.max_workers * 2
+        self.cache_path = cache_path
+        self.max_cache = max_cache
+        self._executor = None
+        # (dev, inode, size, mtime) -> {"partial": ..., "full": ...}（古く使われた順）
+        self._cache: "OrderedDict[Tuple[int, int, int, int], Dict[str, str]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._dirty = False
+        if cache_path:
+            self._load_cache()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _load_cache(self):
+        """キャッシュファイルを読み込む"""
+        if not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                for key, value in json.load(f).items():
+                    self._cache[tuple(int(x) for x in key.split(":"))] = value
+        except Exception:
+            # 壊れたキャッシュは捨てて作り直す
+            self._cache = OrderedDict()
+        self._evict()
+
+    def save_cache(self):
+        """キャッシュをファイルに保存"""
+        if not self.cache_path or not self._dirty:
+            return
+        with self._cache_lock:
+            data = {":".join(str(x) for x in key): value for key, value in self._cache.items()}
+        tmp_path = self.cache_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self.cache_path)
+        self._dirty = False
+
+    def close(self):
+        """プロセスプールを終了し、キャッシュを保存"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        self.save_cache()
+
+    def _get_executor(self):
+        """プロセスプールを遅延生成"""
+        if self._executor is None:
+            from concurrent.futures import ProcessPoolExecutor
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    def _evict(self):
+        """最大件数を超えた分を最も古く使われた項目から捨てる"""
+        while len(self._cache) > self.max_cache:
+            self._cache.popitem(last=False)
+
+    def _lookup(self, st: os.stat_result, kind: str) -> Optional[str]:
+        key = file_key(st)
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if not entry:
+                return None
+            self._cache.move_to_end(key)
+            return entry.get(kind)
+
+    def _store(self, st: os.stat_result, kind: str, digest: str):
+        key = file_key(st)
+        with self._cache_lock:
+            self._cache.setdefault(key, {})[kind] = digest
+            self._cache.move_to_end(key)
+            self._evict()
+            self._dirty = True
+
+    def partial(self, path: str, st: Optional[os.stat_result] = None) -> str:
+        """部分フィンガープリントを取得"""
+        return self._hash_one(path, st, full=False)
+
+    def full(self, path: str, st: Optional[os.stat_result] = None) -> str:
+        """ファイル全体のダイジェストを取得"""
+        return self._hash_one(path, st, full=True)
+
+    def _hash_one(self, path: str, st: Optional[os.stat_result], full: bool) -> str:
+        st = st or os.stat(path)
+        kind = "full" if full else "partial"
+        digest = self._lookup(st, kind)
+        if digest is None:
+            digest = _hash_job(path, st.st_size, full)
+            self._store(st, kind, digest)
+        return digest
+
+    def hash_many(self, paths: Iterable[str], full: bool = True) -> Iterator[Tuple[str, Optional[str]]]:
+        """
+        複数ファイルのハッシュを並列に計算
+
+        キャッシュ済み・小さなファイルはその場で計算し、大きなファイルだけを
+        プロセスプールに投入します。投入中のジョブ数は max_pending で制限されます。
+        完了順に結果を返すため、入力順とは一致しません。
+
+        Args:
+            paths: ファイルパスのイテラブル
+            full: True ならファイル全体、False なら部分フィンガープリント
+
+        Yields:
+            (パス, ダイジェスト) のタプル（読み込みに失敗した場合はダイジェストが None）
+        """
+        from concurrent.futures import wait, FIRST_COMPLETED
+
+        kind = "full" if full else "partial"
+        pending = {}
+
+        def drain(return_when):
+            done, _ = wait(pending, return_when=return_when)
+            for future in done:
+                path, st = pending.pop(future)
+                try:
+                    digest = future.result()
+                except OSError:
+                    yield path, None
+                    continue
+                self._store(st, kind, digest)
+                yield path, digest
+
+        for path in paths:
+            try:
+                st = os.stat(path)
+            except OSError:
+                yield path, None
+                continue
+
+            digest = self._lookup(st, kind)
+            if digest is not None:
+                yield path, digest
+                continue
+
+            # 部分フィンガープリントと小さなファイルはプール経由より直接読む方が速い
+            if not full or st.st_size < POOL_THRESHOLD:
+                try:
+                    digest = _hash_job(path, st.st_size, full)
+                except OSError:
+                    yield path, None
+                    continue
+                self._store(st, kind, digest)
+                yield path, digest
+                continue
+
+            if len(pending) >= self.max_pending:
+                yield from drain(FIRST_COMPLETED)
+            future = self._get_executor().submit(_hash_job, path, st.st_size, full)
+            pending[future] = (path, st)
+
+        while pending:
+            yield from drain(FIRST_COMPLETED)
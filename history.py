@@ -0,0 +1,162 @@
+"""
+PicSort - 実行履歴（SQLite）
+実行ごとの統計情報・移動したバイト数・所要時間・処理段階ごとの時間・ルールごとの移動数を記録し、
+日ごと・週ごとの集計を記録時に更新しておきます。
+ルールの増加やフォルダの肥大化で処理が遅くなり始めた時期を、集計を読むだけで確認できます。
+"""
+
+import json
+import sqlite3
+from datetime import datetime
+from typing import Any, Dict, List
+
+# 実行履歴のファイル名（設定ファイルと同じフォルダに保存）
+HISTORY_FILE = "history.db"
+
+# 保持する実行記録の件数（集計は削除しない）
+DEFAULT_MAX_RUNS = 10000
+
+# 集計の単位
+PERIODS = ("day", "week")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    started TEXT NOT NULL,
+    finished TEXT NOT NULL,
+    duration REAL NOT NULL,
+    total_files INTEGER NOT NULL,
+    moved_files INTEGER NOT NULL,
+    errors INTEGER NOT NULL,
+    remaining_files INTEGER NOT NULL,
+    moved_bytes INTEGER NOT NULL,
+    stats TEXT NOT NULL,
+    phases TEXT NOT NULL,
+    rule_hits TEXT NOT NULL
+);
+-- 日ごと・週ごとの集計（記録時に加算する）
+CREATE TABLE IF NOT EXISTS aggregates (
+    period TEXT NOT NULL,
+    key TEXT NOT NULL,
+    runs INTEGER NOT NULL,
+    total_files INTEGER NOT NULL,
+    moved_files INTEGER NOT NULL,
+    errors INTEGER NOT NULL,
+    moved_bytes INTEGER NOT NULL,
+    duration REAL NOT NULL,
+    remaining_files INTEGER NOT NULL,
+    PRIMARY KEY (period, key)
+);
+"""
+
+_AGGREGATE_COLUMNS = ("runs", "total_files", "moved_files", "errors", "moved_bytes", "duration", "remaining_files")
+
+
+def period_key(period: str, when: datetime) -> str:
+    """集計のキー（day: 2024-05-01、week: 2024-W18）"""
+    if period == "day":
+        return when.strftime("%Y-%m-%d")
+    year, week, _ = when.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+class RunHistory:
+    """実行履歴"""
+
+    def __init__(self, path: str, max_runs: int = DEFAULT_MAX_RUNS):
+        """
+        初期化
+
+        Args:
+            path: データベースファイルのパス（なければ作成）
+            max_runs: 保持する実行記録の件数
+        """
+        self.path = path
+        self.max_runs = max_runs
+        self._conn = sqlite3.connect(path)
+        self._conn.executescript(_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        """閉じる"""
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def record(self, started: datetime, finished: datetime, stats: Dict[str, int],
+               phases: Dict[str, float], rule_hits: Dict[str, int]):
+        """
+        実行結果を1件追加し、日ごと・週ごとの集計を更新（1つのトランザクションで書き込む）
+
+        Args:
+            started: 開始日時
+            finished: 終了日時
+            stats: 統計情報
+            phases: 処理段階ごとの所要時間（秒）
+            rule_hits: ルールの条件ごとの移動数
+        """
+        duration = (finished - started).total_seconds()
+        moved_bytes = stats.get("moved_bytes", 0)
+        with self._conn:
+            self._conn.execute(
+                "INSERT INTO runs (started, finished, duration, total_files, moved_files, errors, "
+                "remaining_files, moved_bytes, stats, phases, rule_hits) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (started.isoformat(timespec="seconds"), finished.isoformat(timespec="seconds"), duration,
+                 stats["total_files"], stats["moved_files"], stats["errors"], stats.get("remaining_files", 0),
+                 moved_bytes, json.dumps(stats), json.dumps(phases), json.dumps(rule_hits, ensure_ascii=False))
+            )
+            for period in PERIODS:
+                key = period_key(period, started)
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO aggregates (period, key, runs, total_files, moved_files, errors, "
+                    "moved_bytes, duration, remaining_files) VALUES (?, ?, 0, 0, 0, 0, 0, 0, 0)", (period, key)
+                )
+                # 未処理の残り件数は合計ではなく、その期間の最後の実行の値を持つ
+                self._conn.execute(
+                    "UPDATE aggregates SET runs = runs + 1, total_files = total_files + ?, "
+                    "moved_files = moved_files + ?, errors = errors + ?, moved_bytes = moved_bytes + ?, "
+                    "duration = duration + ?, remaining_files = ? WHERE period = ? AND key = ?",
+                    (stats["total_files"], stats["moved_files"], stats["errors"], moved_bytes, duration,
+                     stats.get("remaining_files", 0), period, key)
+                )
+            # 古い実行記録を削除
+            self._conn.execute(
+                "DELETE FROM runs WHERE id <= (SELECT MAX(id) FROM runs) - ?", (self.max_runs,)
+            )
+
+    def recent(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """最近の実行記録（新しい順）"""
+        cursor = self._conn.execute(
+            "SELECT started, finished, duration, stats, phases, rule_hits FROM runs ORDER BY id DESC LIMIT ?",
+            (limit,)
+        )
+        return [
+            {"started": started, "finished": finished, "duration": duration, "stats": json.loads(stats),
+             "phases": json.loads(phases), "rule_hits": json.loads(rule_hits)}
+            for started, finished, duration, stats, phases, rule_hits in cursor
+        ]
+
+    def aggregates(self, period: str = "day", limit: int = 30) -> List[Dict[str, Any]]:
+        """
+        日ごと・週ごとの集計（古い順）
+
+        throughput は1秒あたりの移動数（実行時間の合計で割った値）。
+        """
+        if period not in PERIODS:
+            raise ValueError(f"不明な集計単位です: {period}")
+        cursor = self._conn.execute(
+            f"SELECT key, {', '.join(_AGGREGATE_COLUMNS)} FROM aggregates WHERE period = ? "
+            "ORDER BY key DESC LIMIT ?", (period, limit)
+        )
+        rows = []
+        for row in cursor:
+            item = dict(zip(("key",) + _AGGREGATE_COLUMNS, row))
+            item["throughput"] = item["moved_files"] / item["duration"] if item["duration"] > 0 else 0.0
+            rows.append(item)
+        rows.reverse()
+        return rows
@@ -0,0 +1,80 @@
+"""
+PicSort - 移動せずに振り分けるためのリンク作成
+ソースフォルダをそのまま残し、振り分け先にハードリンクまたは reflink（コピーオンライト複製）を作ります。
+同じドライブ内ならデータをコピーしないため、一瞬で追加の容量なしに振り分けられます。
+"""
+
+import os
+import sys
+import errno
+import shutil
+
+# 振り分け方法
+SORT_MODES = ("move", "hardlink", "reflink")
+
+# リンクを作れない場合にコピーへ切り替えるエラー
+_FALLBACK_ERRNOS = {errno.EXDEV, errno.EPERM, errno.ENOTSUP, errno.EOPNOTSUPP, errno.EMLINK}
+# Windows: ERROR_NOT_SAME_DEVICE / ERROR_INVALID_FUNCTION（リンク非対応のファイルシステム）
+_FALLBACK_WINERRORS = {17, 1}
+
+
+def _should_fall_back(error: OSError) -> bool:
+    """リンクの作成に失敗したとき、コピーで代用してよいエラーかどうか"""
+    if getattr(error, "winerror", None) in _FALLBACK_WINERRORS:
+        return True
+    return error.errno in _FALLBACK_ERRNOS
+
+
+def _reflink(source_path: str, destination_path: str) -> bool:
+    """reflink を作成（対応していないファイルシステム・OS では False）"""
+    if sys.platform.startswith("linux"):
+        import fcntl
+        FICLONE = 0x40049409
+        with open(source_path, "rb") as src, open(destination_path, "xb") as dst:
+            try:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                cloned = True
+            except OSError:
+                cloned = False
+        if not cloned:
+            os.remove(destination_path)
+            return False
+        shutil.copystat(source_path, destination_path)
+        return True
+
+    if sys.platform == "darwin":
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        return libc.clonefile(os.fsencode(source_path), os.fsencode(destination_path), 0) == 0
+
+    return False
+
+
+def link_file(source_path: str, destination_path: str, mode: str) -> str:
+    """
+    振り分け先にリンクを作成（作れない場合はコピー）
+
+    Args:
+        source_path: 元ファイルのパス（そのまま残る）
+        destination_path: 作成先のパス
+        mode: "hardlink" または "reflink"
+
+    Returns:
+        実際に使った方法（"hardlink" / "reflink" / "copy"）
+    """
+    if mode == "hardlink":
+        try:
+            os.link(source_path, destination_path)
+            return "hardlink"
+        except OSError as e:
+            if not _should_fall_back(e):
+                raise
+    elif mode == "reflink":
+        if _reflink(source_path, destination_path):
+            return "reflink"
+    else:
+        raise ValueError(f"不明な振り分け方法です: {mode}")
+
+    # 別ドライブなどリンクを作れない場合はコピー
+    shutil.copy2(source_path, destination_path)
+    return "copy"
@@ -0,0 +1,85 @@
+"""
+PicSort - バックグラウンド実行用のログ設定
+ログはキュー経由で別スレッドが書き込むため、ファイル書き込みが振り分け処理を待たせません。
+ログファイルはサイズでローテーションし、古くなったバックアップは削除します。
+"""
+
+import os
+import glob
+import json
+import time
+import queue
+import logging
+import logging.handlers
+from datetime import datetime
+
+from organizer import Config
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """1行1レコードの JSON 形式で出力するフォーマッタ"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps({
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec="seconds"),
+            "level": record.levelname,
+            "message": record.getMessage()
+        }, ensure_ascii=False)
+
+
+class SizeAgeRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """サイズでローテーションし、一定日数より古いバックアップを削除するハンドラ"""
+
+    def __init__(self, filename: str, max_bytes: int, backup_count: int, max_age_days: float):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+        self.max_age_days = max_age_days
+        self.remove_expired_backups()
+
+    def doRollover(self):
+        super().doRollover()
+        self.remove_expired_backups()
+
+    def remove_expired_backups(self):
+        """保存期間を過ぎたバックアップを削除"""
+        if not self.max_age_days:
+            return
+        limit = time.time() - self.max_age_days * 86400
+        for path in glob.glob(glob.escape(self.baseFilename) + ".*"):
+            try:
+                if os.path.getmtime(path) < limit:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+def setup_background_logging(config: Config) -> logging.handlers.QueueListener:
+    """
+    キュー経由のログ出力を設定
+
+    Args:
+        config: 設定オブジェクト（"log" セクションを参照）
+
+    Returns:
+        開始済みの QueueListener（終了時に stop() を呼ぶこと）
+    """
+    settings = config.get_log_settings()
+
+    handler = SizeAgeRotatingFileHandler(
+        settings["path"],
+        max_bytes=settings["max_bytes"],
+        backup_count=settings["backup_count"],
+        max_age_days=settings["max_age_days"]
+    )
+    if settings["format"] == "jsonl":
+        handler.setFormatter(JsonLinesFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s'))
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.setLevel(logging.INFO)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    listener.start()
+    return listener
@@ -7,7 +7,10 @@ from tkinter import ttk, filedialog, messagebox, scrolledtext
 import os
 import sys
 import winsound
-from organizer import Config, FileOrganizer
+import multiprocessing
+from organizer import Config, FileOrganizer, merge_stats
+from runlock import RunCoordinator
+from templates import DestinationTemplate
 
 
 # システム音のマッピング
@@ -19,6 +22,26 @@ SOUND_MAP = {
     5: winsound.MB_ICONQUESTION
 }
 
+# 実行ログに保持する最大行数（古い行から削除）
+MAX_LOG_LINES = 5000
+
+# ルールのプレビューを更新するまでの入力待ち時間（ミリ秒）
+PREVIEW_DELAY_MS = 150
+
+
+def format_conditions(conditions) -> str:
+    """ルールの追加条件を一覧表示用の短いテキストにする（条件がなければ空文字）"""
+    if not conditions:
+        return ""
+    parts = []
+    if conditions.get("extensions"):
+        parts.append(", ".join(conditions["extensions"]))
+    for key, text in (("min_size_kb", "{} KB 以上"), ("max_size_kb", "{} KB 以下"),
+                      ("min_age_minutes", "{} 分以上前"), ("max_age_minutes", "{} 分以内")):
+        if conditions.get(key):
+            parts.append(text.format(conditions[key]))
+    return f"（{' / '.join(parts)}）"
+
 
 class FileOrganizerApp:
     """ファイル振り分けGUIアプリケーション"""
@@ -52,6 +75,9 @@ class FileOrganizerApp:
         self.sort_column = None
         self.sort_reverse = False
 
+        # ルールのプレビュー用のソースフォルダ一覧（フォルダが変わるまで再利用）
+        self.snapshot = None
+
         # UIを構築
         self.create_widgets()
         self.load_settings()
@@ -118,10 +144,20 @@ class FileOrganizerApp:
         ttk.Button(button_frame, text="追加", command=self.add_rule).pack(side=tk.LEFT, padx=(0, 5))
         ttk.Button(button_frame, text="編集", command=self.edit_rule).pack(side=tk.LEFT, padx=(0, 5))
         ttk.Button(button_frame, text="削除", command=self.delete_rule).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(button_frame, text="ルール診断", command=self.analyze_rules).pack(side=tk.LEFT, padx=(0, 5))
+
+        # 全角・半角や大文字・小文字を区別しない照合
+        self.normalize_var = tk.BooleanVar()
+        ttk.Checkbutton(
+            button_frame, text="全角/半角・大文字/小文字を区別しない",
+            variable=self.normalize_var, command=self.toggle_normalize_match
+        ).pack(side=tk.LEFT, padx=(10, 0))
 
         # エクスポート・インポートボタン（右側）
         ttk.Button(button_frame, text="エクスポート", command=self.export_settings).pack(side=tk.RIGHT, padx=(5, 0))
         ttk.Button(button_frame, text="インポート", command=self.import_settings).pack(side=tk.RIGHT)
+        ttk.Button(button_frame, text="CSV書き出し", command=self.export_rules_csv).pack(side=tk.RIGHT, padx=(5, 10))
+        ttk.Button(button_frame, text="CSV読み込み", command=self.import_rules_csv).pack(side=tk.RIGHT)
 
         # === 実行ボタン ===
         execute_frame = ttk.Frame(main_frame)
@@ -131,6 +167,8 @@ class FileOrganizerApp:
             side=tk.LEFT, padx=(0, 5)
         )
         ttk.Button(execute_frame, text="ログをクリア", command=self.clear_log).pack(side=tk.LEFT)
+        ttk.Button(execute_frame, text="カタログ検索", command=self.open_catalog).pack(side=tk.RIGHT)
+        ttk.Button(execute_frame, text="実行履歴", command=self.open_history).pack(side=tk.RIGHT, padx=(0, 5))
 
         # === ログ表示エリア ===
         log_frame = ttk.LabelFrame(main_frame, text="実行ログ", padding="5")
@@ -145,6 +183,7 @@ class FileOrganizerApp:
         """設定を読み込んでUIに反映"""
         # ソースフォルダ
         self.source_folder_var.set(self.config.get_source_folder())
+        self.normalize_var.set(self.config.is_normalize_match())
 
         # 振り分けルール
         self.refresh_rules_table()
@@ -157,7 +196,8 @@ class FileOrganizerApp:
 
         # 設定から読み込んで追加
         for mapping in self.config.get_mappings():
-            self.tree.insert("", tk.END, values=(mapping["pattern"], mapping["destination"]))
+            self.tree.insert("", tk.END, values=(mapping["pattern"] + format_conditions(mapping.get("conditions")),
+                                                 mapping["destination"]))
 
     def select_source_folder(self):
         """ソースフォルダを選択"""
@@ -167,12 +207,34 @@ class FileOrganizerApp:
             self.config.set_source_folder(folder)
             self.log_message(f"ソースフォルダを設定: {folder}")
 
+    def toggle_normalize_match(self):
+        """全角・半角や大文字・小文字を区別しない照合の切り替え"""
+        enabled = self.normalize_var.get()
+        self.config.set_normalize_match(enabled)
+        self.log_message(f"全角/半角・大文字/小文字を区別しない照合: {'有効' if enabled else '無効'}")
+
+    def make_preview(self, earlier_rules):
+        """ルール編集ダイアログのプレビューを作成（ソースフォルダがない場合は None）"""
+        from preview import SourceSnapshot, RulePreview
+
+        source_folder = self.config.get_source_folder()
+        if not source_folder or not os.path.isdir(source_folder):
+            return None
+        if self.snapshot is None or self.snapshot.folder != source_folder or not self.snapshot.is_current():
+            try:
+                self.snapshot = SourceSnapshot(source_folder)
+            except OSError as e:
+                self.log_message(f"ソースフォルダを読み込めません: {e}")
+                return None
+        return RulePreview(self.snapshot, earlier_rules, self.config.is_normalize_match())
+
     def add_rule(self):
         """振り分けルールを追加"""
-        dialog = RuleDialog(self.root, "振り分けルールを追加")
+        dialog = RuleDialog(self.root, "振り分けルールを追加",
+                            preview=self.make_preview(self.config.get_mappings()))
         if dialog.result:
-            pattern, destination = dialog.result
-            self.config.add_mapping(pattern, destination)
+            pattern, destination, conditions = dialog.result
+            self.config.add_mapping(pattern, destination, conditions)
             self.refresh_rules_table()
             self.log_message(f"ルールを追加: {pattern} → {destination}")
 
@@ -188,15 +250,15 @@ class FileOrganizerApp:
         index = self.tree.index(item)
 
         # 現在の値を取得
-        values = self.tree.item(item, "values")
-        current_pattern = values[0]
-        current_destination = values[1]
+        mappings = self.config.get_mappings()
+        current = mappings[index]
 
         # ダイアログを表示
-        dialog = RuleDialog(self.root, "振り分けルールを編集", current_pattern, current_destination)
+        dialog = RuleDialog(self.root, "振り分けルールを編集", current["pattern"], current["destination"],
+                            preview=self.make_preview(mappings[:index]), conditions=current.get("conditions"))
         if dialog.result:
-            pattern, destination = dialog.result
-            self.config.update_mapping(index, pattern, destination)
+            pattern, destination, conditions = dialog.result
+            self.config.update_mapping(index, pattern, destination, conditions)
             self.refresh_rules_table()
             self.log_message(f"ルールを更新: {pattern} → {destination}")
 
@@ -312,6 +374,91 @@ class FileOrganizerApp:
             self.log_message(f"インポートエラー: {e}")
             messagebox.showerror("エラー", f"設定のインポートに失敗しました\n\n{e}")
 
+    def export_rules_csv(self):
+        """振り分けルールを CSV/TSV に書き出す"""
+        from rules_io import export_rules
+
+        filename = filedialog.asksaveasfilename(
+            title="ルールを書き出し",
+            defaultextension=".csv",
+            filetypes=[("CSV files", "*.csv"), ("TSV files", "*.tsv"), ("All files", "*.*")],
+            initialfile="PicSort_ルール.csv"
+        )
+        if not filename:
+            return
+
+        try:
+            count = export_rules(self.config, filename)
+            self.log_message(f"ルールを書き出しました: {filename} ({count}件)")
+            messagebox.showinfo("成功", f"ルールを書き出しました\n\n{filename}\n\nルール数: {count}")
+        except Exception as e:
+            self.log_message(f"書き出しエラー: {e}")
+            messagebox.showerror("エラー", f"ルールの書き出しに失敗しました\n\n{e}")
+
+    def analyze_rules(self):
+        """重複・隠れている・一致しないルールを調べ、選択したルールをまとめて削除"""
+        from analyzer import analyze_rules, load_rule_hits, prune_rules
+
+        mappings = self.config.get_mappings()
+        if not mappings:
+            messagebox.showinfo("ルール診断", "振り分けルールがありません")
+            return
+        try:
+            hits, runs = load_rule_hits(self.config)
+        except Exception as e:
+            self.log_message(f"実行履歴を読み込めません: {e}")
+            hits, runs = {}, 0
+        results = analyze_rules(mappings, self.config.is_normalize_match(), hits, runs)
+        if not results:
+            messagebox.showinfo("ルール診断", "問題のあるルールは見つかりませんでした")
+            return
+
+        dialog = RuleAnalysisDialog(self.root, results, runs)
+        if dialog.result:
+            removed = prune_rules(self.config, dialog.result)
+            self.refresh_rules_table()
+            self.log_message(f"ルール診断: {removed} 件のルールを削除しました")
+
+    def import_rules_csv(self):
+        """CSV/TSV から振り分けルールを一括で読み込む"""
+        from rules_io import import_rules
+
+        filename = filedialog.askopenfilename(
+            title="ルールを読み込み",
+            filetypes=[("CSV/TSV files", "*.csv *.tsv"), ("All files", "*.*")]
+        )
+        if not filename:
+            return
+
+        dialog = ImportModeDialog(self.root)
+        if not dialog.result:
+            return
+
+        try:
+            report = import_rules(self.config, filename, dialog.result)
+        except Exception as e:
+            self.log_message(f"読み込みエラー: {e}")
+            messagebox.showerror("エラー", f"ルールの読み込みに失敗しました\n\n{e}")
+            return
+
+        # 保存もテーブルの更新も最後に1回だけ
+        self.refresh_rules_table()
+
+        self.log_message(f"ルールを読み込みました: {filename} "
+                         f"(追加={report['added']}, 更新={report['updated']}, "
+                         f"重複={report['duplicates']}, 無効={len(report['invalid'])})")
+        for line_num, reason in report["invalid"][:20]:
+            self.log_message(f"  {line_num}行目: {reason}")
+        for pattern, by_pattern in report["shadowed"][:20]:
+            self.log_message(f"  「{pattern}」は先にある「{by_pattern}」に一致するため使われません")
+
+        messagebox.showinfo(
+            "読み込み完了",
+            f"追加: {report['added']}\n更新: {report['updated']}\n"
+            f"重複: {report['duplicates']}\n無効な行: {len(report['invalid'])}\n"
+            f"使われないルール: {len(report['shadowed'])}\n\n詳細は実行ログを確認してください"
+        )
+
     def execute_organize(self):
         """ファイル振り分けを実行"""
         if not self.config.get_source_folder():
@@ -325,20 +472,57 @@ class FileOrganizerApp:
         self.log_message("=" * 50)
         self.log_message("ファイル振り分けを開始します...")
 
-        stats = self.organizer.organize()
+        # run_silent.pyw などが実行中の場合は、そちらの終了後の再実行にまとめる
+        results = RunCoordinator(self.config).run(self.organizer.organize)
 
         self.log_message("=" * 50)
 
+        if not results:
+            self.log_message("他のPicSortが実行中のため、終了後の再実行にまとめました")
+            messagebox.showinfo("実行中", "他のPicSortが実行中です。\n\n終了後にまとめて再実行されます。")
+            return
+        stats = merge_stats(results)
+
         # 通知音を再生
         self.play_notification_sound()
 
         # カスタム完了ダイアログ（システム音が鳴らない）
         self.show_completion_dialog(stats)
 
+    def open_catalog(self):
+        """振り分けたファイルのカタログを開く"""
+        from catalog import Catalog, CATALOG_FILE
+
+        path = self.config.get_state_path(CATALOG_FILE)
+        if not os.path.exists(path):
+            messagebox.showinfo(
+                "カタログ",
+                "カタログがありません。\n\n設定ファイルの \"catalog\" で \"enabled\": true にして実行すると、"
+                "振り分けたファイルが記録されます。"
+            )
+            return
+        with Catalog(path) as catalog:
+            CatalogDialog(self.root, catalog)
+
+    def open_history(self):
+        """実行履歴の推移を表示"""
+        from history import RunHistory, HISTORY_FILE
+
+        path = self.config.get_state_path(HISTORY_FILE)
+        if not os.path.exists(path):
+            messagebox.showinfo("実行履歴", "実行履歴がありません")
+            return
+        with RunHistory(path) as history:
+            HistoryDialog(self.root, history)
+
     def log_message(self, message: str):
         """ログメッセージを表示"""
         self.log_text.configure(state="normal")
         self.log_text.insert(tk.END, message + "\n")
+        # 行数が上限を超えたら古い行を削除してメモリ使用量を一定に保つ
+        line_count = int(self.log_text.index("end-1c").split(".")[0])
+        if line_count > MAX_LOG_LINES:
+            self.log_text.delete("1.0", f"{line_count - MAX_LOG_LINES}.0")
         self.log_text.configure(state="disabled")
         self.log_text.see(tk.END)
 
@@ -481,13 +665,16 @@ class FileOrganizerApp:
 class RuleDialog:
     """振り分けルール追加/編集ダイアログ"""
 
-    def __init__(self, parent, title, pattern="", destination=""):
+    def __init__(self, parent, title, pattern="", destination="", preview=None, conditions=None):
         self.result = None
+        self.preview = preview
+        self._preview_job = None
+        conditions = conditions or {}
 
         # ダイアログウィンドウ
         self.dialog = tk.Toplevel(parent)
         self.dialog.title(title)
-        self.dialog.geometry("600x150")
+        self.dialog.geometry("600x520" if preview is not None else "600x250")
         self.dialog.transient(parent)
         self.dialog.grab_set()
 
@@ -517,9 +704,55 @@ class RuleDialog:
         )
         ttk.Button(dest_frame, text="参照", command=self.select_destination).grid(row=0, column=1)
 
+        # 追加条件（空欄の項目は判定しない）
+        conditions_frame = ttk.LabelFrame(frame, text="追加条件（省略可）", padding="5")
+        conditions_frame.grid(row=2, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 10))
+        conditions_frame.columnconfigure(1, weight=1)
+        conditions_frame.columnconfigure(3, weight=1)
+
+        ttk.Label(conditions_frame, text="拡張子（カンマ区切り）:").grid(row=0, column=0, sticky=tk.W)
+        self.extensions_var = tk.StringVar(value=", ".join(conditions.get("extensions", [])))
+        ttk.Entry(conditions_frame, textvariable=self.extensions_var).grid(
+            row=0, column=1, columnspan=3, sticky=(tk.W, tk.E), pady=(0, 5)
+        )
+        self.condition_vars = {}
+        fields = [("min_size_kb", "サイズ（KB 以上）:", 1, 0), ("max_size_kb", "サイズ（KB 以下）:", 1, 2),
+                  ("min_age_minutes", "経過時間（分以上）:", 2, 0), ("max_age_minutes", "経過時間（分以下）:", 2, 2)]
+        for key, label, row, column in fields:
+            ttk.Label(conditions_frame, text=label).grid(row=row, column=column, sticky=tk.W, padx=(10 if column else 0, 0))
+            var = self.condition_vars[key] = tk.StringVar(value=str(conditions.get(key, "")))
+            ttk.Entry(conditions_frame, textvariable=var, width=10).grid(row=row, column=column + 1, sticky=tk.W)
+
+        # 一致するファイルのプレビュー
+        if preview is not None:
+            preview_frame = ttk.LabelFrame(frame, text="一致するファイル（ソースフォルダ）", padding="5")
+            preview_frame.grid(row=3, column=0, columnspan=2, sticky=(tk.W, tk.E, tk.N, tk.S), pady=(0, 10))
+            preview_frame.columnconfigure(0, weight=1)
+            preview_frame.rowconfigure(1, weight=1)
+            frame.rowconfigure(3, weight=1)
+
+            self.preview_status_var = tk.StringVar()
+            ttk.Label(preview_frame, textvariable=self.preview_status_var).grid(row=0, column=0, sticky=tk.W)
+            self.preview_tree = ttk.Treeview(preview_frame, columns=("filename", "taken_by"), show="headings",
+                                             height=8)
+            self.preview_tree.heading("filename", text="ファイル名")
+            self.preview_tree.heading("taken_by", text="先に一致するルール")
+            self.preview_tree.column("filename", width=360)
+            self.preview_tree.column("taken_by", width=160)
+            self.preview_tree.tag_configure("taken", foreground="gray")
+            preview_scrollbar = ttk.Scrollbar(preview_frame, orient=tk.VERTICAL, command=self.preview_tree.yview)
+            self.preview_tree.configure(yscroll=preview_scrollbar.set)
+            self.preview_tree.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+            preview_scrollbar.grid(row=1, column=1, sticky=(tk.N, tk.S))
+
+            # 追加条件を変えた場合も、一致するファイルを表示し直す
+            for var in [self.pattern_var, self.extensions_var, *self.condition_vars.values()]:
+                var.trace_add("write", lambda *args: self.schedule_preview())
+            self.update_preview()
+
         # ボタン
         button_frame = ttk.Frame(frame)
-        button_frame.grid(row=2, column=0, columnspan=2, sticky=(tk.E))
+        button_frame.grid(row=4, column=0, columnspan=2, sticky=(tk.E))
 
         ttk.Button(button_frame, text="OK", command=self.ok).pack(side=tk.LEFT, padx=(0, 5))
         ttk.Button(button_frame, text="キャンセル", command=self.cancel).pack(side=tk.LEFT)
@@ -543,6 +776,37 @@ class RuleDialog:
         if folder:
             self.destination_var.set(folder)
 
+    def schedule_preview(self):
+        """入力が止まってからプレビューを更新（キー入力ごとには照合しない）"""
+        if self._preview_job is not None:
+            self.dialog.after_cancel(self._preview_job)
+        self._preview_job = self.dialog.after(PREVIEW_DELAY_MS, self.update_preview)
+
+    def update_preview(self):
+        """入力中の条件に一致するファイルを表示"""
+        self._preview_job = None
+        if not self.dialog.winfo_exists():
+            return
+        pattern = self.pattern_var.get().strip()
+        # 入力途中で数値になっていない項目は無視して照合する
+        conditions, _ = self.read_conditions()
+        count, taken, rows = self.preview.preview(pattern, conditions=conditions)
+
+        self.preview_tree.delete(*self.preview_tree.get_children())
+        for filename, taken_by in rows:
+            self.preview_tree.insert("", tk.END, values=(filename, taken_by or ""),
+                                     tags=("taken",) if taken_by else ())
+
+        if not pattern:
+            self.preview_status_var.set(f"ソースフォルダのファイル数: {len(self.preview.snapshot.names)}")
+        else:
+            status = f"一致: {count} 件"
+            if taken:
+                status += f"（うち {taken} 件は先に並ぶルールに一致するため、このルールでは移動されません）"
+            if count > len(rows):
+                status += f" / 先頭 {len(rows)} 件を表示"
+            self.preview_status_var.set(status)
+
     def ok(self):
         """OKボタン処理"""
         pattern = self.pattern_var.get().strip()
@@ -556,7 +820,352 @@ class RuleDialog:
             messagebox.showwarning("警告", "振り分け先フォルダを指定してください", parent=self.dialog)
             return
 
-        self.result = (pattern, destination)
+        try:
+            DestinationTemplate(destination)
+        except ValueError as e:
+            messagebox.showwarning("警告", f"振り分け先フォルダの書式が正しくありません\n\n{e}", parent=self.dialog)
+            return
+
+        conditions, valid = self.read_conditions()
+        if not valid:
+            messagebox.showwarning("警告", "サイズと経過時間には 0 以上の数値を入力してください", parent=self.dialog)
+            return
+
+        self.result = (pattern, destination, conditions)
+        self.dialog.destroy()
+
+    def read_conditions(self):
+        """
+        入力中の追加条件を読み取る
+
+        Returns:
+            (追加条件, すべての項目が正しいか)。正しくない項目は追加条件に含めない
+        """
+        conditions = {}
+        valid = True
+        extensions = [ext.strip().lstrip(".").lower() for ext in self.extensions_var.get().split(",")]
+        if any(extensions):
+            conditions["extensions"] = [ext for ext in extensions if ext]
+        for key, var in self.condition_vars.items():
+            text = var.get().strip()
+            if not text:
+                continue
+            try:
+                value = float(text)
+            except ValueError:
+                value = -1
+            if value < 0:
+                valid = False
+                continue
+            if value:
+                conditions[key] = int(value) if value.is_integer() else value
+        return conditions, valid
+
+    def cancel(self):
+        """キャンセルボタン処理"""
+        self.dialog.destroy()
+
+
+class CatalogDialog:
+    """振り分けたファイルのカタログ検索ダイアログ"""
+
+    def __init__(self, parent, catalog):
+        self.catalog = catalog
+
+        # ダイアログウィンドウ
+        self.dialog = tk.Toplevel(parent)
+        self.dialog.title("カタログ検索")
+        self.dialog.geometry("700x400")
+        self.dialog.transient(parent)
+        self.dialog.grab_set()
+
+        # フレーム
+        frame = ttk.Frame(self.dialog, padding="10")
+        frame.pack(fill=tk.BOTH, expand=True)
+        frame.columnconfigure(0, weight=1)
+        frame.rowconfigure(1, weight=1)
+
+        # 検索欄
+        search_frame = ttk.Frame(frame)
+        search_frame.grid(row=0, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 5))
+        search_frame.columnconfigure(1, weight=1)
+        ttk.Label(search_frame, text="ファイル名（前方一致）:").grid(row=0, column=0, padx=(0, 5))
+        self.name_var = tk.StringVar()
+        entry = ttk.Entry(search_frame, textvariable=self.name_var)
+        entry.grid(row=0, column=1, sticky=(tk.W, tk.E), padx=(0, 5))
+        ttk.Button(search_frame, text="検索", command=self.search).grid(row=0, column=2, padx=(0, 5))
+        ttk.Button(search_frame, text="ルール別", command=self.show_rule_stats).grid(row=0, column=3, padx=(0, 5))
+        ttk.Button(search_frame, text="重複", command=self.show_duplicates).grid(row=0, column=4)
+
+        # 結果
+        self.tree = ttk.Treeview(frame, columns=("first", "second", "third"), show="headings")
+        scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscroll=scrollbar.set)
+        self.tree.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        scrollbar.grid(row=1, column=1, sticky=(tk.N, tk.S))
+
+        self.status_var = tk.StringVar()
+        ttk.Label(frame, textvariable=self.status_var).grid(row=2, column=0, sticky=tk.W, pady=(5, 0))
+        ttk.Button(frame, text="閉じる", command=self.dialog.destroy).grid(row=2, column=0, columnspan=2,
+                                                                        sticky=tk.E, pady=(5, 0))
+
+        self.dialog.bind("<Return>", lambda e: self.search())
+        self.dialog.bind("<Escape>", lambda e: self.dialog.destroy())
+
+        self.show_rule_stats()
+        entry.focus_set()
+
+        # モーダル表示
+        self.dialog.wait_window()
+
+    def _show(self, headings, widths, rows):
+        """結果の表を入れ替える"""
+        self.tree.delete(*self.tree.get_children())
+        for column, heading, width in zip(("first", "second", "third"), headings, widths):
+            self.tree.heading(column, text=heading)
+            self.tree.column(column, width=width)
+        for row in rows:
+            self.tree.insert("", tk.END, values=row)
+
+    def search(self):
+        """ファイル名で検索"""
+        name = self.name_var.get().strip()
+        if not name:
+            return
+        rows = self.catalog.find(name)
+        self._show(("ファイル名", "移動先", "実行日時"), (180, 380, 120),
+                   [(row["name"], row["path"], row["run_id"]) for row in rows])
+        self.status_var.set(f"{len(rows)} 件")
+
+    def show_rule_stats(self):
+        """ルールごとのファイル数を表示"""
+        summary = self.catalog.summary()
+        self._show(("条件", "ファイル数", "合計サイズ (MB)"), (300, 150, 150),
+                   [(row["rule"] or "(アーカイブ)", row["files"], f"{row['bytes'] / 1024 / 1024:,.1f}")
+                    for row in self.catalog.rule_stats()])
+        self.status_var.set(f"合計: {summary['files']} 件, {summary['bytes'] / 1024 / 1024:,.1f} MB")
+
+    def show_duplicates(self):
+        """同じ内容のファイルを表示"""
+        groups = self.catalog.duplicates()
+        self._show(("ハッシュ", "件数", "移動先"), (140, 60, 480),
+                   [(group["hash"][:16], group["count"], path) for group in groups for path in group["paths"]])
+        self.status_var.set(f"{len(groups)} グループ" if groups else
+                            "重複はありません（ハッシュの記録には \"catalog\" の \"hash\": true が必要です）")
+
+
+class HistoryDialog:
+    """実行履歴の推移（処理速度と未処理の残り件数）を表示するダイアログ"""
+
+    # グラフの余白（左・上・右・下）
+    MARGIN = (60, 20, 60, 40)
+
+    def __init__(self, parent, history):
+        self.history = history
+
+        # ダイアログウィンドウ
+        self.dialog = tk.Toplevel(parent)
+        self.dialog.title("実行履歴")
+        self.dialog.geometry("720x420")
+        self.dialog.transient(parent)
+        self.dialog.grab_set()
+
+        # フレーム
+        frame = ttk.Frame(self.dialog, padding="10")
+        frame.pack(fill=tk.BOTH, expand=True)
+
+        # 集計単位
+        option_frame = ttk.Frame(frame)
+        option_frame.pack(fill=tk.X, pady=(0, 5))
+        self.period_var = tk.StringVar(value="day")
+        ttk.Radiobutton(option_frame, text="日ごと", variable=self.period_var, value="day",
+                        command=self.redraw).pack(side=tk.LEFT)
+        ttk.Radiobutton(option_frame, text="週ごと", variable=self.period_var, value="week",
+                        command=self.redraw).pack(side=tk.LEFT, padx=(10, 0))
+        ttk.Label(option_frame, text="青: 処理速度（件/秒）  橙: 未処理の残り件数").pack(side=tk.RIGHT)
+
+        # グラフ
+        self.canvas = tk.Canvas(frame, background="white", highlightthickness=0)
+        self.canvas.pack(fill=tk.BOTH, expand=True)
+        self.canvas.bind("<Configure>", lambda e: self.redraw())
+
+        self.summary_var = tk.StringVar()
+        ttk.Label(frame, textvariable=self.summary_var).pack(anchor=tk.W, pady=(5, 0))
+        ttk.Button(frame, text="閉じる", command=self.dialog.destroy).pack(anchor=tk.E)
+
+        self.dialog.bind("<Escape>", lambda e: self.dialog.destroy())
+
+        # モーダル表示
+        self.dialog.wait_window()
+
+    def redraw(self):
+        """集計を読み込んでグラフを描き直す"""
+        rows = self.history.aggregates(self.period_var.get())
+        canvas = self.canvas
+        canvas.delete("all")
+        if not rows:
+            self.summary_var.set("実行履歴がありません")
+            return
+
+        total_runs = sum(row["runs"] for row in rows)
+        total_moved = sum(row["moved_files"] for row in rows)
+        self.summary_var.set(f"{rows[0]['key']} 〜 {rows[-1]['key']}: 実行 {total_runs} 回, 移動 {total_moved} 件")
+
+        left, top, right, bottom = self.MARGIN
+        width = canvas.winfo_width() - left - right
+        height = canvas.winfo_height() - top - bottom
+        if width <= 0 or height <= 0:
+            return
+        canvas.create_rectangle(left, top, left + width, top + height, outline="#cccccc")
+
+        step = width / max(1, len(rows) - 1)
+        xs = [left + step * i if len(rows) > 1 else left + width / 2 for i in range(len(rows))]
+        self._draw_series(xs, [row["throughput"] for row in rows], "#1f77b4", left, "e", top, height)
+        self._draw_series(xs, [row["remaining_files"] for row in rows], "#ff7f0e", left + width, "w", top, height)
+
+        # 横軸のラベル（重ならないよう間引く）
+        every = max(1, len(rows) // 8)
+        for i in range(0, len(rows), every):
+            canvas.create_text(xs[i], top + height + 5, text=rows[i]["key"][5:], anchor="n", font=("", 8))
+
+    def _draw_series(self, xs, values, color, axis_x, anchor, top, height):
+        """折れ線と縦軸の目盛り（最大値）を描く"""
+        maximum = max(values) or 1
+        points = []
+        for x, value in zip(xs, values):
+            y = top + height - value / maximum * height
+            points.extend((x, y))
+            self.canvas.create_oval(x - 2, y - 2, x + 2, y + 2, fill=color, outline=color)
+        if len(points) >= 4:
+            self.canvas.create_line(*points, fill=color, width=2)
+        offset = -5 if anchor == "e" else 5
+        self.canvas.create_text(axis_x + offset, top, text=f"{maximum:,.1f}", anchor=anchor, fill=color,
+                                font=("", 8))
+        self.canvas.create_text(axis_x + offset, top + height, text="0", anchor=anchor, fill=color, font=("", 8))
+
+
+class RuleAnalysisDialog:
+    """ルール診断の結果表示ダイアログ（選択したルールのインデックスを result に返す）"""
+
+    def __init__(self, parent, results, runs):
+        from analyzer import KIND_LABELS
+
+        self.result = None
+        self.results = results
+
+        # ダイアログウィンドウ
+        self.dialog = tk.Toplevel(parent)
+        self.dialog.title("ルール診断")
+        self.dialog.geometry("700x400")
+        self.dialog.transient(parent)
+        self.dialog.grab_set()
+
+        # フレーム
+        frame = ttk.Frame(self.dialog, padding="10")
+        frame.pack(fill=tk.BOTH, expand=True)
+        frame.columnconfigure(0, weight=1)
+        frame.rowconfigure(1, weight=1)
+
+        dead = sum(1 for result in results if result["kind"] != "never_hit")
+        status = f"重複・隠れているルール: {dead} 件（選択済み）"
+        if runs:
+            status += f" / 直近 {runs} 回の実行で一致なし: {len(results) - dead} 件"
+        else:
+            status += " / 実行履歴がないため、一致しないルールは調べていません"
+        ttk.Label(frame, text=status).grid(row=0, column=0, sticky=tk.W, pady=(0, 5))
+
+        self.tree = ttk.Treeview(frame, columns=("number", "pattern", "kind", "detail"), show="headings")
+        for column, text, width in (("number", "No.", 50), ("pattern", "条件", 200),
+                                    ("kind", "診断", 100), ("detail", "理由", 300)):
+            self.tree.heading(column, text=text)
+            self.tree.column(column, width=width)
+        scrollbar = ttk.Scrollbar(frame, orient=tk.VERTICAL, command=self.tree.yview)
+        self.tree.configure(yscroll=scrollbar.set)
+        self.tree.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        scrollbar.grid(row=1, column=1, sticky=(tk.N, tk.S))
+
+        for result in results:
+            if result["kind"] == "never_hit":
+                detail = f"直近 {runs} 回の実行で一度も一致していません"
+            else:
+                detail = f"先に並ぶ「{result['by']}」に一致するため使われません"
+            item = self.tree.insert("", tk.END, values=(result["index"] + 1, result["pattern"],
+                                                        KIND_LABELS[result["kind"]], detail))
+            if result["kind"] != "never_hit":
+                self.tree.selection_add(item)
+
+        # ボタン
+        button_frame = ttk.Frame(frame)
+        button_frame.grid(row=2, column=0, columnspan=2, sticky=tk.E, pady=(10, 0))
+        ttk.Button(button_frame, text="選択したルールを削除", command=self.prune).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(button_frame, text="閉じる", command=self.dialog.destroy).pack(side=tk.LEFT)
+
+        self.dialog.bind("<Escape>", lambda e: self.dialog.destroy())
+
+        # モーダル表示
+        self.dialog.wait_window()
+
+    def prune(self):
+        """選択したルールを削除して閉じる"""
+        selection = self.tree.selection()
+        if not selection:
+            messagebox.showwarning("警告", "削除するルールを選択してください", parent=self.dialog)
+            return
+        if not messagebox.askyesno("確認", f"選択した {len(selection)} 件のルールを削除しますか？", parent=self.dialog):
+            return
+        self.result = [self.results[self.tree.index(item)]["index"] for item in selection]
+        self.dialog.destroy()
+
+
+class ImportModeDialog:
+    """ルール一括読み込みのモード選択ダイアログ"""
+
+    def __init__(self, parent):
+        self.result = None
+
+        # ダイアログウィンドウ
+        self.dialog = tk.Toplevel(parent)
+        self.dialog.title("読み込み方法を選択")
+        self.dialog.transient(parent)
+        self.dialog.grab_set()
+
+        # フレーム
+        frame = ttk.Frame(self.dialog, padding="10")
+        frame.pack(fill=tk.BOTH, expand=True)
+
+        self.mode_var = tk.StringVar(value="merge")
+        ttk.Radiobutton(frame, text="追加（同じ条件の既存ルールはそのまま）",
+                        variable=self.mode_var, value="merge").pack(anchor=tk.W)
+        ttk.Radiobutton(frame, text="追加・更新（同じ条件の既存ルールは振り分け先を更新）",
+                        variable=self.mode_var, value="upsert").pack(anchor=tk.W)
+        ttk.Radiobutton(frame, text="置き換え（既存のルールをすべて削除）",
+                        variable=self.mode_var, value="replace").pack(anchor=tk.W)
+
+        # ボタン
+        button_frame = ttk.Frame(frame)
+        button_frame.pack(anchor=tk.E, pady=(10, 0))
+        ttk.Button(button_frame, text="OK", command=self.ok).pack(side=tk.LEFT, padx=(0, 5))
+        ttk.Button(button_frame, text="キャンセル", command=self.cancel).pack(side=tk.LEFT)
+
+        self.dialog.bind("<Return>", lambda e: self.ok())
+        self.dialog.bind("<Escape>", lambda e: self.cancel())
+
+        # ダイアログを中央に配置
+        self.dialog.update_idletasks()
+        x = (self.dialog.winfo_screenwidth() // 2) - (self.dialog.winfo_width() // 2)
+        y = (self.dialog.winfo_screenheight() // 2) - (self.dialog.winfo_height() // 2)
+        self.dialog.geometry(f"+{x}+{y}")
+
+        # モーダル表示
+        self.dialog.wait_window()
+
+    def ok(self):
+        """OKボタン処理"""
+        if self.mode_var.get() == "replace" and not messagebox.askyesno(
+            "確認", "既存のルールをすべて置き換えますか？", parent=self.dialog
+        ):
+            return
+        self.result = self.mode_var.get()
         self.dialog.destroy()
 
     def cancel(self):
@@ -572,4 +1181,6 @@ def main():
 
 
 if __name__ == "__main__":
+    # EXE 化した場合に、プロセスプールのワーカーが GUI を起動しないようにする
+    multiprocessing.freeze_support()
     main()
@@ -0,0 +1,272 @@
+"""
+PicSort - 振り分けルールのマッチング
+ファイル名に含まれるパターンを調べ、最初に（ルールの並び順で）マッチしたルールを返します。
+ルール数が多い場合は全パターンをまとめたオートマトン（Aho-Corasick 法）を使い、
+ルール数に関係なくファイル名の長さに比例した時間で判定します。
+正規化を有効にすると、全角・半角や NFC・NFD、大文字・小文字の違いを無視して照合します。
+ルールに追加条件（拡張子・サイズ・経過時間）がある場合は、安い判定から順に行い、
+条件に合わないルールは文字列を照合する前に除外します。
+"""
+
+from __future__ import annotations
+
+import os
+import time
+import unicodedata
+from collections import deque
+
+# typing の読み込みを避けるため（CLI の起動時間）、型ヒントは型チェック時のみ読み込む
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Any, Callable, Dict, List, Optional
+
+# この数以上のルールがある場合にオートマトンを使う（少ない場合は in 演算子の方が速い）
+AUTOMATON_THRESHOLD = 32
+
+# 正規化キャッシュの上限（超えたら作り直してメモリ使用量を一定に保つ）
+NORMALIZE_CACHE_SIZE = 65536
+
+_NO_MATCH = float("inf")
+
+
+def normalize_text(text: str) -> str:
+    """全角・半角、NFC・NFD、大文字・小文字の違いを吸収した文字列に変換"""
+    return unicodedata.normalize("NFKC", text).casefold()
+
+
+class PatternAutomaton:
+    """複数パターンの部分文字列検索（Aho-Corasick 法）"""
+
+    def __init__(self, patterns: List[str]):
+        """
+        初期化
+
+        Args:
+            patterns: パターンのリスト（インデックスが優先順位）
+        """
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # 各状態で見つかるパターンのうち最小のインデックス
+        self._first: List[float] = [_NO_MATCH]
+
+        for index, pattern in enumerate(patterns):
+            state = 0
+            for ch in pattern:
+                next_state = self._goto[state].get(ch)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][ch] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._first.append(_NO_MATCH)
+                state = next_state
+            if index < self._first[state]:
+                self._first[state] = index
+
+        # 幅優先で失敗リンクを張り、接尾辞で見つかるパターンも伝播させる
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                if self._first[self._fail[next_state]] < self._first[next_state]:
+                    self._first[next_state] = self._first[self._fail[next_state]]
+
+    def first_match(self, text: str) -> Optional[int]:
+        """
+        text に含まれるパターンのうち最小のインデックスを返す
+
+        Returns:
+            パターンのインデックス（どれも含まれない場合は None）
+        """
+        goto = self._goto
+        fail = self._fail
+        first = self._first
+        best = first[0]
+        state = 0
+        for ch in text:
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if first[state] < best:
+                best = first[state]
+                if best == 0:
+                    break
+        return None if best == _NO_MATCH else int(best)
+
+
+# 追加条件の数値の項目
+NUMERIC_CONDITIONS = ("min_size_kb", "max_size_kb", "min_age_minutes", "max_age_minutes")
+
+
+def check_conditions(conditions: Any) -> str:
+    """
+    追加条件の値を検証（問題なければ空文字、あれば理由）
+
+    設定ファイルや CSV から読み込んだ条件は、文字列の "5" などがそのまま RuleConditions に渡ると
+    照合できなくなるため、読み込み時に型を確認します。
+    """
+    if not isinstance(conditions, dict):
+        return "追加条件はオブジェクト（{...}）で指定してください"
+    for key, value in conditions.items():
+        if key == "extensions":
+            if not isinstance(value, list) or not all(isinstance(ext, str) for ext in value):
+                return f"extensions は文字列のリストで指定してください: {value!r}"
+        elif key in NUMERIC_CONDITIONS:
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not value >= 0:
+                return f"{key} は 0 以上の数値で指定してください: {value!r}"
+        else:
+            return f"不明な追加条件です: {key}（使用可能: extensions, {', '.join(NUMERIC_CONDITIONS)}）"
+    return ""
+
+
+class RuleConditions:
+    """
+    ルールの追加条件
+
+    conditions の項目（すべて省略可能）:
+        extensions: 拡張子のリスト（例: ["png", "jpg"]）
+        min_size_kb / max_size_kb: サイズの下限・上限（KB）
+        min_age_minutes / max_age_minutes: 更新日時からの経過時間の下限・上限（分）
+    """
+
+    def __init__(self, conditions: Dict[str, Any], now: float):
+        """
+        初期化
+
+        Args:
+            conditions: ルールの "conditions"
+            now: 経過時間の基準にする時刻（実行開始時）
+        """
+        extensions = conditions.get("extensions") or []
+        self.extensions = frozenset("." + ext.lower().lstrip(".") for ext in extensions) or None
+        self.min_size = int(conditions.get("min_size_kb", 0) * 1024)
+        self.max_size = int(conditions.get("max_size_kb", 0) * 1024)
+        # 経過時間は更新日時の上限・下限に変換しておく
+        min_age = conditions.get("min_age_minutes", 0)
+        max_age = conditions.get("max_age_minutes", 0)
+        self.mtime_before = now - min_age * 60 if min_age else None
+        self.mtime_after = now - max_age * 60 if max_age else None
+        self.needs_stat = bool(self.min_size or self.max_size
+                               or self.mtime_before is not None or self.mtime_after is not None)
+
+    def accepts(self, ext: str, get_stat: Optional[Callable[[], os.stat_result]]) -> bool:
+        """
+        条件を満たすかどうか（拡張子 → サイズ → 経過時間の順に判定）
+
+        Args:
+            ext: 小文字にした拡張子（"." を含む）
+            get_stat: ファイルの stat を返す関数（走査時に取得済みのもの。None ならサイズ・経過時間は判定しない）
+        """
+        if self.extensions is not None and ext not in self.extensions:
+            return False
+        if not self.needs_stat or get_stat is None:
+            return True
+        try:
+            st = get_stat()
+        except OSError:
+            return False
+        if self.min_size and st.st_size < self.min_size:
+            return False
+        if self.max_size and st.st_size > self.max_size:
+            return False
+        if self.mtime_before is not None and st.st_mtime > self.mtime_before:
+            return False
+        if self.mtime_after is not None and st.st_mtime < self.mtime_after:
+            return False
+        return True
+
+
+class RuleMatcher:
+    """振り分けルールの照合（実行ごとに1回作成する）"""
+
+    def __init__(self, rules: List[Dict[str, Any]], normalize: bool = False):
+        """
+        初期化
+
+        Args:
+            rules: "pattern" キーを持つルールのリスト（先頭ほど優先）
+            normalize: True なら NFKC 正規化 + 大文字小文字を無視して照合する
+        """
+        self.rules = rules
+        self.normalize = normalize
+        # パターンは作成時に一度だけ正規化しておく
+        self.patterns = [normalize_text(rule["pattern"]) if normalize else rule["pattern"] for rule in rules]
+        self._automaton = PatternAutomaton(self.patterns) if len(self.patterns) >= AUTOMATON_THRESHOLD else None
+        self._normalized: Dict[str, str] = {}
+        # 追加条件（条件のないルールは None。経過時間は作成時の時刻を基準にする）
+        now = time.time()
+        self.conditions = [RuleConditions(rule["conditions"], now) if rule.get("conditions") else None
+                           for rule in rules]
+        self.has_conditions = any(condition is not None for condition in self.conditions)
+        # 照合に stat（サイズ・更新日時）が必要かどうか
+        self.needs_stat = any(condition is not None and condition.needs_stat for condition in self.conditions)
+
+    def normalize_filename(self, filename: str) -> str:
+        """ファイル名を正規化（同じ実行中はキャッシュを使う）"""
+        normalized = self._normalized.get(filename)
+        if normalized is None:
+            if len(self._normalized) >= NORMALIZE_CACHE_SIZE:
+                self._normalized.clear()
+            normalized = self._normalized[filename] = normalize_text(filename)
+        return normalized
+
+    def match_index(self, filename: str,
+                    get_stat: Optional[Callable[[], os.stat_result]] = None) -> Optional[int]:
+        """
+        最初にマッチしたルールのインデックスを返す（マッチしない場合は None）
+
+        Args:
+            get_stat: ファイルの stat を返す関数（サイズ・経過時間の条件があるルールの判定に使う）
+        """
+        if self.normalize:
+            filename = self.normalize_filename(filename)
+        if self.has_conditions:
+            return self._match_with_conditions(filename, get_stat)
+        if self._automaton is not None:
+            return self._automaton.first_match(filename)
+        for index, pattern in enumerate(self.patterns):
+            if pattern in filename:
+                return index
+        return None
+
+    def _match_with_conditions(self, filename: str,
+                               get_stat: Optional[Callable[[], os.stat_result]]) -> Optional[int]:
+        """追加条件のあるルールを含めて照合（条件は文字列の照合より先に判定する）"""
+        start = 0
+        if self._automaton is not None:
+            # 条件を無視して最初に一致するルールより前のルールは、条件に関係なく一致しない
+            start = self._automaton.first_match(filename)
+            if start is None:
+                return None
+        ext = os.path.splitext(filename)[1].lower()
+        if get_stat is not None:
+            # stat は1ファイルにつき1回だけ取得する
+            cache: List[os.stat_result] = []
+
+            def cached_stat() -> os.stat_result:
+                if not cache:
+                    cache.append(get_stat())
+                return cache[0]
+        else:
+            cached_stat = None
+        conditions = self.conditions
+        patterns = self.patterns
+        for index in range(start, len(patterns)):
+            condition = conditions[index]
+            if condition is not None and not condition.accepts(ext, cached_stat):
+                continue
+            if patterns[index] in filename:
+                return index
+        return None
+
+    def match(self, filename: str,
+              get_stat: Optional[Callable[[], os.stat_result]] = None) -> Optional[Dict[str, Any]]:
+        """最初にマッチしたルールを返す（マッチしない場合は None）"""
+        index = self.match_index(filename, get_stat)
+        return None if index is None else self.rules[index]
@@ -1,13 +1,143 @@
 """
 PicSort - 画像ファイル自動振り分けツールのコアロジック
+CLI の起動時間を短くするため、typing・datetime・shutil は読み込まず（型ヒントは文字列のまま評価しない）、
+必要になった時点で読み込みます。
 """
 
+from __future__ import annotations
+
 import os
 import json
-import shutil
-from datetime import datetime
-from pathlib import Path
-from typing import List, Dict, Optional, Callable
+import time
+
+from matcher import RuleMatcher
+from templates import DestinationTemplate
+
+# typing の読み込みを避けるため、typing.TYPE_CHECKING の代わりに定義（型チェッカーは True とみなす）
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+    from typing import Any, AsyncIterator, Iterable, Iterator, List, Dict, Optional, Callable, Tuple
+
+# 非同期走査で一度に executor から受け取るエントリ数
+SCAN_BATCH_SIZE = 256
+
+# メモリ節約モードで進捗をログに出す間隔（ファイル数）
+PROGRESS_INTERVAL = 10000
+
+# 前回の実行結果と取り消し用の移動履歴（設定ファイルと同じフォルダに保存）
+LAST_RUN_FILE = "last_run.json"
+JOURNAL_FILE = "last_run_moves.jsonl"
+# リンク方式で作成済みのリンク一覧
+LINK_INDEX_FILE = "link_index.json"
+LINK_LABELS = {"hardlink": "リンク作成", "reflink": "複製作成", "copy": "コピー"}
+# 実行上限で処理しきれなかったファイルの一覧
+BACKLOG_FILE = "backlog.jsonl"
+# 展開済みのアーカイブ一覧（元のアーカイブを残す設定のとき）
+ARCHIVE_INDEX_FILE = "archive_index.json"
+# ファイルの種類の判定結果のキャッシュ
+TYPE_CACHE_FILE = "type_cache.json"
+# カタログに記録するハッシュをまとめて計算する件数（大きなファイルはプロセスプールで並列に計算）
+CATALOG_HASH_BATCH = 64
+
+# 非同期 API が既定で使う共有 Executor
+_shared_executor = None
+
+
+def _link_source_exists(key: str) -> bool:
+    """リンク一覧のキー（パス・サイズ・更新日時）の元ファイルが、記録したときのまま残っているかどうか"""
+    path, size, mtime_ns = key.rsplit("|", 2)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    return str(st.st_size) == size and str(st.st_mtime_ns) == mtime_ns
+
+
+def _priority_per_thread() -> bool:
+    """CPU・I/O 優先度がスレッドごとに設定される OS かどうか（Linux）"""
+    import sys
+    return sys.platform.startswith("linux")
+
+
+def get_shared_executor() -> "Executor":
+    """ファイル操作用の共有 ThreadPoolExecutor を取得（初回呼び出し時に生成）"""
+    global _shared_executor
+    if _shared_executor is None:
+        from concurrent.futures import ThreadPoolExecutor
+        _shared_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="picsort-io")
+    return _shared_executor
+
+
+def merge_stats(stats_list: Iterable[Dict[str, int]]) -> Dict[str, int]:
+    """複数回分の統計情報を合算"""
+    merged: Dict[str, int] = {}
+    for stats in stats_list:
+        for key, value in stats.items():
+            merged[key] = merged.get(key, 0) + value
+    return merged
+
+
+def _unique_profile_names(profiles: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    プロファイル名の重複を解消（2つ目以降に " (2)" のような番号を付ける）
+
+    プロファイルごとの統計情報は名前で区別するため、a/config.json と b/config.json のように
+    同じ名前になったプロファイルの結果が上書きされないようにします。
+    """
+    used = set()
+    for profile in profiles:
+        name = base = profile["name"]
+        counter = 2
+        while name in used:
+            name = f"{base} ({counter})"
+            counter += 1
+        profile["name"] = name
+        used.add(name)
+    return profiles
+
+
+def _shutil_move(source_path: str, destination_path: str):
+    """shutil.move（shutil は移動するときに初めて読み込む）"""
+    import shutil
+    return shutil.move(source_path, destination_path)
+
+
+def _retry_record(item: Dict[str, Any]) -> Dict[str, Any]:
+    """再試行の項目のうち、次回の実行に持ち越す項目"""
+    return {key: item[key] for key in ("source", "filename", "destination", "rule", "attempts")}
+
+
+def _iter_files(folder: str) -> Iterator[os.DirEntry]:
+    """フォルダ直下の通常ファイルを逐次返す"""
+    with os.scandir(folder) as it:
+        for entry in it:
+            try:
+                if entry.is_file():
+                    yield entry
+            except OSError:
+                continue
+
+
+def _next_files(it, limit: int, with_stat: bool = False) -> List[os.DirEntry]:
+    """
+    scandir イテレータから通常ファイルを最大 limit 件取り出す
+
+    with_stat が True の場合は stat も取得してエントリにキャッシュさせる
+    """
+    entries = []
+    for entry in it:
+        try:
+            if not entry.is_file():
+                continue
+            if with_stat:
+                entry.stat()
+        except OSError:
+            continue
+        entries.append(entry)
+        if len(entries) >= limit:
+            break
+    return entries
 
 
 class Config:
@@ -43,6 +173,10 @@ class Config:
         except Exception as e:
             raise Exception(f"設定ファイル保存エラー: {e}")
 
+    def get_state_path(self, name: str) -> str:
+        """設定ファイルと同じフォルダに置く状態ファイルのパスを取得"""
+        return os.path.join(os.path.dirname(os.path.abspath(self.config_path)), name)
+
     def get_source_folder(self) -> str:
         """ソースフォルダのパスを取得"""
         return self.data.get("source_folder", "")
@@ -52,25 +186,229 @@ class Config:
         self.data["source_folder"] = path
         self.save()
 
+    def is_bounded_memory(self) -> bool:
+        """メモリ節約モードが有効かどうか"""
+        return bool(self.data.get("bounded_memory", False))
+
+    def is_normalize_match(self) -> bool:
+        """全角・半角や大文字・小文字を区別せずに照合するかどうか"""
+        return bool(self.data.get("normalize_match", False))
+
+    def set_normalize_match(self, enabled: bool):
+        """全角・半角や大文字・小文字を区別せずに照合するかを設定"""
+        self.data["normalize_match"] = enabled
+        self.save()
+
+    def get_log_settings(self) -> Dict[str, Any]:
+        """バックグラウンド実行時のログ設定を取得（未設定の項目は既定値）"""
+        settings = {
+            "path": "organizer.log",
+            "max_bytes": 1024 * 1024,
+            "backup_count": 5,
+            "max_age_days": 30,
+            "format": "text"
+        }
+        settings.update(self.data.get("log", {}))
+        return settings
+
+    def get_sort_mode(self) -> str:
+        """
+        振り分け方法を取得
+
+        "move"（移動）/ "hardlink"（ハードリンクを作成）/ "reflink"（コピーオンライト複製を作成）。
+        リンク方式ではソースフォルダのファイルはそのまま残ります。
+        """
+        return self.data.get("sort_mode", "move")
+
+    def is_verify_moves(self) -> bool:
+        """別ドライブへの移動を検証してから元ファイルを削除するかどうか"""
+        return bool(self.data.get("verify_moves", False))
+
+    def get_retry_settings(self) -> Dict[str, Any]:
+        """一時的な移動エラー（他のアプリによるロックなど）の再試行設定を取得"""
+        settings = {
+            "enabled": True,
+            "max_attempts": 4,
+            "base_delay": 0.5,
+            "max_delay": 8.0,
+            "max_queued": 1000
+        }
+        settings.update(self.data.get("retry", {}))
+        return settings
+
+    def get_type_filter(self) -> Dict[str, Any]:
+        """
+        ファイルの中身（先頭バイト）による種類の絞り込み設定を取得（未設定の項目は既定値 = 無効）
+
+        types に含まれる種類の画像だけを振り分けます。fix_extension を有効にすると、
+        中身と一致しない拡張子を移動時に付け替えます。
+        """
+        settings = {
+            "enabled": False,
+            "types": ["png", "jpeg", "gif", "webp", "bmp", "tiff", "avif", "heic"],
+            "fix_extension": False,
+            "workers": 8
+        }
+        settings.update(self.data.get("type_filter", {}))
+        return settings
+
+    def get_history_settings(self) -> Dict[str, Any]:
+        """実行履歴の設定を取得（max_runs は保持する実行記録の件数）"""
+        settings = {
+            "enabled": True,
+            "max_runs": 10000
+        }
+        settings.update(self.data.get("history", {}))
+        return settings
+
+    def get_io_limits(self) -> Dict[str, Any]:
+        """移動処理の I/O 予算を取得（未設定の項目は既定値 = 制限なし）"""
+        limits = {
+            "bytes_per_sec": 0,
+            "ops_per_sec": 0,
+            "low_priority": False,
+            "adaptive": False
+        }
+        limits.update(self.data.get("io_limits", {}))
+        return limits
+
+    def get_run_limits(self) -> Dict[str, Any]:
+        """
+        1回の実行の上限と処理順序を取得（未設定の項目は既定値 = 制限なし）
+
+        order は "none"（走査順）/ "newest"（更新日時の新しい順）/ "oldest"（古い順）
+        """
+        limits = {
+            "max_files": 0,
+            "max_bytes": 0,
+            "max_seconds": 0,
+            "order": "none"
+        }
+        limits.update(self.data.get("run_limits", {}))
+        return limits
+
+    def get_destination_index_settings(self) -> Dict[str, Any]:
+        """
+        振り分け先フォルダの索引の設定を取得（未設定の項目は既定値 = 無効）
+
+        skip_sorted を有効にすると、振り分け先に同じ名前・サイズ・更新日時のファイルがあるファイルは
+        振り分け済みとして移動しません。
+        """
+        settings = {
+            "enabled": False,
+            "workers": 8,
+            "skip_sorted": False
+        }
+        settings.update(self.data.get("destination_index", {}))
+        return settings
+
+    def get_transcode_settings(self) -> Dict[str, Any]:
+        """
+        画像の再圧縮の設定を取得（再圧縮する形式はルールごとに "transcode" で指定）
+
+        workers は再圧縮に使うプロセス数。
+        """
+        settings = {
+            "workers": 2
+        }
+        settings.update(self.data.get("transcode", {}))
+        return settings
+
+    def get_shard_settings(self) -> Dict[str, Any]:
+        """
+        複数プロセスによる振り分けの設定を取得（未設定の項目は既定値 = 無効）
+
+        workers が 2 以上で、ソースフォルダのファイル数が min_files 以上のときに使います。
+        """
+        settings = {
+            "workers": 0,
+            "min_files": 20000
+        }
+        settings.update(self.data.get("shards", {}))
+        return settings
+
+    def get_archive_settings(self) -> Dict[str, Any]:
+        """
+        ZIP アーカイブ内の画像の振り分け設定を取得（未設定の項目は既定値 = 無効）
+
+        original は振り分け後の元のアーカイブの扱い:
+        "keep"（そのまま残す）/ "delete"（すべて書き出せたら削除）/ "move"（アーカイブ名に一致したルールで移動）
+        """
+        settings = {
+            "enabled": False,
+            "extensions": [".png", ".jpg", ".jpeg", ".gif", ".webp", ".bmp"],
+            "workers": 4,
+            "original": "keep"
+        }
+        settings.update(self.data.get("archives", {}))
+        return settings
+
+    def get_catalog_settings(self) -> Dict[str, Any]:
+        """振り分けたファイルのカタログ設定を取得（hash を有効にすると重複ファイルも検索できる）"""
+        settings = {
+            "enabled": False,
+            "hash": False
+        }
+        settings.update(self.data.get("catalog", {}))
+        return settings
+
     def get_mappings(self) -> List[Dict[str, str]]:
         """振り分けルールのリストを取得"""
         return self.data.get("mappings", [])
 
-    def add_mapping(self, pattern: str, destination: str):
-        """振り分けルールを追加"""
-        self.data["mappings"].append({
+    def has_profiles(self) -> bool:
+        """複数プロファイルが定義されているかどうか"""
+        return bool(self.data.get("profiles"))
+
+    def get_profiles(self) -> List[Dict[str, Any]]:
+        """
+        プロファイル（名前・ソースフォルダ・振り分けルールの組）のリストを取得
+
+        "profiles" が定義されていない場合は、この設定ファイル全体を1つのプロファイルとして返します。
+        """
+        profiles = self.data.get("profiles")
+        if not profiles:
+            return [{
+                "name": os.path.splitext(os.path.basename(self.config_path))[0],
+                "source_folder": self.get_source_folder(),
+                "mappings": self.get_mappings()
+            }]
+        return _unique_profile_names([{
+            "name": profile.get("name") or f"profile{i + 1}",
+            "source_folder": profile.get("source_folder", ""),
+            "mappings": profile.get("mappings", [])
+        } for i, profile in enumerate(profiles)])
+
+    @classmethod
+    def load_profiles(cls, config_paths: List[str]) -> List[Dict[str, Any]]:
+        """複数の設定ファイルからプロファイルをまとめて読み込む（同じ名前のプロファイルには番号を付ける）"""
+        profiles = []
+        for path in config_paths:
+            profiles.extend(cls(path).get_profiles())
+        return _unique_profile_names(profiles)
+
+    def add_mapping(self, pattern: str, destination: str, conditions: Optional[Dict[str, Any]] = None):
+        """振り分けルールを追加（conditions は拡張子・サイズ・経過時間の追加条件）"""
+        mapping = {
             "pattern": pattern,
             "destination": destination
-        })
+        }
+        if conditions:
+            mapping["conditions"] = conditions
+        self.data["mappings"].append(mapping)
         self.save()
 
-    def update_mapping(self, index: int, pattern: str, destination: str):
-        """振り分けルールを更新"""
+    def update_mapping(self, index: int, pattern: str, destination: str,
+                       conditions: Optional[Dict[str, Any]] = None):
+        """振り分けルールを更新（conditions が空なら追加条件を削除）"""
         if 0 <= index < len(self.data["mappings"]):
-            self.data["mappings"][index] = {
-                "pattern": pattern,
-                "destination": destination
-            }
+            # 再圧縮などの追加の設定は引き継ぐ
+            mapping = dict(self.data["mappings"][index], pattern=pattern, destination=destination)
+            if conditions:
+                mapping["conditions"] = conditions
+            else:
+                mapping.pop("conditions", None)
+            self.data["mappings"][index] = mapping
             self.save()
 
     def delete_mapping(self, index: int):
@@ -93,13 +431,121 @@ class FileOrganizer:
         """
         self.config = config
         self.log_callback = log_callback or print
+        self._hasher = None
+        # False の場合はファイルごとのログを省略する（メモリ節約モード）
+        self.log_each_file = True
+        self._journal = None
+        self._run_started = None
+        self._run_context = None
+        self._throttle = None
+        self._device_cache: Dict[str, int] = {}
+        # 振り分け方法と、リンク方式で作成済みのリンク（元ファイルのキー → 作成先）
+        self._sort_mode = "move"
+        self._link_index: Optional[Dict[str, str]] = None
+        self._archives: Optional[Dict[str, Any]] = None
+        self._archive_index: Optional[Dict[str, int]] = None
+        # 振り分けたファイルのカタログ（有効な場合のみ実行中に開く）
+        self._catalog = None
+        self._catalog_hash = False
+        # ハッシュの計算待ちのカタログ項目（CATALOG_HASH_BATCH 件ごとにまとめて計算する）
+        self._catalog_pending: List[Tuple[str, str, Optional[str], str]] = []
+        self._catalog_lock = None
+        # 別ドライブへの移動の検証（有効な場合のみ実行中に作成）
+        self._verifier = None
+        # ファイルの種類による絞り込み（有効な場合のみ実行中に作成）
+        self._sniffer = None
+        self._type_filter: Dict[str, Any] = {}
+        # 振り分け先フォルダの索引（有効な場合のみ実行中に開く）
+        self._dest_index = None
+        self._skip_sorted = False
+        # 画像の再圧縮（再圧縮するルールがある場合のみ実行中に作成）と、ルールの条件 → 再圧縮の設定
+        self._transcoder = None
+        self._transcode_rules: Dict[str, Dict[str, Any]] = {}
+        # 一時的なエラーの再試行キューと、次回に持ち越す項目（一定件数を超えたら一時ファイルに退避）・再試行中の元ファイル
+        self._retry = None
+        self._retry_carry = None
+        self._retry_sources: set = set()
+        # 実行履歴用の処理段階ごとの所要時間とルールごとの移動数
+        self._phases: Dict[str, float] = {}
+        self._phase_mark = 0.0
+        self._rule_hits: Dict[str, int] = {}
+        # ファイルの移動に使う関数（テストでは差し替えてエラーを注入できる）
+        self.move_func: Callable[[str, str], Any] = _shutil_move
+        # 振り分け先の書式 → コンパイル済みテンプレート
+        self._templates: Dict[str, DestinationTemplate] = {}
 
     def log(self, message: str):
         """ログを出力"""
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
         log_message = f"[{timestamp}] {message}"
         self.log_callback(log_message)
 
+    def get_hasher(self):
+        """
+        ハッシュ計算サービスを取得（初回呼び出し時に生成）
+
+        Returns:
+            キャッシュを設定ファイルの隣に保存する FileHasher
+        """
+        if self._hasher is None:
+            from hashing import FileHasher
+            self._hasher = FileHasher(cache_path=self.config.get_state_path("hash_cache.json"))
+        return self._hasher
+
+    def close(self):
+        """ハッシュキャッシュなどの後片付け"""
+        if self._hasher is not None:
+            self._hasher.close()
+            self._hasher = None
+
+    def _new_stats(self) -> Dict[str, int]:
+        """統計情報の初期値"""
+        return {
+            "total_files": 0,
+            "moved_files": 0,
+            "skipped_files": 0,
+            "errors": 0,
+            "remaining_files": 0,
+            "extracted_files": 0,
+            "moved_bytes": 0,
+            "transcoded_files": 0,
+            "saved_bytes": 0
+        }
+
+    def _get_template(self, destination: str) -> DestinationTemplate:
+        """振り分け先テンプレートを取得（同じ書式は1回だけコンパイル）"""
+        template = self._templates.get(destination)
+        if template is None:
+            template = self._templates[destination] = DestinationTemplate(destination)
+        return template
+
+    def _check_templates(self, rules: List[Dict[str, Any]]) -> bool:
+        """全ルールの振り分け先テンプレートを検証（誤りがあればログに出して False）"""
+        for rule in rules:
+            try:
+                self._get_template(rule["destination"])
+            except ValueError as e:
+                self.log(f"エラー: 振り分け先の書式が正しくありません: {rule['destination']} ({e})")
+                return False
+        return True
+
+    def _destination_for(self, mapping: Dict[str, Any], entry: os.DirEntry,
+                         st: Optional[os.stat_result] = None) -> str:
+        """
+        ファイルごとの振り分け先フォルダを決定
+
+        テンプレートに更新日時が含まれる場合のみ、走査時に取得済みの stat を使います。
+        """
+        template = self._get_template(mapping["destination"])
+        if template.is_static:
+            return template.template
+        mtime = (st or entry.stat()).st_mtime if template.needs_mtime else None
+        return template.render(entry.name, mapping["pattern"], mtime)
+
+    def _build_matcher(self, rules: List[Dict[str, Any]]) -> RuleMatcher:
+        """設定に合わせたマッチャーを作成（実行ごとに1回）"""
+        return RuleMatcher(rules, normalize=self.config.is_normalize_match())
+
     def organize(self) -> Dict[str, int]:
         """
         ファイルを振り分ける
@@ -107,15 +553,13 @@ class FileOrganizer:
         Returns:
             統計情報（移動したファイル数、エラー数など）
         """
+        if self.config.has_profiles():
+            return merge_stats(self.organize_profiles().values())
+
         source_folder = self.config.get_source_folder()
         mappings = self.config.get_mappings()
 
-        stats = {
-            "total_files": 0,
-            "moved_files": 0,
-            "skipped_files": 0,
-            "errors": 0
-        }
+        stats = self._new_stats()
 
         if not source_folder or not os.path.exists(source_folder):
             self.log(f"エラー: ソースフォルダが存在しません: {source_folder}")
@@ -125,50 +569,1411 @@ class FileOrganizer:
             self.log("警告: 振り分けルールが設定されていません")
             return stats
 
+        if not self._check_templates(mappings):
+            return stats
+
         self.log(f"振り分け開始: {source_folder}")
 
-        # ソースフォルダ内のファイルを走査
+        bounded = self.config.is_bounded_memory()
+        self.log_each_file = not bounded
+        self._begin_run()
+
         try:
-            files = [f for f in os.listdir(source_folder)
-                    if os.path.isfile(os.path.join(source_folder, f))]
-            stats["total_files"] = len(files)
+            self._load_retries(stats)
+            limits = self.config.get_run_limits()
+            if limits["max_files"] or limits["max_bytes"] or limits["max_seconds"] or limits["order"] != "none":
+                self._organize_limited(source_folder, self._build_matcher(mappings), stats, limits, bounded)
+            elif not self._organize_sharded(source_folder, mappings, stats):
+                self._organize_all(source_folder, self._build_matcher(mappings), stats, bounded)
+            self._mark_phase("scan_move")
+            self._process_retries(block=True)
+            self._mark_phase("retry")
+            if self._verifier is not None:
+                # 検証の失敗を結果に反映してから集計する
+                self._verifier.wait()
+                self._mark_phase("verify")
+            if self._transcoder is not None:
+                self._transcoder.wait()
+                self._mark_phase("transcode")
 
-            self.log(f"対象ファイル数: {len(files)}")
+            self.log(f"対象ファイル数: {stats['total_files']}")
+            self.log(f"振り分け完了: 移動={stats['moved_files']}, "
+                    f"スキップ={stats['skipped_files']}, エラー={stats['errors']}")
 
-            for filename in files:
-                source_path = os.path.join(source_folder, filename)
-                moved = False
+        except Exception as e:
+            self.log(f"エラー: ファイル走査中にエラーが発生: {e}")
+            stats["errors"] += 1
 
-                # 各マッピングルールをチェック
-                for mapping in mappings:
-                    pattern = mapping["pattern"]
-                    destination_folder = mapping["destination"]
+        finally:
+            self._end_run(stats)
 
-                    if pattern in filename:
-                        # パターンにマッチした場合、ファイルを移動
-                        try:
-                            self._move_file(source_path, destination_folder, filename)
-                            stats["moved_files"] += 1
-                            moved = True
-                            break
-                        except Exception as e:
-                            self.log(f"エラー: {filename} の移動に失敗: {e}")
-                            stats["errors"] += 1
-                            break
+        return stats
 
-                if not moved:
-                    stats["skipped_files"] += 1
+    def organize_profiles(self, profiles: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Dict[str, int]]:
+        """
+        複数プロファイルをまとめて振り分ける
 
-            self.log(f"振り分け完了: 移動={stats['moved_files']}, "
-                    f"スキップ={stats['skipped_files']}, エラー={stats['errors']}")
+        同じソースフォルダを使うプロファイルはフォルダの走査を1回にまとめ、
+        全プロファイルのルールを並び順（プロファイル順 → ルール順）で結合した
+        1つのマッチャーで判定します。
+
+        Args:
+            profiles: プロファイルのリスト（省略時は設定ファイルのプロファイル）
+
+        Returns:
+            プロファイル名ごとの統計情報
+        """
+        if profiles is None:
+            profiles = self.config.get_profiles()
+        else:
+            profiles = _unique_profile_names([dict(profile) for profile in profiles])
+        results = {profile["name"]: self._new_stats() for profile in profiles}
+
+        # ソースフォルダごとにプロファイルをまとめる
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for profile in profiles:
+            source_folder = profile["source_folder"]
+            if not source_folder or not os.path.exists(source_folder):
+                self.log(f"エラー: [{profile['name']}] ソースフォルダが存在しません: {source_folder}")
+                continue
+            key = os.path.normcase(os.path.abspath(source_folder))
+            groups.setdefault(key, []).append(profile)
+
+        bounded = self.config.is_bounded_memory()
+        self.log_each_file = not bounded
+        self._begin_run()
+        try:
+            if profiles:
+                # 持ち越した再試行の結果は先頭のプロファイルに数える
+                self._load_retries(results[profiles[0]["name"]])
+            for group in groups.values():
+                source_folder = group[0]["source_folder"]
+                rules = []
+                owners = []
+                for profile in group:
+                    rules.extend(profile["mappings"])
+                    owners.extend([results[profile["name"]]] * len(profile["mappings"]))
+                if not rules or not self._check_templates(rules):
+                    continue
+
+                names = ", ".join(profile["name"] for profile in group)
+                self.log(f"振り分け開始: {source_folder} ({names})")
+                matcher = self._build_matcher(rules)
+                total = 0
+                # 種類を判定する場合は、マッチしたファイルをまとめてから判定する
+                pending: List[Tuple[os.DirEntry, Dict[str, Any], Dict[str, int]]] = []
+                try:
+                    for entry in _iter_files(source_folder):
+                        total += 1
+                        index = matcher.match_index(entry.name, entry.stat)
+                        if index is not None and self._sniffer is not None:
+                            pending.append((entry, rules[index], owners[index]))
+                            if len(pending) >= SCAN_BATCH_SIZE:
+                                self._move_sniffed(pending)
+                                pending = []
+                        elif index is not None:
+                            destination_folder = self._destination_for(rules[index], entry)
+                            self._move_one(entry.path, entry.name, destination_folder, owners[index],
+                                           rules[index]["pattern"])
+                        if self._retry:
+                            self._process_retries()
+                    if pending:
+                        self._move_sniffed(pending)
+                except Exception as e:
+                    self.log(f"エラー: ファイル走査中にエラーが発生: {e}")
+                    results[group[0]["name"]]["errors"] += 1
+                self._mark_phase("scan_move")
+                self._process_retries(block=True)
+                self._mark_phase("retry")
+                if self._verifier is not None:
+                    self._verifier.wait()
+                    self._mark_phase("verify")
+                if self._transcoder is not None:
+                    self._transcoder.wait()
+                    self._mark_phase("transcode")
+
+                for profile in group:
+                    stats = results[profile["name"]]
+                    stats["total_files"] = total
+                    stats["skipped_files"] = total - stats["moved_files"]
+                    self.log(f"振り分け完了 [{profile['name']}]: 移動={stats['moved_files']}, "
+                             f"スキップ={stats['skipped_files']}, エラー={stats['errors']}")
+        finally:
+            self._end_run(merge_stats(results.values()))
+
+        return results
 
+    def _move_one(self, source_path: str, filename: str, destination_folder: str,
+                  stats: Dict[str, int], rule: Optional[str] = None,
+                  retry_item: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        1ファイルを移動して統計情報を更新
+
+        一時的なエラーで失敗した場合は再試行キューに入れ、他のファイルの処理を続けます。
+
+        Args:
+            rule: カタログに記録する条件
+            retry_item: 再試行キューから取り出した項目（再試行時のみ）
+
+        Returns:
+            移動できた場合、または再試行を予約した場合は True
+        """
+        if retry_item is None and source_path in self._retry_sources:
+            # 前回から持ち越した再試行で処理する
+            return True
+        try:
+            key, size, mtime_ns = self._source_info(source_path)
+            if key is not None and key in self._link_index:
+                # リンク方式で前回までに振り分け済み
+                return False
+            if self._skip_sorted and self._already_sorted(destination_folder, filename, size, mtime_ns):
+                return False
+            destination_path = self._move_file(source_path, destination_folder, filename, stats, rule)
         except Exception as e:
-            self.log(f"エラー: ファイル走査中にエラーが発生: {e}")
+            return self._schedule_retry(e, source_path, filename, destination_folder, stats, rule, retry_item)
+        if key is not None:
+            self._link_index[key] = destination_path
+        if self._dest_index is not None:
+            self._dest_index.update(destination_path, size, mtime_ns)
+        self._record_move(source_path, destination_path)
+        if self._transcoder is not None and rule in self._transcode_rules:
+            self._submit_transcode(filename, destination_path, rule, stats)
+        elif self._catalog is not None:
+            self._catalog_add(filename, destination_path, rule)
+        if rule is not None:
+            self._rule_hits[rule] = self._rule_hits.get(rule, 0) + 1
+        stats["moved_files"] += 1
+        stats["moved_bytes"] += size
+        return True
+
+    def _schedule_retry(self, error: Exception, source_path: str, filename: str, destination_folder: str,
+                        stats: Dict[str, int], rule: Optional[str] = None,
+                        retry_item: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        移動に失敗したファイルを、一時的なエラーなら再試行キューに入れる
+
+        Returns:
+            再試行を予約した場合は True（恒久的なエラーや次回の実行に持ち越した場合はエラーとして数えて False）
+        """
+        from retry import is_transient
+        if self._retry is not None and is_transient(error):
+            item = retry_item or {"source": source_path, "filename": filename,
+                                  "destination": destination_folder, "rule": rule, "attempts": 0}
+            item["attempts"] += 1
+            item["run_attempts"] = item.get("run_attempts", 0) + 1
+            item["stats"] = stats
+            due = self._retry.push(item)
+            if due is not None:
+                delay = max(0.0, due - self._retry.clock())
+                self.log(f"{filename} は使用中のため、{delay:.1f} 秒後に"
+                         f"再試行します（{item['attempts']} 回目）: {error}")
+                return True
+            # 再試行回数を使い切った場合やキューが一杯の場合は次回の実行に持ち越す
+            self._retry_carry.append(_retry_record(item))
+            self.log(f"エラー: {filename} は使用中のため移動できません。次回の実行で再試行します: {error}")
+        else:
+            self.log(f"エラー: {filename} の移動に失敗: {error}")
+            if os.path.exists(source_path):
+                # 次回の実行で改めて移動する（持ち越した再試行は保存時にまとめて数える）
+                stats["remaining_files"] += 1
+        stats["errors"] += 1
+        return False
+
+    def _process_retries(self, block: bool = False):
+        """
+        期限が来た再試行を処理
+
+        Args:
+            block: True なら再試行キューが空になるまで待ちながら処理する
+        """
+        queue = self._retry
+        if queue is None:
+            return
+        while True:
+            for item in queue.pop_due():
+                stats = item["stats"]
+                if not os.path.exists(item["source"]):
+                    # 待っている間に手動で移動・削除された
+                    stats["skipped_files"] += 1
+                    continue
+                if not self._move_one(item["source"], item["filename"], item["destination"], stats,
+                                      item["rule"], retry_item=item):
+                    stats["skipped_files"] += 1
+            if not block or not len(queue):
+                return
+            time.sleep(queue.next_due())
+
+    def _submit_transcode(self, filename: str, destination_path: str, rule: str, stats: Dict[str, int]):
+        """振り分けた画像の再圧縮を予約（完了後に移動履歴・カタログ・統計情報を更新する）"""
+        from transcode import DEFAULT_QUALITY, needs_transcode
+
+        settings = self._transcode_rules[rule]
+        fmt = settings.get("format", "webp")
+        if not needs_transcode(destination_path, fmt):
+            # 既に変換先の形式の画像はプロセスに送らずにそのまま記録する
+            if self._catalog is not None:
+                self._catalog_add(filename, destination_path, rule)
+            return
+        if self._verifier is not None:
+            # 検証中のファイルを書き換えないよう、検証の完了を待ってから再圧縮する
+            self._verifier.wait()
+
+        def on_done(result, error: Optional[BaseException]):
+            final_path = destination_path
+            if self._dest_index is not None:
+                self._dest_index.settle(destination_path)
+            if error is not None:
+                self.log(f"エラー: {os.path.basename(destination_path)} の再圧縮に失敗（元のまま残します）: {error}")
+            elif result is not None:
+                final_path, old_size, new_size = result
+                # 取り消し時は再圧縮後のファイルを元の場所に戻す
+                self._record_move(destination_path, final_path, mode="transcode")
+                if self._dest_index is not None:
+                    if final_path != destination_path:
+                        self._dest_index.release(destination_path)
+                    st = os.stat(final_path)
+                    self._dest_index.update(final_path, st.st_size, st.st_mtime_ns)
+                stats["transcoded_files"] += 1
+                stats["saved_bytes"] += old_size - new_size
+                if self.log_each_file:
+                    self.log(f"再圧縮: {os.path.basename(destination_path)} → {os.path.basename(final_path)} "
+                             f"({old_size:,} → {new_size:,} バイト)")
+            if self._catalog is not None:
+                self._catalog_add(filename, final_path, rule)
+
+        if self._dest_index is not None:
+            # 再圧縮によるフォルダの変更を、他のプロセスによる変更と区別する
+            self._dest_index.expect(destination_path)
+        self._transcoder.submit(destination_path, fmt, settings.get("quality", DEFAULT_QUALITY), on_done)
+
+    def _load_retries(self, stats: Dict[str, int]):
+        """前回の実行から持ち越した再試行をキューに入れる（すぐに再試行する）"""
+        from retry import RETRY_FILE
+
+        path = self.config.get_state_path(RETRY_FILE)
+        if self._retry is None or not os.path.exists(path):
+            return
+        now = self._retry.clock()
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                items = [json.loads(line) for line in f if line.strip()]
+        except (OSError, ValueError):
+            return
+        for item in items:
+            if os.path.exists(item["source"]):
+                item["stats"] = stats
+                # キューに入りきらない分は通常の走査で移動する
+                if self._retry.push(item, due=now) is not None:
+                    self._retry_sources.add(item["source"])
+        if self._retry_sources:
+            self.log(f"前回使用中だった {len(self._retry_sources)} 件を再試行します")
+
+    def _save_retries(self) -> int:
+        """再試行しきれなかった項目を次回の実行に持ち越し、その件数を返す"""
+        from retry import RETRY_FILE
+
+        path = self.config.get_state_path(RETRY_FILE)
+        for item in self._retry.drain():
+            self._retry_carry.append(_retry_record(item))
+        count = len(self._retry_carry)
+        if not count:
+            if os.path.exists(path):
+                os.remove(path)
+            return 0
+        self._retry_carry.dump(path)
+        return count
+
+    def _source_info(self, source_path: str) -> Tuple[Optional[str], int, int]:
+        """
+        移動前の元ファイルの情報（stat は1回だけ）
+
+        Returns:
+            (リンク方式で元ファイルを識別するキー（パス・サイズ・更新日時。移動方式では None）, サイズ, 更新日時（ナノ秒）)
+        """
+        st = os.stat(source_path)
+        if self._link_index is None:
+            return None, st.st_size, st.st_mtime_ns
+        return f"{source_path}|{st.st_size}|{st.st_mtime_ns}", st.st_size, st.st_mtime_ns
+
+    def _already_sorted(self, destination_folder: str, filename: str, size: int, mtime_ns: int) -> bool:
+        """振り分け先に同じ名前・サイズ・更新日時のファイルがあるかどうか（索引で判定）"""
+        if self._dest_index.lookup(destination_folder, filename) != (size, mtime_ns):
+            return False
+        if self.log_each_file:
+            self.log(f"振り分け済み: {filename} → {destination_folder}")
+        return True
+
+    def _organize_all(self, source_folder: str, matcher: RuleMatcher,
+                      stats: Dict[str, int], bounded: bool):
+        """ソースフォルダ内のファイルを走査しながら振り分ける（一覧は作らずに逐次処理する）"""
+        # 種類を判定する場合は、マッチしたファイルをまとめてから判定する
+        pending: List[Tuple[os.DirEntry, Dict[str, Any], Dict[str, int]]] = []
+        for entry in _iter_files(source_folder):
+            filename = entry.name
+            stats["total_files"] += 1
+            moved = False
+
+            if self._archives is not None and filename.lower().endswith(self._archives["archive_extensions"]):
+                moved = self._organize_archive(entry, matcher, stats)
+                mapping = None
+            else:
+                # 最初にマッチしたルールでファイルを移動
+                mapping = matcher.match(filename, entry.stat)
+            if mapping is not None and self._sniffer is not None:
+                pending.append((entry, mapping, stats))
+                if len(pending) >= SCAN_BATCH_SIZE:
+                    self._move_sniffed(pending)
+                    pending = []
+                continue
+            if mapping is not None:
+                moved = self._move_one(entry.path, filename, self._destination_for(mapping, entry), stats,
+                                       mapping["pattern"])
+
+            if not moved:
+                stats["skipped_files"] += 1
+
+            if bounded and stats["total_files"] % PROGRESS_INTERVAL == 0:
+                self.log(f"処理中: {stats['total_files']} 件 (移動={stats['moved_files']})")
+
+            if self._retry:
+                self._process_retries()
+
+        if pending:
+            self._move_sniffed(pending)
+
+    def _organize_sharded(self, source_folder: str, rules: List[Dict[str, Any]], stats: Dict[str, int]) -> bool:
+        """
+        ソースフォルダを複数のプロセスに分けて振り分ける
+
+        照合と移動はワーカープロセスで行い、移動履歴・カタログ・統計情報はこのプロセスでまとめて更新します。
+        ワーカーで移動に失敗したファイルは通常の経路でもう一度移動します（一時的なエラーは再試行キューへ）。
+
+        Returns:
+            振り分けた場合は True、設定が無効・ファイル数が少ない・対応しない機能が有効な場合は False
+        """
+        settings = self.config.get_shard_settings()
+        workers = settings["workers"]
+        if workers < 2:
+            return False
+        if (self._sort_mode != "move" or self._archives is not None or self._sniffer is not None
+                or self._verifier is not None or self._throttle is not None or self._skip_sorted):
+            self.log("リンク方式・アーカイブ・種類の判定・移動の検証・I/O 予算・振り分け済みの判定のいずれかが"
+                     "有効なため、1つのプロセスで振り分けます")
+            return False
+        if self.config.is_bounded_memory():
+            # ワーカーに渡すためにファイル名の一覧を作るので、メモリ節約モードでは使わない
+            self.log("メモリ節約モードのため、1つのプロセスで振り分けます")
+            return False
+
+        names = [entry.name for entry in _iter_files(source_folder) if entry.path not in self._retry_sources]
+        if len(names) < settings["min_files"]:
+            return False
+
+        from shard import organize_sharded
+
+        self.log(f"{len(names)} 件を {workers} プロセスで振り分けます")
+        stats["total_files"] += len(names)
+        results = organize_sharded(source_folder, names, rules, self.config.is_normalize_match(), workers)
+        if self._dest_index is not None:
+            # ワーカーが索引を使わずに移動したフォルダは、次に参照するときに読み直す
+            for destination_folder in {result[1] for result in results}:
+                self._dest_index.invalidate(destination_folder)
+        for filename, destination_folder, destination_path, error, rule, size in results:
+            source_path = os.path.join(source_folder, filename)
+            if destination_path is None:
+                if not self._move_one(source_path, filename, destination_folder, stats, rule):
+                    stats["skipped_files"] += 1
+                continue
+            if self.log_each_file:
+                if os.path.basename(destination_path) != filename:
+                    self.log(f"同名ファイルが存在するため、リネームします: {os.path.basename(destination_path)}")
+                self.log(f"移動: {filename} → {destination_folder}")
+            self._record_move(source_path, destination_path)
+            if self._transcoder is not None and rule in self._transcode_rules:
+                self._submit_transcode(filename, destination_path, rule, stats)
+            elif self._catalog is not None:
+                self._catalog_add(filename, destination_path, rule)
+            self._rule_hits[rule] = self._rule_hits.get(rule, 0) + 1
+            stats["moved_files"] += 1
+            stats["moved_bytes"] += size
+        stats["skipped_files"] += len(names) - len(results)
+        return True
+
+    def _check_types(self, items: List[Tuple[str, int, int]]) -> List[Tuple[bool, Optional[str]]]:
+        """
+        ファイルの種類をまとめて判定
+
+        Args:
+            items: (パス, サイズ, 更新日時（ナノ秒）) のリスト
+
+        Returns:
+            各ファイルの (振り分け対象の種類か, 判定した種類)
+        """
+        allowed = self._type_filter["types"]
+        return [(file_type in allowed, file_type) for file_type in self._sniffer.sniff_many(items)]
+
+    def _type_skipped(self, filename: str, file_type: Optional[str]):
+        """種類が対象外のファイルをログに出す"""
+        if self.log_each_file:
+            self.log(f"スキップ（{file_type or '画像ではありません'}）: {filename}")
+
+    def _target_filename(self, filename: str, file_type: Optional[str]) -> str:
+        """移動先のファイル名（設定に応じて拡張子を中身に合わせる）"""
+        if not self._type_filter["fix_extension"]:
+            return filename
+        from sniff import fixed_filename
+        fixed = fixed_filename(filename, file_type)
+        if fixed != filename:
+            self.log(f"拡張子を修正: {filename} → {fixed}")
+        return fixed
+
+    def _sniff_entries(self, entries: List[os.DirEntry]) -> List[Optional[Tuple[bool, Optional[str]]]]:
+        """
+        エントリの種類をまとめて判定
+
+        Returns:
+            各エントリの (振り分け対象の種類か, 判定した種類)。情報を取得できないエントリは None
+        """
+        results: List[Optional[Tuple[bool, Optional[str]]]] = [None] * len(entries)
+        items = []
+        positions = []
+        for i, entry in enumerate(entries):
+            try:
+                st = entry.stat()
+            except OSError as e:
+                self.log(f"エラー: {entry.name} の情報を取得できません: {e}")
+                continue
+            items.append((entry.path, st.st_size, st.st_mtime_ns))
+            positions.append(i)
+        for i, check in zip(positions, self._check_types(items)):
+            results[i] = check
+        return results
+
+    def _move_sniffed(self, batch: List[Tuple[os.DirEntry, Dict[str, Any], Dict[str, int]]]):
+        """
+        マッチしたファイルの種類をまとめて判定し、対象の種類のファイルだけを移動
+
+        Args:
+            batch: (エントリ, マッチしたルール, 統計情報) のリスト
+        """
+        checks = self._sniff_entries([entry for entry, _, _ in batch])
+        for (entry, mapping, stats), check in zip(batch, checks):
+            moved = False
+            if check is None:
+                stats["errors"] += 1
+            elif not check[0]:
+                self._type_skipped(entry.name, check[1])
+            else:
+                moved = self._move_one(entry.path, self._target_filename(entry.name, check[1]),
+                                       self._destination_for(mapping, entry), stats, mapping["pattern"])
+            if not moved:
+                stats["skipped_files"] += 1
+
+    def _organize_archive(self, entry: os.DirEntry, matcher: RuleMatcher, stats: Dict[str, int]) -> bool:
+        """
+        ZIP アーカイブ内の画像を振り分ける
+
+        各画像はメンバーのファイル名に一致したルール、一致しなければアーカイブ名に
+        一致したルールの振り分け先へ書き出します。その後、設定に従って元のアーカイブを
+        残す・削除する・移動します。
+
+        Returns:
+            画像を書き出したか、アーカイブを移動した場合は True
+        """
+        from archives import extract_matching
+        from zipfile import BadZipFile
+
+        settings = self._archives
+        archive_path = entry.path
+        archive_rule = matcher.match(entry.name, entry.stat)
+        st = entry.stat()
+        key = f"{archive_path}|{st.st_size}|{st.st_mtime_ns}"
+        if key in self._archive_index:
+            # 前回までに展開済み
+            return False
+
+        def assign(member: str, mtime: float) -> Optional[str]:
+            rule = matcher.match(member) or archive_rule
+            if rule is None:
+                return None
+            return self._get_template(rule["destination"]).render(member, rule["pattern"], mtime)
+
+        try:
+            images, results = extract_matching(archive_path, settings["extensions"], assign, settings["workers"])
+        except (OSError, BadZipFile) as e:
+            self.log(f"エラー: アーカイブ {entry.name} を読み込めません: {e}")
             stats["errors"] += 1
+            return False
+
+        extracted = 0
+        for member, destination_path, error in results:
+            if error is not None:
+                self.log(f"エラー: {entry.name} 内の {member} の書き出しに失敗: {error}")
+                stats["errors"] += 1
+                continue
+            extracted += 1
+            self._record_move(archive_path, destination_path, mode="extract")
+            if self._catalog is not None:
+                self._catalog_add(member, destination_path, None)
+            if self.log_each_file:
+                self.log(f"展開: {entry.name} / {member} → {os.path.dirname(destination_path)}")
+        stats["extracted_files"] += extracted
+        if results:
+            self.log(f"アーカイブ {entry.name}: 画像 {images} 件中 {extracted} 件を振り分けました")
+
+        original = settings["original"]
+        moved = False
+        if original == "move":
+            if archive_rule is not None:
+                moved = self._move_one(archive_path, entry.name, self._destination_for(archive_rule, entry), stats,
+                                       archive_rule["pattern"])
+        elif original == "delete":
+            # 1件でも書き出せなかった場合は残しておく
+            if extracted and extracted == len(results):
+                try:
+                    os.remove(archive_path)
+                    self.log(f"アーカイブを削除: {entry.name}")
+                except OSError as e:
+                    self.log(f"エラー: アーカイブ {entry.name} を削除できません: {e}")
+                    stats["errors"] += 1
+        # ソースフォルダに残ったアーカイブは、どの扱いでも次回は展開しない（同じ画像が _1 付きで重複するため）。
+        # すべての画像の書き出しに失敗した場合だけは、次回もう一度展開する
+        if os.path.exists(archive_path) and not (results and extracted == 0):
+            self._archive_index[key] = extracted
+        return moved or extracted > 0
+
+    def _organize_limited(self, source_folder: str, matcher: RuleMatcher,
+                          stats: Dict[str, int], limits: Dict[str, Any], bounded: bool):
+        """
+        実行上限と処理順序を守って振り分ける
+
+        マッチしたファイルを一覧にして order の順に並べ、max_files / max_bytes /
+        max_seconds のいずれかに達したところで中断します。残りは backlog に保存し、
+        次回はソースフォルダが変化していなければ走査を省略して続きから処理します。
+        order が "none" のときは一覧を作らず、走査しながら処理します。
+        """
+        import itertools
+
+        deadline = time.monotonic() + limits["max_seconds"] if limits["max_seconds"] else None
+        rules_key = json.dumps(matcher.rules, sort_keys=True, ensure_ascii=False)
+
+        candidates = self._load_backlog(source_folder, rules_key)
+        # メモリ節約モードで並べ替えた場合は、今回処理する件数分しか一覧に残らない
+        partial = False
+        if candidates is not None:
+            self.log(f"前回の残り {len(candidates)} 件から再開します（走査を省略）")
+            stats["total_files"] = max(stats["total_files"], len(candidates))
+        else:
+            matched_before = stats["total_files"] - stats["skipped_files"]
+            candidates = self._collect_candidates(source_folder, matcher, stats, limits, bounded)
+            partial = bool(bounded and limits["max_files"] and limits["order"] != "none")
+            if partial:
+                matched = stats["total_files"] - stats["skipped_files"] - matched_before
 
+        pending = iter(candidates)
+        processed = 0
+        moved_bytes = 0
+        for candidate in pending:
+            mtime_ns, size, filename, destination_folder = candidate
+            if ((limits["max_files"] and processed >= limits["max_files"])
+                    or (limits["max_bytes"] and processed and moved_bytes + size > limits["max_bytes"])
+                    or (deadline is not None and time.monotonic() >= deadline)):
+                pending = itertools.chain([candidate], pending)
+                break
+            processed += 1
+            source_path = os.path.join(source_folder, filename)
+            if not os.path.exists(source_path):
+                # 前回の残りのうち、手動で移動・削除されたもの
+                stats["skipped_files"] += 1
+                continue
+            mapping = matcher.match(filename, lambda: os.stat(source_path))
+            target_filename = filename
+            if self._sniffer is not None and self._type_filter["fix_extension"]:
+                # 候補の一覧を作るときに判定済み（キャッシュから引く）
+                (_, file_type), = self._check_types([(source_path, size, mtime_ns)])
+                target_filename = self._target_filename(filename, file_type)
+            if self._move_one(source_path, target_filename, destination_folder, stats,
+                              mapping["pattern"] if mapping is not None else None):
+                moved_bytes += size
+            if self._retry:
+                self._process_retries()
+
+        # 再試行や検証の失敗で元ファイルが残るとソースフォルダの更新日時が変わるため、
+        # それらを終えてから残りを保存する（保存した更新日時で次回に走査を省略できるか判断する）
+        self._mark_phase("scan_move")
+        self._process_retries(block=True)
+        self._mark_phase("retry")
+        if self._verifier is not None:
+            self._verifier.wait()
+            self._mark_phase("verify")
+        remaining = self._save_backlog(source_folder, rules_key, pending, bounded)
+        if partial:
+            remaining = matched - processed
+        stats["remaining_files"] += remaining
+        if remaining:
+            self.log(f"実行上限に達したため中断しました: 残り {remaining} 件は次回処理します")
+
+    def _collect_candidates(self, source_folder: str, matcher: RuleMatcher,
+                            stats: Dict[str, int], limits: Dict[str, Any],
+                            bounded: bool) -> Iterable[Tuple[int, int, str, str]]:
+        """
+        マッチしたファイルを (更新日時, サイズ, ファイル名, 振り分け先) の一覧にして並べる
+
+        order が "none" のときは一覧を作らずに走査しながら返します（上限で中断すれば残りは走査しません）。
+        """
+        def matched():
+            for entry in _iter_files(source_folder):
+                stats["total_files"] += 1
+                mapping = matcher.match(entry.name, entry.stat)
+                if mapping is None:
+                    stats["skipped_files"] += 1
+                    continue
+                try:
+                    st = entry.stat()
+                except OSError:
+                    continue
+                yield (st.st_mtime_ns, st.st_size, entry.name, self._destination_for(mapping, entry, st))
+
+        def filtered():
+            # 種類の判定は SCAN_BATCH_SIZE 件ずつまとめて行う
+            batch = []
+            for candidate in matched():
+                batch.append(candidate)
+                if len(batch) >= SCAN_BATCH_SIZE:
+                    yield from self._filter_candidates(source_folder, batch, stats)
+                    batch = []
+            yield from self._filter_candidates(source_folder, batch, stats)
+
+        candidates = filtered() if self._sniffer is not None else matched()
+        order = limits["order"]
+        if bounded and limits["max_files"] and order != "none":
+            # メモリ節約モードでは今回処理する件数分だけを保持する
+            import heapq
+            select = heapq.nlargest if order == "newest" else heapq.nsmallest
+            return select(limits["max_files"], candidates)
+        if order == "none":
+            return candidates
+        return sorted(candidates, reverse=(order == "newest"))
+
+    def _filter_candidates(self, source_folder: str, batch: List[Tuple[int, int, str, str]],
+                           stats: Dict[str, int]) -> List[Tuple[int, int, str, str]]:
+        """候補のうち、対象の種類のファイルだけを返す"""
+        checks = self._check_types([(os.path.join(source_folder, filename), size, mtime_ns)
+                                    for mtime_ns, size, filename, _ in batch])
+        kept = []
+        for candidate, (allowed, file_type) in zip(batch, checks):
+            if allowed:
+                kept.append(candidate)
+            else:
+                self._type_skipped(candidate[2], file_type)
+                stats["skipped_files"] += 1
+        return kept
+
+    def _load_backlog(self, source_folder: str, rules_key: str) -> Optional[List[Tuple[int, int, str, str]]]:
+        """前回の残りを読み込む（ソースフォルダやルールが変わっていれば None）"""
+        path = self.config.get_state_path(BACKLOG_FILE)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                header = json.loads(f.readline())
+                if (header["source_folder"] != source_folder
+                        or header["rules"] != rules_key
+                        or header["dir_mtime_ns"] != os.stat(source_folder).st_mtime_ns):
+                    return None
+                return [tuple(json.loads(line)) for line in f]
+        except Exception:
+            return None
+
+    def _save_backlog(self, source_folder: str, rules_key: str,
+                      remaining: Iterable[Tuple[int, int, str, str]], bounded: bool) -> int:
+        """今回処理しきれなかったファイルを保存し、その件数を返す"""
+        import itertools
+
+        path = self.config.get_state_path(BACKLOG_FILE)
+        remaining = iter(remaining)
+        first = next(remaining, None)
+        if first is None or bounded:
+            # メモリ節約モードでは次回に一覧を読み込まないよう、走査し直す
+            if os.path.exists(path):
+                os.remove(path)
+            return 0 if first is None else 1 + sum(1 for _ in remaining)
+        count = 0
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({
+                "source_folder": source_folder,
+                "rules": rules_key,
+                "dir_mtime_ns": os.stat(source_folder).st_mtime_ns
+            }, ensure_ascii=False) + "\n")
+            for candidate in itertools.chain([first], remaining):
+                f.write(json.dumps(candidate, ensure_ascii=False) + "\n")
+                count += 1
+        return count
+
+    def plan(self) -> Iterator[Tuple[str, str]]:
+        """
+        ファイルを移動せずに振り分け予定を返す
+
+        Yields:
+            (ファイル名, 振り分け先フォルダ) のタプル
+        """
+        source_folder = self.config.get_source_folder()
+        mappings = self.config.get_mappings()
+        if not source_folder or not os.path.exists(source_folder) or not mappings:
+            return
+
+        matcher = self._build_matcher(mappings)
+        type_filter = self.config.get_type_filter()
+        if not type_filter["enabled"]:
+            for entry in _iter_files(source_folder):
+                mapping = matcher.match(entry.name, entry.stat)
+                if mapping is not None:
+                    yield entry.name, self._destination_for(mapping, entry)
+            return
+
+        # 実行時と同じく、種類が対象外のファイルは予定に含めない（判定結果は実行時のためにキャッシュする）
+        from sniff import TypeSniffer
+        allowed = set(type_filter["types"])
+        with TypeSniffer(type_filter["workers"], self.config.get_state_path(TYPE_CACHE_FILE)) as sniffer:
+            def allowed_only(batch: List[Tuple[os.DirEntry, Dict[str, Any], os.stat_result]]):
+                file_types = sniffer.sniff_many([(entry.path, st.st_size, st.st_mtime_ns) for entry, _, st in batch])
+                return [(entry.name, self._destination_for(mapping, entry))
+                        for (entry, mapping, _), file_type in zip(batch, file_types) if file_type in allowed]
+
+            pending: List[Tuple[os.DirEntry, Dict[str, Any], os.stat_result]] = []
+            for entry in _iter_files(source_folder):
+                mapping = matcher.match(entry.name, entry.stat)
+                if mapping is None:
+                    continue
+                try:
+                    pending.append((entry, mapping, entry.stat()))
+                except OSError:
+                    continue
+                if len(pending) >= SCAN_BATCH_SIZE:
+                    yield from allowed_only(pending)
+                    pending = []
+            if pending:
+                yield from allowed_only(pending)
+
+    def get_last_run(self) -> Optional[Dict[str, Any]]:
+        """
+        前回の実行結果を取得
+
+        Returns:
+            {"started": 開始日時, "finished": 終了日時, "stats": 統計情報}（記録がない場合は None）
+        """
+        path = self.config.get_state_path(LAST_RUN_FILE)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception:
+            return None
+
+    def undo_last_run(self) -> Dict[str, int]:
+        """
+        前回の実行で移動したファイルを元の場所に戻す
+
+        Returns:
+            統計情報（戻したファイル数、エラー数）
+        """
+        stats = {"restored_files": 0, "errors": 0}
+        journal_path = self.config.get_state_path(JOURNAL_FILE)
+        if not os.path.exists(journal_path):
+            self.log("取り消せる実行記録がありません")
+            return stats
+
+        with open(journal_path, 'r', encoding='utf-8') as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+
+        removed_links = set()
+        extracted_archives = set()
+        restored = []
+        # 再圧縮前のパス → 再圧縮後のパス
+        transcoded: Dict[str, str] = {}
+        # 検証に失敗して取り消された移動（元ファイルが残っているので戻す必要がない）
+        rolled_back: Dict[Tuple[str, str], int] = {}
+
+        # 後から移動したものから順に戻す
+        for entry in reversed(entries):
+            source_path = entry["source"]
+            destination_path = entry["destination"]
+            pair = (source_path, destination_path)
+            if entry.get("mode") == "rollback":
+                rolled_back[pair] = rolled_back.get(pair, 0) + 1
+                continue
+            if rolled_back.get(pair):
+                rolled_back[pair] -= 1
+                continue
+            if entry.get("mode") == "transcode":
+                # 元の画像には戻せないため、再圧縮後のファイルを元の場所に戻す
+                transcoded[source_path] = destination_path
+                continue
+            if destination_path in transcoded:
+                destination_path = transcoded[destination_path]
+                source_path = os.path.splitext(source_path)[0] + os.path.splitext(destination_path)[1]
+            if entry.get("mode", "move") != "move":
+                # リンク方式・アーカイブからの書き出しでは元ファイルが残っているので、作成したファイルを削除する
+                try:
+                    os.remove(destination_path)
+                    removed_links.add(destination_path)
+                    restored.append(destination_path)
+                    if entry["mode"] == "extract":
+                        extracted_archives.add(source_path)
+                    stats["restored_files"] += 1
+                except OSError as e:
+                    self.log(f"エラー: {destination_path} を削除できません: {e}")
+                    stats["errors"] += 1
+                continue
+            if os.path.exists(source_path) or not os.path.exists(destination_path):
+                self.log(f"エラー: 元に戻せません: {destination_path}")
+                stats["errors"] += 1
+                continue
+            try:
+                _shutil_move(destination_path, source_path)
+                restored.append(destination_path)
+                stats["restored_files"] += 1
+            except Exception as e:
+                self.log(f"エラー: {destination_path} を元に戻せません: {e}")
+                stats["errors"] += 1
+
+        if removed_links:
+            # 次回の実行で作り直せるよう、作成済みリンク・展開済みアーカイブの一覧からも外す
+            self._save_index(LINK_INDEX_FILE, {
+                key: destination for key, destination in self._load_index(LINK_INDEX_FILE).items()
+                if destination not in removed_links
+            })
+        if extracted_archives:
+            self._save_index(ARCHIVE_INDEX_FILE, {
+                key: count for key, count in self._load_index(ARCHIVE_INDEX_FILE).items()
+                if key.rsplit("|", 2)[0] not in extracted_archives
+            })
+
+        catalog_settings = self.config.get_catalog_settings()
+        if restored and catalog_settings["enabled"]:
+            from catalog import Catalog, CATALOG_FILE
+            with Catalog(self.config.get_state_path(CATALOG_FILE)) as catalog:
+                catalog.remove_paths(restored)
+
+        os.remove(journal_path)
+        self.log(f"取り消し完了: 復元={stats['restored_files']}, エラー={stats['errors']}")
         return stats
 
-    def _move_file(self, source_path: str, destination_folder: str, filename: str):
+    def _begin_run(self):
+        """実行記録（取り消し用の移動履歴）を開始し、I/O 予算と優先度を設定"""
+        from contextlib import ExitStack
+        from datetime import datetime
+
+        self._run_started = datetime.now()
+        self._phases = {}
+        self._phase_mark = time.perf_counter()
+        self._rule_hits = {}
+        self._run_context = ExitStack()
+        self._journal = self._run_context.enter_context(
+            open(self.config.get_state_path(JOURNAL_FILE), 'w', encoding='utf-8')
+        )
+
+        self._sort_mode = self.config.get_sort_mode()
+        self._link_index = self._load_index(LINK_INDEX_FILE) if self._sort_mode != "move" else None
+
+        catalog_settings = self.config.get_catalog_settings()
+        if catalog_settings["enabled"]:
+            from catalog import Catalog, CATALOG_FILE
+            self._catalog = self._run_context.enter_context(Catalog(self.config.get_state_path(CATALOG_FILE)))
+            self._catalog_hash = catalog_settings["hash"]
+            if self._catalog_hash:
+                import threading
+                self._catalog_lock = threading.Lock()
+                # 検証・再圧縮の完了時に追加された分も含め、カタログを閉じる直前に残りを計算する
+                self._run_context.callback(self._flush_catalog_hashes)
+
+        index_settings = self.config.get_destination_index_settings()
+        if index_settings["enabled"]:
+            from destindex import DestinationIndex, DESTINATION_INDEX_FILE
+            self._dest_index = self._run_context.enter_context(
+                DestinationIndex(self.config.get_state_path(DESTINATION_INDEX_FILE), index_settings["workers"])
+            )
+            self._skip_sorted = index_settings["skip_sorted"]
+            rescanned = self._dest_index.refresh(self._static_destinations())
+            if rescanned:
+                self.log(f"振り分け先の索引: {rescanned} フォルダを読み直しました")
+
+        archives = self.config.get_archive_settings()
+        if archives["enabled"]:
+            from archives import ARCHIVE_EXTENSIONS
+            self._archives = dict(archives, archive_extensions=ARCHIVE_EXTENSIONS,
+                                  extensions=tuple(ext.lower() for ext in archives["extensions"]))
+            self._archive_index = self._load_index(ARCHIVE_INDEX_FILE)
+
+        type_filter = self.config.get_type_filter()
+        if type_filter["enabled"]:
+            from sniff import TypeSniffer
+            self._type_filter = dict(type_filter, types=set(type_filter["types"]))
+            self._sniffer = self._run_context.enter_context(
+                TypeSniffer(type_filter["workers"], self.config.get_state_path(TYPE_CACHE_FILE))
+            )
+
+        retry_settings = self.config.get_retry_settings()
+        if retry_settings["enabled"]:
+            from retry import RetryQueue
+            from spill import SpillQueue
+            self._retry = RetryQueue(retry_settings["max_attempts"], retry_settings["base_delay"],
+                                     retry_settings["max_delay"], max_queued=retry_settings["max_queued"])
+            self._retry_carry = self._run_context.enter_context(SpillQueue(retry_settings["max_queued"]))
+
+        if self.config.is_verify_moves():
+            from verify import VerifiedMover
+            self._verifier = self._run_context.enter_context(VerifiedMover())
+
+        self._transcode_rules = {
+            rule["pattern"]: rule["transcode"] for rule in reversed(self._configured_rules()) if rule.get("transcode")
+        }
+        if self._transcode_rules:
+            from transcode import Transcoder, is_available
+            if self._sort_mode != "move":
+                self.log("警告: リンク方式では元ファイルを書き換えないよう、画像の再圧縮は行いません")
+                self._transcode_rules = {}
+            elif not is_available():
+                self.log("警告: 画像の再圧縮には Pillow が必要です（pip install Pillow）")
+                self._transcode_rules = {}
+            else:
+                self._transcoder = self._run_context.enter_context(
+                    Transcoder(self.config.get_transcode_settings()["workers"])
+                )
+
+        limits = self.config.get_io_limits()
+        if limits["low_priority"]:
+            from throttle import low_priority
+            if self._run_context.enter_context(low_priority()):
+                self.log("CPU の優先度を下げました（この権限では元に戻せないため、プロセスの終了まで下がったままになります）")
+        if limits["bytes_per_sec"] or limits["ops_per_sec"] or limits["adaptive"]:
+            from throttle import IOThrottle
+            self._throttle = IOThrottle.from_settings(limits)
+
+    def _configured_rules(self) -> List[Dict[str, Any]]:
+        """設定ファイルのすべてのルール（プロファイルのルールを含む）"""
+        rules = list(self.config.get_mappings())
+        if self.config.has_profiles():
+            for profile in self.config.get_profiles():
+                rules.extend(profile["mappings"])
+        return rules
+
+    def _static_destinations(self) -> List[str]:
+        """書式を含まない振り分け先フォルダの一覧（索引の読み直し対象）"""
+        folders = []
+        for rule in self._configured_rules():
+            try:
+                template = self._get_template(rule["destination"])
+            except ValueError:
+                continue
+            if template.is_static:
+                folders.append(template.template)
+        return folders
+
+    def _mark_phase(self, name: str):
+        """前回の区切りからの経過時間を処理段階 name の所要時間に加算"""
+        now = time.perf_counter()
+        self._phases[name] = self._phases.get(name, 0.0) + now - self._phase_mark
+        self._phase_mark = now
+
+    def _record_move(self, source_path: str, destination_path: str, mode: Optional[str] = None):
+        """移動履歴に1件追記（mode はアーカイブからの書き出しなど、振り分け方法と異なる場合に指定）"""
+        entry = {"source": source_path, "destination": destination_path}
+        mode = mode or self._sort_mode
+        if mode != "move":
+            entry["mode"] = mode
+        self._journal.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def _catalog_add(self, filename: str, destination_path: str, rule: Optional[str]):
+        """カタログに移動したファイルを1件追加（ハッシュを記録する場合はまとめて計算してから追加）"""
+        run_id = self._run_started.isoformat(timespec="seconds")
+        if self._catalog_hash:
+            with self._catalog_lock:
+                self._catalog_pending.append((filename, destination_path, rule, run_id))
+                if len(self._catalog_pending) < CATALOG_HASH_BATCH:
+                    return
+            self._flush_catalog_hashes()
+            return
+        try:
+            st = os.stat(destination_path)
+            self._catalog.add(filename, destination_path, st.st_size, st.st_mtime, rule, run_id)
+        except Exception as e:
+            self.log(f"カタログへの記録に失敗: {filename} ({e})")
+
+    def _flush_catalog_hashes(self):
+        """計算待ちのカタログ項目のハッシュを hash_many でまとめて計算し、カタログに追加"""
+        with self._catalog_lock:
+            pending = self._catalog_pending
+            self._catalog_pending = []
+        if not pending:
+            return
+        try:
+            digests = dict(self.get_hasher().hash_many([entry[1] for entry in pending]))
+        except Exception as e:
+            self.log(f"カタログのハッシュ計算に失敗: {e}")
+            digests = {}
+        for filename, destination_path, rule, run_id in pending:
+            try:
+                st = os.stat(destination_path)
+                self._catalog.add(filename, destination_path, st.st_size, st.st_mtime, rule, run_id,
+                                  digests.get(destination_path))
+            except Exception as e:
+                self.log(f"カタログへの記録に失敗: {filename} ({e})")
+
+    def _load_index(self, name: str) -> Dict[str, Any]:
+        """作成済みリンク・展開済みアーカイブの一覧を読み込む"""
+        path = self.config.get_state_path(name)
+        if not os.path.exists(path):
+            return {}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception:
+            return {}
+
+    def _save_index(self, name: str, index: Dict[str, Any]):
+        """作成済みリンク・展開済みアーカイブの一覧を保存"""
+        path = self.config.get_state_path(name)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _end_run(self, stats: Dict[str, int]):
+        """実行記録を閉じ、結果を保存"""
+        if self._retry is not None:
+            # 持ち越す項目の一時ファイルは実行記録と一緒に閉じるため、先に保存する
+            try:
+                # 持ち越した再試行も未処理の残りとして数える
+                stats["remaining_files"] += self._save_retries()
+            except OSError as e:
+                self.log(f"再試行一覧の保存に失敗: {e}")
+        self._run_context.close()
+        self._run_context = None
+        self._journal = None
+        self._catalog = None
+        self._catalog_hash = False
+        self._catalog_lock = None
+        self._verifier = None
+        self._sniffer = None
+        self._dest_index = None
+        self._skip_sorted = False
+        self._transcoder = None
+        self._transcode_rules = {}
+        self._retry = None
+        self._retry_carry = None
+        self._retry_sources = set()
+        self._throttle = None
+        if self._link_index is not None:
+            try:
+                # 削除・変更された元ファイルの記録は捨てる（変更されたファイルは新しいキーで記録し直される）
+                self._save_index(LINK_INDEX_FILE, {
+                    key: destination for key, destination in self._link_index.items()
+                    if _link_source_exists(key)
+                })
+            except OSError as e:
+                self.log(f"リンク一覧の保存に失敗: {e}")
+            self._link_index = None
+        if self._archive_index is not None:
+            try:
+                # 移動・削除されたアーカイブの記録は捨てる
+                self._save_index(ARCHIVE_INDEX_FILE, {
+                    key: count for key, count in self._archive_index.items()
+                    if os.path.exists(key.rsplit("|", 2)[0])
+                })
+            except OSError as e:
+                self.log(f"展開済みアーカイブ一覧の保存に失敗: {e}")
+            self._archive_index = None
+        self._archives = None
+        self._mark_phase("finish")
+        from datetime import datetime
+        finished = datetime.now()
+        try:
+            with open(self.config.get_state_path(LAST_RUN_FILE), 'w', encoding='utf-8') as f:
+                json.dump({
+                    "started": self._run_started.isoformat(timespec="seconds"),
+                    "finished": finished.isoformat(timespec="seconds"),
+                    "stats": stats
+                }, f, ensure_ascii=False)
+        except OSError as e:
+            self.log(f"実行結果の保存に失敗: {e}")
+
+        history_settings = self.config.get_history_settings()
+        if history_settings["enabled"]:
+            import sqlite3
+            from history import RunHistory, HISTORY_FILE
+            try:
+                with RunHistory(self.config.get_state_path(HISTORY_FILE), history_settings["max_runs"]) as history:
+                    history.record(self._run_started, finished, stats, self._phases, self._rule_hits)
+            except (OSError, sqlite3.Error) as e:
+                self.log(f"実行履歴の保存に失敗: {e}")
+
+    async def organize_async(self, concurrency: int = 4, queue_size: int = 256,
+                             executor: Optional["Executor"] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        ファイルを非同期に振り分ける
+
+        走査・マッチング・移動を上限付きキューでつないだパイプラインとして実行し、
+        進捗イベントを順次返します。ブロッキングするファイル操作はすべて
+        executor 上で実行されるため、イベントループを止めません。
+        イテレーションを途中で止める（aclose / キャンセル）と、残りの処理も中断されます。
+
+        Args:
+            concurrency: 同時に実行する移動処理の数
+            queue_size: 各ステージ間のキューの上限（バックプレッシャー）
+            executor: ファイル操作を実行する Executor（省略時は共有の Executor）
+
+        Yields:
+            進捗イベント（"event" キーが start / moved / extracted / retry / skipped / error / done のいずれか）。
+            retry は使用中のファイルの再試行の予約、extracted は ZIP アーカイブからの書き出しです。
+            done イベントの "stats" に organize() と同じ統計情報が入ります。
+        """
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        own_executor = None
+        if self.config.get_io_limits()["low_priority"] and _priority_per_thread():
+            # Linux では優先度がスレッドごとのため、実際にファイルを操作するスレッドで下げる
+            if executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                from throttle import lower_thread_priority
+                executor = own_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="picsort-io-low",
+                                                             initializer=lower_thread_priority)
+            else:
+                self.log("注意: 指定された Executor のスレッドには low_priority（優先度を下げる設定）が適用されません")
+        executor = executor or get_shared_executor()
+        events = self._organize_async(loop, executor, concurrency, queue_size)
+        try:
+            async for event in events:
+                yield event
+        finally:
+            # 途中で止めた場合も、実行記録を閉じてからスレッドを片付ける
+            await events.aclose()
+            if own_executor is not None:
+                own_executor.shutdown(wait=False)
+
+    async def _organize_async(self, loop, executor: "Executor", concurrency: int,
+                              queue_size: int) -> AsyncIterator[Dict[str, Any]]:
+        """organize_async の本体（executor は決定済み）"""
+        import asyncio
+
+        source_folder = self.config.get_source_folder()
+        mappings = self.config.get_mappings()
+        stats = self._new_stats()
+
+        if not source_folder or not await loop.run_in_executor(executor, os.path.exists, source_folder):
+            self.log(f"エラー: ソースフォルダが存在しません: {source_folder}")
+            yield {"event": "done", "stats": stats}
+            return
+
+        if not mappings:
+            self.log("警告: 振り分けルールが設定されていません")
+            yield {"event": "done", "stats": stats}
+            return
+
+        if not self._check_templates(mappings):
+            yield {"event": "done", "stats": stats}
+            return
+
+        self.log(f"振り分け開始: {source_folder}")
+
+        matcher = self._build_matcher(mappings)
+        # 更新日時を使うテンプレートやサイズ・経過時間の条件があれば、走査時に stat も executor 上で取得しておく
+        with_stat = matcher.needs_stat or any(self._get_template(mapping["destination"]).needs_mtime
+                                              for mapping in mappings)
+        events = asyncio.Queue(maxsize=queue_size)
+        moves = asyncio.Queue(maxsize=queue_size)
+        # 同じ移動先への移動は直列化して、リネーム先の衝突を防ぐ
+        locks: Dict[str, Any] = {}
+
+        async def locked_move(source_path: str, filename: str, destination_folder: str,
+                              item_stats: Dict[str, int], rule: Optional[str],
+                              retry_item: Optional[Dict[str, Any]] = None):
+            lock = locks.setdefault(destination_folder, asyncio.Lock())
+            async with lock:
+                event = await self._move_async(loop, executor, source_path, filename, destination_folder,
+                                               item_stats, rule, retry_item)
+            await events.put(event)
+
+        async def process_retries(block: bool = False):
+            # 再試行キューはイベントループのスレッドだけで操作する
+            queue = self._retry
+            if queue is None:
+                return
+            while True:
+                for item in queue.pop_due():
+                    if not await loop.run_in_executor(executor, os.path.exists, item["source"]):
+                        # 待っている間に手動で移動・削除された
+                        item["stats"]["skipped_files"] += 1
+                        continue
+                    await locked_move(item["source"], item["filename"], item["destination"], item["stats"],
+                                      item["rule"], item)
+                if not block or not len(queue):
+                    return
+                await asyncio.sleep(queue.next_due())
+
+        async def scan():
+            it = await loop.run_in_executor(executor, os.scandir, source_folder)
+            try:
+                while True:
+                    batch = await loop.run_in_executor(executor, _next_files, it, SCAN_BATCH_SIZE, with_stat)
+                    if not batch:
+                        break
+                    matched = []
+                    for entry in batch:
+                        filename = entry.name
+                        stats["total_files"] += 1
+                        if entry.path in self._retry_sources:
+                            # 前回から持ち越した再試行で処理する
+                            continue
+                        if self._archives is not None and filename.lower().endswith(
+                                self._archives["archive_extensions"]):
+                            # アーカイブの書き出し（元のアーカイブの移動を含む）は executor 上でまとめて行う
+                            if await loop.run_in_executor(executor, self._organize_archive, entry, matcher, stats):
+                                await events.put({"event": "extracted", "filename": filename})
+                            else:
+                                stats["skipped_files"] += 1
+                                await events.put({"event": "skipped", "filename": filename})
+                            continue
+                        mapping = matcher.match(filename, entry.stat)
+                        if mapping is None:
+                            stats["skipped_files"] += 1
+                            await events.put({"event": "skipped", "filename": filename})
+                        else:
+                            matched.append((entry, mapping))
+                    checks = None
+                    if self._sniffer is not None and matched:
+                        # 種類の判定（先頭バイトの読み込み）もバッチごとに executor 上で行う
+                        checks = await loop.run_in_executor(executor, self._sniff_entries,
+                                                            [entry for entry, _ in matched])
+                    for i, (entry, mapping) in enumerate(matched):
+                        target_filename = entry.name
+                        if checks is not None:
+                            check = checks[i]
+                            if check is None or not check[0]:
+                                if check is None:
+                                    stats["errors"] += 1
+                                else:
+                                    self._type_skipped(entry.name, check[1])
+                                stats["skipped_files"] += 1
+                                await events.put({"event": "skipped", "filename": entry.name})
+                                continue
+                            target_filename = self._target_filename(entry.name, check[1])
+                        await moves.put((entry.path, target_filename, self._destination_for(mapping, entry),
+                                         mapping["pattern"]))
+                    await process_retries()
+            finally:
+                it.close()
+
+        async def move():
+            while True:
+                item = await moves.get()
+                if item is None:
+                    return
+                source_path, target_filename, destination_folder, rule = item
+                await locked_move(source_path, target_filename, destination_folder, stats, rule)
+
+        tasks = []
+
+        async def run():
+            if self._retry is not None:
+                await loop.run_in_executor(executor, self._load_retries, stats)
+            movers = [asyncio.ensure_future(move()) for _ in range(max(1, concurrency))]
+            tasks.extend(movers)
+            try:
+                await scan()
+            except Exception as e:
+                self.log(f"エラー: ファイル走査中にエラーが発生: {e}")
+                stats["errors"] += 1
+            for _ in movers:
+                await moves.put(None)
+            await asyncio.gather(*movers)
+            self._mark_phase("scan_move")
+            await process_retries(block=True)
+            self._mark_phase("retry")
+            if self._verifier is not None:
+                # 検証の失敗を結果に反映してから集計する
+                await loop.run_in_executor(executor, self._verifier.wait)
+                self._mark_phase("verify")
+            if self._transcoder is not None:
+                await loop.run_in_executor(executor, self._transcoder.wait)
+                self._mark_phase("transcode")
+            await events.put(None)
+
+        # 実行記録の開始・終了（ファイルや SQLite を開いて閉じる）もイベントループを止めないよう別スレッドで行う。
+        # Linux の I/O 優先度はスレッドごとに設定されるため、開始と終了は同じ1つのスレッドで実行する
+        from concurrent.futures import ThreadPoolExecutor
+        run_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="picsort-run")
+        try:
+            await loop.run_in_executor(run_executor, self._begin_run)
+            tasks.append(asyncio.ensure_future(run()))
+            try:
+                yield {"event": "start", "source_folder": source_folder}
+                while True:
+                    event = await events.get()
+                    if event is None:
+                        break
+                    yield event
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                await loop.run_in_executor(run_executor, self._end_run, stats)
+        finally:
+            run_executor.shutdown(wait=False)
+
+        self.log(f"振り分け完了: 移動={stats['moved_files']}, "
+                f"スキップ={stats['skipped_files']}, エラー={stats['errors']}")
+        yield {"event": "done", "stats": stats}
+
+    async def _move_async(self, loop, executor, source_path: str, filename: str,
+                          destination_folder: str, stats: Dict[str, int], rule: Optional[str] = None,
+                          retry_item: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        organize_async の1ファイル分の移動（ファイル操作は executor 上で実行）
+
+        Args:
+            filename: 移動先のファイル名（拡張子を中身に合わせる場合は元のファイル名と異なる）
+            retry_item: 再試行キューから取り出した項目（再試行時のみ）
+        """
+        name = os.path.basename(source_path)
+        try:
+            key, size, mtime_ns = await loop.run_in_executor(executor, self._source_info, source_path)
+            if key is not None and key in self._link_index:
+                # リンク方式で前回までに振り分け済み
+                stats["skipped_files"] += 1
+                return {"event": "skipped", "filename": name}
+            if self._skip_sorted and await loop.run_in_executor(
+                    executor, self._already_sorted, destination_folder, filename, size, mtime_ns):
+                stats["skipped_files"] += 1
+                return {"event": "skipped", "filename": name}
+            destination_path = await loop.run_in_executor(
+                executor, self._move_file, source_path, destination_folder, filename, stats, rule
+            )
+        except Exception as e:
+            if self._schedule_retry(e, source_path, filename, destination_folder, stats, rule, retry_item):
+                return {"event": "retry", "filename": name, "error": str(e)}
+            return {"event": "error", "filename": name, "error": str(e)}
+
+        if key is not None:
+            self._link_index[key] = destination_path
+        if self._dest_index is not None:
+            self._dest_index.update(destination_path, size, mtime_ns)
+        self._record_move(source_path, destination_path)
+        if self._transcoder is not None and rule in self._transcode_rules:
+            # 検証の完了待ちを含むため executor 上で予約する
+            await loop.run_in_executor(executor, self._submit_transcode, filename, destination_path, rule, stats)
+        elif self._catalog is not None:
+            await loop.run_in_executor(executor, self._catalog_add, filename, destination_path, rule)
+        if rule is not None:
+            self._rule_hits[rule] = self._rule_hits.get(rule, 0) + 1
+        stats["moved_files"] += 1
+        stats["moved_bytes"] += size
+        return {"event": "moved", "filename": name, "destination": destination_folder}
+
+    def _move_file(self, source_path: str, destination_folder: str, filename: str,
+                   stats: Optional[Dict[str, int]] = None, rule: Optional[str] = None):
         """
         ファイルを移動
 
@@ -176,12 +1981,33 @@ class FileOrganizer:
             source_path: 移動元ファイルのフルパス
             destination_folder: 移動先フォルダ
             filename: ファイル名
+            stats: 統計情報（移動の検証に後から失敗した場合に修正する）
+            rule: 振り分けに使った条件（移動の検証に後から失敗した場合に件数を戻す）
+
+        Returns:
+            移動後のファイルのフルパス
         """
+        index = self._dest_index
         # 移動先フォルダが存在しない場合は作成
-        if not os.path.exists(destination_folder):
-            os.makedirs(destination_folder)
+        if not (index.has_folder(destination_folder) if index is not None else os.path.exists(destination_folder)):
+            os.makedirs(destination_folder, exist_ok=True)
             self.log(f"フォルダを作成: {destination_folder}")
 
+        if index is not None:
+            # 同名ファイルの確認は索引で行い、決めた名前が空いていることだけを確認する
+            destination_path = os.path.join(destination_folder, index.reserve(destination_folder, filename))
+            if os.path.exists(destination_path):
+                # 索引を使わずに追加されたファイルがある場合は読み直す
+                index.invalidate(destination_folder)
+                destination_path = os.path.join(destination_folder, index.reserve(destination_folder, filename))
+            if os.path.basename(destination_path) != filename:
+                self.log(f"同名ファイルが存在するため、リネームします: {os.path.basename(destination_path)}")
+            try:
+                return self._place_file(source_path, destination_folder, destination_path, filename, stats, rule)
+            except BaseException:
+                index.release(destination_path)
+                raise
+
         destination_path = os.path.join(destination_folder, filename)
 
         # 同名ファイルが既に存在する場合の処理
@@ -195,6 +2021,86 @@ class FileOrganizer:
                 counter += 1
             self.log(f"同名ファイルが存在するため、リネームします: {os.path.basename(destination_path)}")
 
+        return self._place_file(source_path, destination_folder, destination_path, filename, stats, rule)
+
+    def _place_file(self, source_path: str, destination_folder: str, destination_path: str, filename: str,
+                    stats: Optional[Dict[str, int]] = None, rule: Optional[str] = None) -> str:
+        """移動先のパスが決まったファイルを移動（リンク方式ではリンクを作成）"""
+        # リンク方式では元ファイルを残してリンク（作れない場合はコピー）を作成
+        if self._sort_mode != "move":
+            from linking import link_file
+            method = link_file(source_path, destination_path, self._sort_mode)
+            if self.log_each_file:
+                self.log(f"{LINK_LABELS[method]}: {filename} → {destination_folder}")
+            return destination_path
+
         # ファイルを移動
-        shutil.move(source_path, destination_path)
-        self.log(f"移動: {filename} → {destination_folder}")
+        if self._verifier is not None and os.stat(source_path).st_dev != self._destination_device(destination_folder):
+            self._verified_move(source_path, destination_folder, destination_path, stats, rule)
+        elif self._throttle is None:
+            self.move_func(source_path, destination_path)
+        else:
+            self._throttled_move(source_path, destination_folder, destination_path)
+        if self.log_each_file:
+            self.log(f"移動: {filename} → {destination_folder}")
+        return destination_path
+
+    def _throttled_move(self, source_path: str, destination_folder: str, destination_path: str):
+        """I/O 予算を消費しながらファイルを移動"""
+        # 同じドライブ内の移動は名前の変更だけなので、バイト数は別ドライブへのコピー時のみ数える
+        st = os.stat(source_path)
+        device = self._destination_device(destination_folder)
+        nbytes = st.st_size if st.st_dev != device else 0
+
+        self._throttle.before(nbytes)
+        start = time.perf_counter()
+        self.move_func(source_path, destination_path)
+        self._throttle.after(nbytes, time.perf_counter() - start, device)
+
+    def _destination_device(self, destination_folder: str) -> int:
+        """移動先フォルダのデバイス番号（フォルダごとに1回だけ stat する）"""
+        destination_device = self._device_cache.get(destination_folder)
+        if destination_device is None:
+            destination_device = os.stat(destination_folder).st_dev
+            self._device_cache[destination_folder] = destination_device
+        return destination_device
+
+    def _verified_move(self, source_path: str, destination_folder: str, destination_path: str,
+                       stats: Optional[Dict[str, int]], rule: Optional[str] = None):
+        """
+        別ドライブへコピーし、検証してから元ファイルを削除
+
+        検証は次のファイルのコピーと並行して進みます。一致しなかった場合や、使用中で
+        元ファイルを削除できなかった場合はコピー先を削除して元ファイルを残し、次回の実行で改めて移動します。
+        記録済みの移動履歴には取り消しの印を追記し、条件ごとの件数も戻します。
+        """
+        def on_failure(source: str, destination: str, error: BaseException):
+            from verify import SourceLockedError
+            if isinstance(error, SourceLockedError):
+                self.log(f"エラー: {os.path.basename(source)} は使用中で削除できないため、コピーを取り消しました。"
+                         f"次回の実行で改めて移動します: {error.__cause__ or error}")
+            else:
+                self.log(f"エラー: {os.path.basename(source)} の移動の検証に失敗したため、元のファイルを残しました: {error}")
+            # 取り消し時に、残した元ファイルを「元に戻せない」と数えないようにする
+            self._record_move(source, destination, mode="rollback")
+            if rule is not None and self._rule_hits.get(rule):
+                self._rule_hits[rule] -= 1
+            if self._catalog is not None:
+                with self._catalog_lock:
+                    self._catalog_pending = [entry for entry in self._catalog_pending if entry[1] != destination]
+                self._catalog.remove_paths([destination])
+            if self._dest_index is not None:
+                self._dest_index.release(destination)
+            if stats is not None:
+                stats["moved_files"] -= 1
+                stats["moved_bytes"] -= nbytes
+                stats["errors"] += 1
+                stats["remaining_files"] += 1
+
+        nbytes = os.stat(source_path).st_size
+        if self._throttle is not None:
+            self._throttle.before(nbytes)
+        start = time.perf_counter()
+        self._verifier.move(source_path, destination_path, on_failure)
+        if self._throttle is not None:
+            self._throttle.after(nbytes, time.perf_counter() - start, self._destination_device(destination_folder))
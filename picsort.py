@@ -0,0 +1,374 @@
+"""
+PicSort - コマンドライン版
+GUIを使わずに振り分けを実行します。タスクスケジューラからの定期実行に最適です。
+
+使い方:
+    python picsort.py run      振り分けを実行
+    python picsort.py plan     移動せずに振り分け予定を表示
+    python picsort.py watch    一定間隔で振り分けを繰り返す
+    python picsort.py undo     前回の実行で移動したファイルを元に戻す
+    python picsort.py stats    前回の実行結果を表示
+    python picsort.py rules    ルールを CSV/TSV でインポート・エクスポート、ルールを診断
+    python picsort.py catalog  振り分けたファイルのカタログを検索
+    python picsort.py history  日ごと・週ごとの実行履歴を表示
+
+起動を速くするため、organizer 以外のモジュールは必要になった時点で読み込みます。
+"""
+
+import os
+import sys
+import json
+import argparse
+
+from organizer import Config, FileOrganizer, merge_stats
+
+# 終了コード
+EXIT_OK = 0
+EXIT_ERRORS = 1   # 一部のファイルでエラーが発生
+EXIT_USAGE = 2    # 引数・設定の誤り（argparse と同じ）
+
+
+def print_result(args, data, text: str):
+    """結果を出力（--json の場合は JSON、それ以外はテキスト）"""
+    if args.json:
+        print(json.dumps(data, ensure_ascii=False))
+    else:
+        print(text)
+
+
+def make_organizer(args) -> FileOrganizer:
+    """設定を読み込み FileOrganizer を作成"""
+    if args.quiet:
+        log_callback = lambda message: None
+    elif args.json:
+        # 標準出力は JSON 専用にするため、ログは標準エラーへ
+        log_callback = lambda message: print(message, file=sys.stderr)
+    else:
+        log_callback = print
+    return FileOrganizer(Config(args.config[0]), log_callback)
+
+
+def check_config(organizer: FileOrganizer) -> bool:
+    """実行に必要な設定が揃っているか確認"""
+    source_folder = organizer.config.get_source_folder()
+    if not source_folder or not os.path.isdir(source_folder):
+        print(f"エラー: ソースフォルダが存在しません: {source_folder}", file=sys.stderr)
+        return False
+    if not organizer.config.get_mappings():
+        print("エラー: 振り分けルールが設定されていません", file=sys.stderr)
+        return False
+    return True
+
+
+def format_stats(stats) -> str:
+    """統計情報を1行のテキストにする"""
+    text = (f"対象: {stats['total_files']}, 移動: {stats['moved_files']}, "
+            f"スキップ: {stats['skipped_files']}, エラー: {stats['errors']}")
+    if stats.get("saved_bytes"):
+        text += f", 再圧縮: {stats['transcoded_files']} 件 ({stats['saved_bytes'] / 1024 / 1024:.1f} MB 削減)"
+    return text
+
+
+def run_coordinated(args, organizer: FileOrganizer):
+    """
+    他のプロセスと排他制御しながら振り分けを実行
+
+    Returns:
+        合算した統計情報（他のプロセスの再実行にまとめた場合は None）
+    """
+    from runlock import RunCoordinator
+
+    results = RunCoordinator(organizer.config).run(organizer.organize)
+    if not results:
+        print_result(args, {"merged": True}, "他のPicSortが実行中のため、終了後の再実行にまとめました")
+        return None
+    return merge_stats(results)
+
+
+def cmd_run_profiles(args, organizer: FileOrganizer) -> int:
+    """複数プロファイルをまとめて振り分け、プロファイルごとの結果を出力"""
+    from runlock import RunCoordinator
+
+    profiles = Config.load_profiles(args.config)
+    results = RunCoordinator(organizer.config).run(lambda: organizer.organize_profiles(profiles))
+    if not results:
+        print_result(args, {"merged": True}, "他のPicSortが実行中のため、終了後の再実行にまとめました")
+        return EXIT_OK
+
+    per_profile = {
+        profile["name"]: merge_stats(result[profile["name"]] for result in results)
+        for profile in profiles
+    }
+    total = merge_stats(per_profile.values())
+    text = "\n".join(f"[{name}] {format_stats(stats)}" for name, stats in per_profile.items())
+    print_result(args, {"profiles": per_profile, "total": total}, text)
+    return EXIT_ERRORS if total["errors"] else EXIT_OK
+
+
+def cmd_run(args) -> int:
+    """振り分けを実行"""
+    organizer = make_organizer(args)
+    if len(args.config) > 1 or organizer.config.has_profiles():
+        try:
+            return cmd_run_profiles(args, organizer)
+        finally:
+            organizer.close()
+    if not check_config(organizer):
+        return EXIT_USAGE
+    try:
+        stats = run_coordinated(args, organizer)
+    finally:
+        organizer.close()
+    if stats is None:
+        return EXIT_OK
+    print_result(args, stats, format_stats(stats))
+    return EXIT_ERRORS if stats["errors"] else EXIT_OK
+
+
+def cmd_plan(args) -> int:
+    """移動せずに振り分け予定を表示"""
+    organizer = make_organizer(args)
+    if not check_config(organizer):
+        return EXIT_USAGE
+    count = 0
+    for filename, destination in organizer.plan():
+        count += 1
+        if args.json:
+            print(json.dumps({"filename": filename, "destination": destination}, ensure_ascii=False))
+        else:
+            print(f"{filename} → {destination}")
+    if not args.json:
+        print(f"移動予定: {count} 件")
+    return EXIT_OK
+
+
+def cmd_watch(args) -> int:
+    """一定間隔で振り分けを繰り返す（Ctrl+C で終了）"""
+    import time
+
+    organizer = make_organizer(args)
+    if not check_config(organizer):
+        return EXIT_USAGE
+    source_folder = organizer.config.get_source_folder()
+    last_mtime = None
+    try:
+        while True:
+            # フォルダの更新日時が変わっていなければ走査を省略
+            mtime = os.stat(source_folder).st_mtime_ns
+            if mtime != last_mtime:
+                stats = run_coordinated(args, organizer)
+                if stats is not None:
+                    print_result(args, stats, format_stats(stats))
+                last_mtime = os.stat(source_folder).st_mtime_ns
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        return EXIT_OK
+    finally:
+        organizer.close()
+
+
+def cmd_undo(args) -> int:
+    """前回の実行で移動したファイルを元に戻す"""
+    from runlock import RunCoordinator
+
+    organizer = make_organizer(args)
+    coordinator = RunCoordinator(organizer.config)
+    if not coordinator.acquire():
+        print("エラー: 他のPicSortが実行中です。終了後にやり直してください", file=sys.stderr)
+        return EXIT_ERRORS
+    try:
+        stats = organizer.undo_last_run()
+    finally:
+        coordinator.release()
+    print_result(args, stats, f"復元: {stats['restored_files']}, エラー: {stats['errors']}")
+    return EXIT_ERRORS if stats["errors"] else EXIT_OK
+
+
+def cmd_stats(args) -> int:
+    """前回の実行結果を表示"""
+    organizer = make_organizer(args)
+    last_run = organizer.get_last_run()
+    if last_run is None:
+        print_result(args, None, "実行記録がありません")
+        return EXIT_OK
+    print_result(args, last_run, f"{last_run['started']} - {last_run['finished']}\n"
+                                 f"{format_stats(last_run['stats'])}")
+    return EXIT_OK
+
+
+def cmd_rules(args) -> int:
+    """振り分けルールを CSV/TSV でインポート・エクスポート、ルールを診断"""
+    from rules_io import export_rules, import_rules
+
+    config = Config(args.config[0])
+    if args.action == "analyze":
+        return _analyze_rules(args, config)
+    if not args.file:
+        print("エラー: CSV/TSV ファイルのパスを指定してください", file=sys.stderr)
+        return EXIT_USAGE
+    if args.action == "export":
+        count = export_rules(config, args.file)
+        print_result(args, {"exported": count}, f"書き出し: {count} 件")
+        return EXIT_OK
+
+    try:
+        report = import_rules(config, args.file, args.mode)
+    except (OSError, ValueError) as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    lines = [f"追加: {report['added']}, 更新: {report['updated']}, "
+             f"重複: {report['duplicates']}, 無効: {len(report['invalid'])}"]
+    lines += [f"  {line_num}行目: {reason}" for line_num, reason in report["invalid"]]
+    lines += [f"  使われないルール: {pattern}（先に {by_pattern} に一致）" for pattern, by_pattern in report["shadowed"]]
+    print_result(args, report, "\n".join(lines))
+    return EXIT_ERRORS if report["invalid"] else EXIT_OK
+
+
+def _analyze_rules(args, config: Config) -> int:
+    """重複・隠れている・一致しないルールを表示（--prune なら重複・隠れているルールを削除）"""
+    from analyzer import KIND_LABELS, analyze_rules, load_rule_hits, prune_rules
+
+    hits, runs = load_rule_hits(config, args.history_runs)
+    results = analyze_rules(config.get_mappings(), config.is_normalize_match(), hits, runs)
+    lines = []
+    for result in results:
+        line = f"{result['index'] + 1:>5}  {KIND_LABELS[result['kind']]:<6} {result['pattern']}"
+        if result["by"] is not None:
+            line += f"（先に {result['by']} に一致）"
+        lines.append(line)
+    if not runs:
+        lines.append("実行履歴がないため、一致しないルールは調べていません")
+    else:
+        lines.append(f"直近 {runs} 回の実行履歴で確認しました")
+
+    removed = 0
+    if args.prune:
+        removed = prune_rules(config, [result["index"] for result in results if result["kind"] != "never_hit"])
+        lines.append(f"削除: {removed} 件")
+    print_result(args, {"results": results, "history_runs": runs, "removed": removed}, "\n".join(lines))
+    return EXIT_OK
+
+
+def cmd_catalog(args) -> int:
+    """振り分けたファイルのカタログを検索"""
+    from catalog import Catalog, CATALOG_FILE
+
+    config = Config(args.config[0])
+    path = config.get_state_path(CATALOG_FILE)
+    if not os.path.exists(path):
+        print("エラー: カタログがありません（設定の catalog.enabled を有効にして実行してください）", file=sys.stderr)
+        return EXIT_USAGE
+
+    with Catalog(path) as catalog:
+        if args.action == "find":
+            if not args.name:
+                print("エラー: 検索するファイル名を指定してください", file=sys.stderr)
+                return EXIT_USAGE
+            rows = catalog.find(args.name, args.limit)
+            text = "\n".join(f"{row['name']} → {row['path']} ({row['run_id']})" for row in rows) or "見つかりません"
+            print_result(args, rows, text)
+        elif args.action == "rules":
+            rows = catalog.rule_stats()
+            summary = catalog.summary()
+            lines = [f"{row['rule'] or '(ルールなし)'}: {row['files']} 件, {row['bytes']:,} バイト" for row in rows]
+            lines.append(f"合計: {summary['files']} 件, {summary['bytes']:,} バイト")
+            print_result(args, {"rules": rows, "total": summary}, "\n".join(lines))
+        else:
+            groups = catalog.duplicates(args.limit)
+            lines = []
+            for group in groups:
+                lines.append(f"{group['hash'][:16]}… ({group['count']} 件)")
+                lines += [f"  {p}" for p in group["paths"]]
+            print_result(args, groups, "\n".join(lines) or "重複はありません（ハッシュの記録には catalog.hash が必要です）")
+    return EXIT_OK
+
+
+def cmd_history(args) -> int:
+    """日ごと・週ごとの実行履歴を表示"""
+    from history import RunHistory, HISTORY_FILE
+
+    config = Config(args.config[0])
+    path = config.get_state_path(HISTORY_FILE)
+    if not os.path.exists(path):
+        print_result(args, [], "実行履歴がありません")
+        return EXIT_OK
+    with RunHistory(path) as history:
+        rows = history.aggregates(args.period, args.limit)
+    lines = [f"{row['key']}: 実行 {row['runs']} 回, 移動 {row['moved_files']} 件 "
+             f"({row['moved_bytes'] / 1024 / 1024:,.1f} MB), エラー {row['errors']}, "
+             f"{row['throughput']:.1f} 件/秒, 残り {row['remaining_files']} 件" for row in rows]
+    print_result(args, rows, "\n".join(lines) or "実行履歴がありません")
+    return EXIT_OK
+
+
+def _help_formatter(prog: str) -> argparse.HelpFormatter:
+    """ヘルプの書式（既定の書式は端末の幅を調べるためだけに shutil を読み込むので、os で調べる）"""
+    try:
+        width = os.get_terminal_size().columns - 2
+    except OSError:
+        width = 78
+    return argparse.HelpFormatter(prog, width=width)
+
+
+class _ArgumentParser(argparse.ArgumentParser):
+    """起動時間を短くするため、_help_formatter を使う引数パーサー（サブコマンドにも引き継ぐ）"""
+
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault("formatter_class", _help_formatter)
+        super().__init__(*args, **kwargs)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """引数パーサーを作成"""
+    common = _ArgumentParser(add_help=False)
+    common.add_argument("--config", action="append",
+                        help="設定ファイルのパス（既定: config.json）。run では複数指定でプロファイルとしてまとめて実行")
+    common.add_argument("--json", action="store_true", help="結果を JSON で出力")
+    common.add_argument("-q", "--quiet", action="store_true", help="ログを出力しない")
+
+    parser = _ArgumentParser(prog="picsort", description="PicSort - 画像ファイル自動振り分けツール")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("run", parents=[common], help="振り分けを実行").set_defaults(func=cmd_run)
+    subparsers.add_parser("plan", parents=[common], help="移動せずに振り分け予定を表示").set_defaults(func=cmd_plan)
+    watch = subparsers.add_parser("watch", parents=[common], help="一定間隔で振り分けを繰り返す")
+    watch.add_argument("--interval", type=float, default=60, help="確認間隔（秒、既定: 60）")
+    watch.set_defaults(func=cmd_watch)
+    subparsers.add_parser("undo", parents=[common], help="前回の実行を取り消す").set_defaults(func=cmd_undo)
+    subparsers.add_parser("stats", parents=[common], help="前回の実行結果を表示").set_defaults(func=cmd_stats)
+    rules = subparsers.add_parser("rules", parents=[common], help="ルールを CSV/TSV でインポート・エクスポート、ルールを診断")
+    rules.add_argument("action", choices=["import", "export", "analyze"],
+                       help="import / export: CSV/TSV で読み書き、analyze: 重複・隠れている・一致しないルールを表示")
+    rules.add_argument("file", nargs="?", help="CSV/TSV ファイルのパス（拡張子 .tsv はタブ区切り）")
+    rules.add_argument("--mode", choices=["merge", "upsert", "replace"], default="merge",
+                       help="インポート方法（既定: merge）")
+    rules.add_argument("--prune", action="store_true", help="重複・隠れているルールを削除（analyze のみ）")
+    rules.add_argument("--history-runs", type=int, default=100,
+                       help="一致しないルールを調べる実行履歴の回数（analyze のみ、既定: 100）")
+    rules.set_defaults(func=cmd_rules)
+    catalog = subparsers.add_parser("catalog", parents=[common], help="振り分けたファイルのカタログを検索")
+    catalog.add_argument("action", choices=["find", "rules", "dupes"],
+                         help="find: ファイル名で検索（前方一致）、rules: ルールごとの件数、dupes: 同じ内容のファイル")
+    catalog.add_argument("name", nargs="?", help="検索するファイル名（find のみ）")
+    catalog.add_argument("--limit", type=int, default=100, help="表示する最大件数（既定: 100）")
+    catalog.set_defaults(func=cmd_catalog)
+    history = subparsers.add_parser("history", parents=[common], help="日ごと・週ごとの実行履歴を表示")
+    history.add_argument("--period", choices=["day", "week"], default="day", help="集計単位（既定: day）")
+    history.add_argument("--limit", type=int, default=30, help="表示する期間の数（既定: 30）")
+    history.set_defaults(func=cmd_history)
+    return parser
+
+
+def main(argv=None) -> int:
+    """メイン関数"""
+    args = build_parser().parse_args(argv)
+    args.config = args.config or ["config.json"]
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    if getattr(sys, "frozen", False):
+        # EXE 化した場合に、プロセスプールのワーカーが CLI を実行しないようにする（起動時間のため通常は読み込まない）
+        import multiprocessing
+        multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,150 @@
+"""
+PicSort - ルールのプレビュー
+ルール編集ダイアログで、入力中の条件に一致するソースフォルダのファイルと、
+先に並ぶルールに取られてしまうかどうかを表示するための照合を行います。
+ソースフォルダの一覧は1回だけ取得してキャッシュし、条件に文字を足した場合は
+前回の一致結果だけを絞り込むため、10万件のフォルダでも入力に追従できます。
+"""
+
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from matcher import RuleConditions, RuleMatcher, normalize_text
+
+# 条件ごとの一致結果を保持する件数
+RESULT_CACHE_SIZE = 64
+
+
+class SourceSnapshot:
+    """ソースフォルダのファイル名一覧（フォルダの更新日時が変わるまで再利用する）"""
+
+    def __init__(self, folder: str):
+        self.folder = folder
+        self.mtime_ns = os.stat(folder).st_mtime_ns
+        names = []
+        with os.scandir(folder) as it:
+            for entry in it:
+                try:
+                    if entry.is_file():
+                        names.append(entry.name)
+                except OSError:
+                    continue
+        names.sort()
+        self.names = names
+        self._normalized: Optional[List[str]] = None
+        # ファイルのインデックス → stat（追加条件の判定に必要になった分だけ取得する）
+        self._stats: Dict[int, os.stat_result] = {}
+
+    def is_current(self) -> bool:
+        """フォルダが変わっていなければ True"""
+        try:
+            return os.stat(self.folder).st_mtime_ns == self.mtime_ns
+        except OSError:
+            return False
+
+    def stat(self, index: int) -> os.stat_result:
+        """ファイルの stat（初回のみ取得）"""
+        st = self._stats.get(index)
+        if st is None:
+            st = self._stats[index] = os.stat(os.path.join(self.folder, self.names[index]))
+        return st
+
+    def normalized_names(self) -> List[str]:
+        """正規化したファイル名の一覧（初回のみ作成）"""
+        if self._normalized is None:
+            self._normalized = [normalize_text(name) for name in self.names]
+        return self._normalized
+
+
+class RulePreview:
+    """入力中の条件に一致するファイルを調べる（ダイアログを開くたびに1回作成）"""
+
+    def __init__(self, snapshot: SourceSnapshot, earlier_rules: List[Dict[str, Any]], normalize: bool = False):
+        """
+        初期化
+
+        Args:
+            snapshot: ソースフォルダの一覧
+            earlier_rules: 編集中のルールより前に並ぶルール
+            normalize: True なら NFKC 正規化 + 大文字小文字を無視して照合する
+        """
+        self.snapshot = snapshot
+        self.normalize = normalize
+        self._keys = snapshot.normalized_names() if normalize else snapshot.names
+        self._earlier_rules = earlier_rules
+        # ファイル名は正規化済みなので、条件も正規化した上で正規化なしのマッチャーで照合する。
+        # 追加条件のあるルールは、実行時と同じく条件に合うファイルだけを取る
+        self._earlier = RuleMatcher(
+            [dict(rule, pattern=normalize_text(rule["pattern"]) if normalize else rule["pattern"])
+             for rule in earlier_rules]
+        ) if earlier_rules else None
+        # ファイルのインデックス → 先に一致するルール（ない場合は None）
+        self._taken: Dict[int, Optional[str]] = {}
+        # 条件 → 一致したファイルのインデックス
+        self._results: Dict[str, List[int]] = {}
+
+    def _matching(self, pattern: str) -> List[int]:
+        """条件に一致するファイルのインデックス（前回の結果から絞り込めれば絞り込む）"""
+        cached = self._results.get(pattern)
+        if cached is not None:
+            return cached
+
+        # 条件を含む、より短い条件の結果があれば、その中から探せば十分
+        base = None
+        for previous, indices in self._results.items():
+            if previous in pattern and (base is None or len(indices) < len(base)):
+                base = indices
+        keys = self._keys
+        if base is None:
+            indices = [i for i, key in enumerate(keys) if pattern in key]
+        else:
+            indices = [i for i in base if pattern in keys[i]]
+
+        if len(self._results) >= RESULT_CACHE_SIZE:
+            self._results.pop(next(iter(self._results)))
+        self._results[pattern] = indices
+        return indices
+
+    def _taken_by(self, index: int) -> Optional[str]:
+        """先に並ぶルールのうち、このファイルに最初に一致するものの条件"""
+        if index not in self._taken:
+            first = self._earlier.match_index(self._keys[index], lambda: self.snapshot.stat(index)) \
+                if self._earlier is not None else None
+            self._taken[index] = self._earlier_rules[first]["pattern"] if first is not None else None
+        return self._taken[index]
+
+    def _accepted(self, indices: List[int], conditions: Dict[str, Any]) -> List[int]:
+        """追加条件を満たすファイルだけに絞り込む"""
+        condition = RuleConditions(conditions, time.time())
+        names = self.snapshot.names
+        accepted = []
+        for i in indices:
+            ext = os.path.splitext(names[i])[1].lower()
+            if condition.accepts(ext, lambda i=i: self.snapshot.stat(i)):
+                accepted.append(i)
+        return accepted
+
+    def preview(self, pattern: str, limit: int = 200,
+                conditions: Optional[Dict[str, Any]] = None) -> Tuple[int, int, List[Tuple[str, Optional[str]]]]:
+        """
+        条件に一致するファイルを調べる
+
+        Args:
+            pattern: 入力中の条件
+            limit: 返すファイル名の上限
+            conditions: 入力中の追加条件（拡張子・サイズ・経過時間）
+
+        Returns:
+            (一致したファイル数, そのうち先に並ぶルールに取られる数,
+             (ファイル名, 先に一致するルールの条件 または None) のリスト)
+        """
+        if not pattern:
+            return 0, 0, []
+        key = normalize_text(pattern) if self.normalize else pattern
+        indices = self._matching(key)
+        if conditions:
+            indices = self._accepted(indices, conditions)
+        taken = sum(1 for i in indices if self._taken_by(i) is not None) if self._earlier is not None else 0
+        rows = [(self.snapshot.names[i], self._taken_by(i)) for i in indices[:limit]]
+        return len(indices), taken, rows
@@ -0,0 +1,100 @@
+"""
+PicSort - 一時的な移動エラーの再試行
+ウイルス対策ソフトや画像ビューアがファイルを開いている間の移動エラーは、少し待てば成功します。
+こうした一時的なエラーを恒久的なエラー（ファイルがない、権限がないなど）と区別し、
+指数バックオフで再試行します。待っている間も他のファイルの処理は止めません。
+"""
+
+import time
+import errno
+import heapq
+import itertools
+from typing import Any, Dict, List, Optional, Tuple
+
+# 再試行の結果を持ち越すファイル（設定ファイルと同じフォルダに保存）
+RETRY_FILE = "retry.jsonl"
+# 1回の実行中にキューに入れておく最大件数（超えた分は次回の実行に持ち越す）
+DEFAULT_MAX_QUEUED = 1000
+
+# 一時的なエラーとみなす errno
+_TRANSIENT_ERRNOS = {errno.EBUSY, errno.EAGAIN, errno.ETXTBSY, errno.EINTR, errno.ETIMEDOUT}
+# Windows: ERROR_SHARING_VIOLATION / ERROR_LOCK_VIOLATION / ERROR_USER_MAPPED_FILE
+_TRANSIENT_WINERRORS = {32, 33, 1224}
+
+
+def is_transient(error: BaseException) -> bool:
+    """少し待てば成功する可能性のあるエラーかどうか（他のプロセスによるロックなど）"""
+    if isinstance(error, TimeoutError):
+        return True
+    if not isinstance(error, OSError):
+        return False
+    if getattr(error, "winerror", None) in _TRANSIENT_WINERRORS:
+        return True
+    return error.errno in _TRANSIENT_ERRNOS
+
+
+class RetryQueue:
+    """指数バックオフ付きの再試行キュー（期限の早い順に取り出す）"""
+
+    def __init__(self, max_attempts: int = 4, base_delay: float = 0.5, max_delay: float = 8.0,
+                 clock=time.monotonic, max_queued: int = DEFAULT_MAX_QUEUED):
+        """
+        初期化
+
+        Args:
+            max_attempts: 1回の実行中に再試行する最大回数
+            base_delay: 1回目の再試行までの待ち時間（秒、以降は倍々に増える）
+            max_delay: 待ち時間の上限（秒）
+            clock: 現在時刻を返す関数（テスト用に差し替え可能）
+            max_queued: キューに入れておく最大件数（メモリ使用量を一定に保つ）
+        """
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_queued = max_queued
+        self.clock = clock
+        self._heap: List[Tuple[float, int, Dict[str, Any]]] = []
+        self._counter = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def delay_for(self, attempts: int) -> float:
+        """attempts 回失敗した後の待ち時間"""
+        return min(self.max_delay, self.base_delay * (2 ** max(0, attempts - 1)))
+
+    def push(self, item: Dict[str, Any], due: Optional[float] = None) -> Optional[float]:
+        """
+        再試行を予約（item["run_attempts"] はこの実行での失敗回数）
+
+        Returns:
+            予約した再試行の期限（clock の時刻）。1回の実行での再試行回数を使い切った場合や
+            キューが一杯の場合は None
+        """
+        run_attempts = item.get("run_attempts", 0)
+        if run_attempts > self.max_attempts or len(self._heap) >= self.max_queued:
+            return None
+        if due is None:
+            due = self.clock() + self.delay_for(run_attempts)
+        heapq.heappush(self._heap, (due, next(self._counter), item))
+        return due
+
+    def pop_due(self) -> List[Dict[str, Any]]:
+        """期限が来た項目をすべて取り出す"""
+        now = self.clock()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due.append(heapq.heappop(self._heap)[2])
+        return due
+
+    def next_due(self) -> Optional[float]:
+        """次の期限までの秒数（空の場合は None）"""
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - self.clock())
+
+    def drain(self) -> List[Dict[str, Any]]:
+        """残っている項目をすべて取り出す（次回の実行に持ち越す分）"""
+        items = [entry[2] for entry in sorted(self._heap)]
+        self._heap.clear()
+        return items
@@ -0,0 +1,208 @@
+"""
+PicSort - 振り分けルールの CSV/TSV 一括インポート・エクスポート
+ファイルは1行ずつ読み込み、重複・無効な行・先行ルールに隠れるルールを1回の走査で検出して、
+最後に1回だけ設定を保存します。
+"""
+
+import os
+import csv
+import json
+from typing import Any, Dict, Iterator, List, Tuple
+
+from organizer import Config
+from matcher import check_conditions
+from templates import DestinationTemplate
+
+# インポートモード
+IMPORT_MODES = ("merge", "upsert", "replace")
+
+# 3列目以降は追加の設定（JSON、空欄なら設定なし）
+EXTRA_COLUMNS = ["conditions", "transcode"]
+HEADER = ["pattern", "destination"] + EXTRA_COLUMNS
+
+
+def _delimiter_for(path: str) -> str:
+    """拡張子から区切り文字を決める（.tsv / .tab はタブ、それ以外はカンマ）"""
+    return "\t" if os.path.splitext(path)[1].lower() in (".tsv", ".tab") else ","
+
+
+def export_rules(config: Config, path: str) -> int:
+    """
+    振り分けルールを CSV/TSV に書き出す
+
+    Returns:
+        書き出したルール数
+    """
+    mappings = config.get_mappings()
+    with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f, delimiter=_delimiter_for(path))
+        writer.writerow(HEADER)
+        for mapping in mappings:
+            extras = [json.dumps(mapping[key], ensure_ascii=False) if mapping.get(key) else ""
+                      for key in EXTRA_COLUMNS]
+            writer.writerow([mapping["pattern"], mapping["destination"]] + extras)
+    return len(mappings)
+
+
+def _read_rows(path: str) -> Iterator[Tuple[int, str, str, Dict[str, str]]]:
+    """
+    CSV/TSV を1行ずつ読み込み (行番号, パターン, 振り分け先, 追加の列) を返す
+
+    追加の列は見出し行にある列（見出しがなければ HEADER の順で行にある列）だけを返します。
+    """
+    columns = HEADER
+    with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+        reader = csv.reader(f, delimiter=_delimiter_for(path))
+        for row in reader:
+            if not row or not any(cell.strip() for cell in row):
+                continue
+            # 見出し行は読み飛ばす（列の並びだけ覚えておく）
+            if reader.line_num == 1 and [cell.strip().lower() for cell in row[:2]] == HEADER[:2]:
+                columns = [cell.strip().lower() for cell in row]
+                continue
+            cells = [cell.strip() for cell in row]
+            if columns is not HEADER:
+                # 見出しにある列は、行の末尾で省略されていても空欄として扱う
+                cells += [""] * (len(columns) - len(cells))
+            pattern = cells[0]
+            destination = cells[1] if len(cells) > 1 else ""
+            extras = {key: cell for key, cell in zip(columns[2:], cells[2:]) if key in EXTRA_COLUMNS}
+            yield reader.line_num, pattern, destination, extras
+
+
+def _parse_extras(extras: Dict[str, str]) -> Tuple[Dict[str, Any], str]:
+    """追加の列の JSON を読み込む（(設定, エラーの理由) を返す。空欄の列の値は None）"""
+    parsed: Dict[str, Any] = {}
+    for key, cell in extras.items():
+        if not cell:
+            parsed[key] = None
+            continue
+        try:
+            value = json.loads(cell)
+        except ValueError:
+            return {}, f"{key} 列が JSON として読み込めません: {cell}"
+        if not isinstance(value, dict):
+            return {}, f"{key} 列はオブジェクト（{{...}}）で指定してください: {cell}"
+        if key == "conditions":
+            error = check_conditions(value)
+            if error:
+                return {}, error
+        parsed[key] = value
+    return parsed, ""
+
+
+def _apply_extras(mapping: Dict[str, Any], extras: Dict[str, Any]) -> bool:
+    """追加の設定をルールに反映（値が None の列は設定を削除）。変更があれば True"""
+    changed = False
+    for key, value in extras.items():
+        if value:
+            if mapping.get(key) != value:
+                mapping[key] = value
+                changed = True
+        elif key in mapping:
+            del mapping[key]
+            changed = True
+    return changed
+
+
+def _check_destination(destination: str) -> str:
+    """振り分け先フォルダを検証（問題なければ空文字、あれば理由）"""
+    if not destination:
+        return "振り分け先フォルダが空です"
+    if not os.path.isabs(destination):
+        return f"振り分け先フォルダが絶対パスではありません: {destination}"
+    if os.path.exists(destination) and not os.path.isdir(destination):
+        return f"振り分け先がフォルダではありません: {destination}"
+    try:
+        # 書式の誤りがあるルールを取り込むと、以降の実行がすべて中止されるため読み込み時に確認する
+        DestinationTemplate(destination)
+    except ValueError as e:
+        return f"振り分け先の書式が正しくありません: {destination} ({e})"
+    return ""
+
+
+def import_rules(config: Config, path: str, mode: str = "merge") -> Dict[str, Any]:
+    """
+    CSV/TSV から振り分けルールを一括インポート
+
+    Args:
+        config: 設定オブジェクト（最後に1回だけ保存）
+        path: CSV/TSV ファイルのパス（1列目: 条件、2列目: 振り分け先フォルダ、
+              3列目以降: conditions / transcode の JSON）
+        mode: "merge"（既存の条件はそのまま、新しい条件を追加）、
+              "upsert"（既存の条件は振り分け先と追加の設定を更新、新しい条件を追加）、
+              "replace"（既存のルールをすべて置き換え。ファイルにない列の設定は同じ条件の既存ルールから引き継ぐ）
+
+    Returns:
+        結果（added / updated / duplicates / invalid / shadowed）。
+        invalid は (行番号, 理由)、shadowed は (条件, 先に一致するルールの条件) のリスト。
+    """
+    if mode not in IMPORT_MODES:
+        raise ValueError(f"不明なインポートモードです: {mode}")
+
+    existing = {mapping["pattern"]: mapping for mapping in config.get_mappings()}
+    mappings: List[Dict[str, Any]] = [] if mode == "replace" else [dict(m) for m in config.get_mappings()]
+    index_by_pattern = {mapping["pattern"]: i for i, mapping in enumerate(mappings)}
+    seen_in_file = set()
+    destination_errors: Dict[str, str] = {}
+    report: Dict[str, Any] = {"added": 0, "updated": 0, "duplicates": 0, "invalid": [], "shadowed": []}
+
+    for line_num, pattern, destination, extra_cells in _read_rows(path):
+        if not pattern:
+            report["invalid"].append((line_num, "条件が空です"))
+            continue
+        if pattern in seen_in_file:
+            report["duplicates"] += 1
+            continue
+        seen_in_file.add(pattern)
+
+        # 同じ振り分け先の検証は1回だけ
+        error = destination_errors.get(destination)
+        if error is None:
+            error = destination_errors[destination] = _check_destination(destination)
+        if error:
+            report["invalid"].append((line_num, error))
+            continue
+        extras, error = _parse_extras(extra_cells)
+        if error:
+            report["invalid"].append((line_num, error))
+            continue
+
+        index = index_by_pattern.get(pattern)
+        if index is None:
+            index_by_pattern[pattern] = len(mappings)
+            mapping = {"pattern": pattern, "destination": destination}
+            if mode == "replace" and pattern in existing:
+                # ファイルにない列（2列だけの CSV など）の設定は既存ルールから引き継ぐ
+                mapping.update((key, existing[pattern][key]) for key in EXTRA_COLUMNS
+                               if key not in extras and key in existing[pattern])
+            _apply_extras(mapping, extras)
+            mappings.append(mapping)
+            report["added"] += 1
+        elif mode == "upsert":
+            mapping = mappings[index]
+            changed = _apply_extras(mapping, extras)
+            if mapping["destination"] != destination:
+                mapping["destination"] = destination
+                changed = True
+            report["updated" if changed else "duplicates"] += 1
+        else:
+            report["duplicates"] += 1
+
+    report["shadowed"] = find_shadowed(mappings, config.is_normalize_match())
+
+    config.data["mappings"] = mappings
+    config.save()
+    return report
+
+
+def find_shadowed(mappings: List[Dict[str, str]], normalize: bool = False) -> List[Tuple[str, str]]:
+    """
+    先に並ぶルールの条件を含んでいるため一致することがないルールを探す（重複を含む）
+
+    Returns:
+        (隠れているルールの条件, 先に一致するルールの条件) のリスト
+    """
+    from analyzer import find_dead_rules
+
+    return [(result["pattern"], result["by"]) for result in find_dead_rules(mappings, normalize)]
@@ -4,28 +4,45 @@ GUIウィンドウを表示せずにファイル振り分けを実行します
 タスクスケジューラでの定期実行に最適です。
 """
 
-from organizer import Config, FileOrganizer
+from organizer import Config, FileOrganizer, merge_stats
+from logsetup import setup_background_logging
+from runlock import RunCoordinator
 import logging
-from datetime import datetime
+import multiprocessing
 
-# ログファイルの設定（オプション）
-logging.basicConfig(
-    filename='organizer.log',
-    level=logging.INFO,
-    format='%(asctime)s - %(message)s',
-    encoding='utf-8'
-)
 
 def log_message(message):
     """ログメッセージを記録"""
     logging.info(message)
 
-# 設定を読み込み
-config = Config()
 
-# ファイル振り分けを実行
-organizer = FileOrganizer(config, log_message)
-stats = organizer.organize()
+def main():
+    """メイン関数"""
+    # 設定を読み込み
+    config = Config()
 
-# 結果をログに記録
-logging.info(f"実行完了 - 移動: {stats['moved_files']}, スキップ: {stats['skipped_files']}, エラー: {stats['errors']}")
+    # ログはキュー経由で別スレッドが書き込む（サイズでローテーション）
+    listener = setup_background_logging(config)
+
+    try:
+        # ファイル振り分けを実行
+        # 他のPicSortが実行中の場合は、そちらの終了後の再実行にまとめる
+        organizer = FileOrganizer(config, log_message)
+        results = RunCoordinator(config).run(organizer.organize)
+        organizer.close()
+
+        # 結果をログに記録
+        if results:
+            stats = merge_stats(results)
+            logging.info(f"実行完了 - 移動: {stats['moved_files']}, スキップ: {stats['skipped_files']}, エラー: {stats['errors']}")
+        else:
+            logging.info("他のPicSortが実行中のため、終了後の再実行にまとめました")
+    finally:
+        # キューに残ったログを書き出してから終了
+        listener.stop()
+
+
+if __name__ == "__main__":
+    # プロセスプールのワーカー（EXE 化した場合や Windows の spawn）で振り分けを再実行しないようにする
+    multiprocessing.freeze_support()
+    main()
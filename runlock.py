@@ -0,0 +1,115 @@
+"""
+PicSort - 実行の排他制御
+GUI・run_silent.pyw・CLI で共通のロックファイルを使い、同時に1つの振り分けだけを実行します。
+実行中に届いた実行要求は捨てずに、実行中のプロセスが終了後に1回だけまとめて再実行します。
+"""
+
+import os
+from typing import Any, Callable, List
+
+from organizer import Config
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
+LOCK_FILE = "picsort.lock"
+PENDING_FILE = "picsort.pending"
+
+
+class RunCoordinator:
+    """振り分け実行の排他制御"""
+
+    def __init__(self, config: Config):
+        """
+        初期化
+
+        Args:
+            config: 設定オブジェクト（ロックファイルは設定ファイルと同じフォルダに作成）
+        """
+        self.lock_path = config.get_state_path(LOCK_FILE)
+        self.pending_path = config.get_state_path(PENDING_FILE)
+        self._lock_file = None
+
+    def acquire(self) -> bool:
+        """
+        ロックを取得（待たずに結果を返す）
+
+        Returns:
+            取得できた場合は True、他のプロセスが実行中の場合は False
+        """
+        if self._lock_file is not None:
+            return True
+        f = open(self.lock_path, "a+")
+        try:
+            if os.name == "nt":
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            f.close()
+            return False
+        self._lock_file = f
+        return True
+
+    def release(self):
+        """ロックを解放"""
+        f, self._lock_file = self._lock_file, None
+        if f is None:
+            return
+        try:
+            if os.name == "nt":
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        finally:
+            f.close()
+
+    def _request_followup(self):
+        """実行中のプロセスに再実行を依頼"""
+        with open(self.pending_path, "w") as f:
+            f.write(str(os.getpid()))
+
+    def _take_followup(self) -> bool:
+        """再実行の依頼があれば取り消して True を返す"""
+        try:
+            os.remove(self.pending_path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    def run(self, func: Callable[[], Any]) -> List[Any]:
+        """
+        排他制御のもとで func を実行
+
+        他のプロセスが実行中の場合は再実行を依頼してすぐに戻ります。
+        実行中に届いた依頼は何件あっても、終了後の1回の再実行にまとめられます。
+
+        Args:
+            func: 実行する処理（例: organizer.organize）
+
+        Returns:
+            このプロセスで実行した各回の結果のリスト（他のプロセスにまとめた場合は空）
+        """
+        results = []
+        while True:
+            if not self.acquire():
+                self._request_followup()
+                # 依頼を書く前に実行中のプロセスが終了していた場合は自分で引き継ぐ
+                if not self.acquire():
+                    return results
+            try:
+                # 古い依頼は今回の実行で満たされる
+                self._take_followup()
+                while True:
+                    results.append(func())
+                    if not self._take_followup():
+                        break
+            finally:
+                self.release()
+            # ロック解放の直前に届いた依頼を取りこぼさない
+            if not os.path.exists(self.pending_path):
+                return results
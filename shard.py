@@ -0,0 +1,130 @@
+"""
+PicSort - 複数プロセスによる振り分け
+ファイル数の多いソースフォルダを、ファイル名のハッシュで分割して複数のプロセスで処理します。
+
+1. 照合: 各プロセスが担当するファイル名をルールと照合し、振り分け先を決める
+2. 移動: 振り分け先フォルダごとに担当プロセスを1つに決め、ファイル名順に移動する
+
+同じフォルダへの移動は常に1つのプロセスがファイル名順に行うため、同名ファイルの
+リネーム（_1, _2 …）の結果はプロセス数や実行タイミングに関係なく同じになります。
+"""
+
+import os
+import zlib
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from matcher import RuleMatcher
+from templates import DestinationTemplate
+
+# 照合結果: (ファイル名, 振り分け先フォルダ, ルールの条件)
+Plan = Tuple[str, str, str]
+# 移動結果: (ファイル名, 振り分け先フォルダ, 移動後のパス または None, エラー または None, ルールの条件, サイズ)
+MoveResult = Tuple[str, str, Optional[str], Optional[str], str, int]
+
+# ワーカープロセスごとのマッチャーと振り分け先テンプレート（初期化時に1回だけ作成）
+_matcher: Optional[RuleMatcher] = None
+_templates: Dict[str, DestinationTemplate] = {}
+
+
+def shard_of(key: str, shards: int) -> int:
+    """キーの担当プロセス番号（プロセス間で同じ値になるよう crc32 を使う）"""
+    return zlib.crc32(key.encode("utf-8", "surrogatepass")) % shards
+
+
+def _init_worker(rules: List[Dict[str, Any]], normalize: bool):
+    """ワーカープロセスの初期化"""
+    global _matcher, _templates
+    _matcher = RuleMatcher(rules, normalize=normalize)
+    _templates = {rule["destination"]: DestinationTemplate(rule["destination"]) for rule in rules}
+
+
+def _plan_shard(source_folder: str, names: List[str]) -> List[Plan]:
+    """担当するファイル名をルールと照合し、振り分け先を決める"""
+    plans = []
+    for name in names:
+        path = os.path.join(source_folder, name)
+        rule = _matcher.match(name, lambda: os.stat(path))
+        if rule is None:
+            continue
+        template = _templates[rule["destination"]]
+        if template.is_static:
+            destination_folder = template.template
+        else:
+            try:
+                mtime = os.stat(path).st_mtime if template.needs_mtime else None
+            except OSError:
+                continue
+            destination_folder = template.render(name, rule["pattern"], mtime)
+        plans.append((name, destination_folder, rule["pattern"]))
+    return plans
+
+
+def _move_groups(source_folder: str, groups: List[Tuple[str, List[Tuple[str, str]]]]) -> List[MoveResult]:
+    """
+    担当する振り分け先フォルダへファイル名順に移動する
+
+    Args:
+        groups: (振り分け先フォルダ, [(ファイル名, ルールの条件), ...]) のリスト
+    """
+    results = []
+    for destination_folder, files in groups:
+        try:
+            os.makedirs(destination_folder, exist_ok=True)
+        except OSError as e:
+            results.extend((name, destination_folder, None, str(e), pattern, 0) for name, pattern in files)
+            continue
+        for name, pattern in sorted(files):
+            source_path = os.path.join(source_folder, name)
+            try:
+                size = os.stat(source_path).st_size
+                destination_path = os.path.join(destination_folder, name)
+                if os.path.exists(destination_path):
+                    base, ext = os.path.splitext(name)
+                    counter = 1
+                    while os.path.exists(destination_path):
+                        destination_path = os.path.join(destination_folder, f"{base}_{counter}{ext}")
+                        counter += 1
+                shutil.move(source_path, destination_path)
+                results.append((name, destination_folder, destination_path, None, pattern, size))
+            except OSError as e:
+                results.append((name, destination_folder, None, str(e), pattern, 0))
+    return results
+
+
+def organize_sharded(source_folder: str, names: List[str], rules: List[Dict[str, Any]],
+                     normalize: bool, workers: int) -> List[MoveResult]:
+    """
+    複数のプロセスで照合と移動を行う
+
+    Args:
+        source_folder: ソースフォルダ
+        names: ソースフォルダのファイル名の一覧
+        rules: 振り分けルール
+        normalize: True なら NFKC 正規化 + 大文字小文字を無視して照合する
+        workers: プロセス数
+
+    Returns:
+        マッチしたファイルの移動結果（エラーも含む）
+    """
+    shards: List[List[str]] = [[] for _ in range(workers)]
+    for name in names:
+        shards[shard_of(name, workers)].append(name)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(rules, normalize)) as pool:
+        # 1. 照合（ファイル名で分割）
+        plans: Dict[str, List[Tuple[str, str]]] = {}
+        for shard_plans in pool.map(_plan_shard, [source_folder] * workers, shards):
+            for name, destination_folder, pattern in shard_plans:
+                plans.setdefault(destination_folder, []).append((name, pattern))
+
+        # 2. 移動（振り分け先フォルダで分割）
+        groups: List[List[Tuple[str, List[Tuple[str, str]]]]] = [[] for _ in range(workers)]
+        for destination_folder, files in plans.items():
+            groups[shard_of(os.path.normcase(destination_folder), workers)].append((destination_folder, files))
+        results: List[MoveResult] = []
+        for shard_results in pool.map(_move_groups, [source_folder] * workers, groups):
+            results.extend(shard_results)
+
+    return results
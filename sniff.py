@@ -0,0 +1,165 @@
+"""
+PicSort - ファイルの先頭バイトによる種類の判定
+拡張子ではなくファイルの中身（マジックバイト）で画像の種類を判定します。
+各ファイルの先頭数十バイトだけをスレッドプールでまとめて読み込み、
+結果は (パス, サイズ, 更新日時) をキーにキャッシュして次回の実行でも再利用します。
+"""
+
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# 判定に読み込むバイト数
+HEAD_SIZE = 32
+
+# 判定できる種類と、その種類として正しい拡張子（先頭が標準の拡張子）
+TYPE_EXTENSIONS = {
+    "png": (".png",),
+    "jpeg": (".jpg", ".jpeg", ".jpe", ".jfif"),
+    "gif": (".gif",),
+    "webp": (".webp",),
+    "bmp": (".bmp",),
+    "tiff": (".tif", ".tiff"),
+    "avif": (".avif",),
+    "heic": (".heic", ".heif"),
+    "ico": (".ico",),
+    "psd": (".psd",),
+}
+
+# ISO BMFF（ftyp ボックス）のブランド → 種類
+_FTYP_BRANDS = {
+    b"avif": "avif", b"avis": "avif",
+    b"heic": "heic", b"heix": "heic", b"hevc": "heic", b"heim": "heic", b"heis": "heic", b"mif1": "heic",
+}
+
+
+def detect_type(head: bytes) -> Optional[str]:
+    """先頭バイトから画像の種類を判定（画像でなければ None）"""
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if head.startswith((b"GIF87a", b"GIF89a")):
+        return "gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    if head.startswith(b"BM") and len(head) >= 14:
+        return "bmp"
+    if head.startswith((b"II*\x00", b"MM\x00*")):
+        return "tiff"
+    if head[4:8] == b"ftyp":
+        return _FTYP_BRANDS.get(head[8:12])
+    if head.startswith(b"\x00\x00\x01\x00"):
+        return "ico"
+    if head.startswith(b"8BPS"):
+        return "psd"
+    return None
+
+
+def sniff_file(path: str) -> Optional[str]:
+    """ファイルの先頭だけを読み込んで種類を判定"""
+    with open(path, "rb") as f:
+        return detect_type(f.read(HEAD_SIZE))
+
+
+def fixed_filename(filename: str, file_type: Optional[str]) -> str:
+    """拡張子が中身と一致しない場合は正しい拡張子に付け替えたファイル名を返す（一致すればそのまま）"""
+    extensions = TYPE_EXTENSIONS.get(file_type)
+    if extensions is None:
+        return filename
+    stem, ext = os.path.splitext(filename)
+    if ext.lower() in extensions:
+        return filename
+    return stem + extensions[0]
+
+
+class TypeSniffer:
+    """ファイルの種類の判定サービス（結果をキャッシュする）"""
+
+    def __init__(self, max_workers: int = 8, cache_path: Optional[str] = None):
+        """
+        初期化
+
+        Args:
+            max_workers: 読み込みに使うスレッド数
+            cache_path: キャッシュの保存先（省略時はメモリ内のみ）
+        """
+        self.max_workers = max_workers
+        self.cache_path = cache_path
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # "パス|サイズ|更新日時" → 種類（画像でなければ空文字）
+        self._cache: Dict[str, str] = {}
+        # 今回の実行で参照したキー（保存時はこれだけを残す）
+        self._used: Dict[str, str] = {}
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path, 'r', encoding='utf-8') as f:
+                    self._cache = json.load(f)
+            except (OSError, ValueError):
+                self._cache = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def sniff_many(self, items: Iterable[Tuple[str, int, int]]) -> List[Optional[str]]:
+        """
+        複数のファイルの種類をまとめて判定
+
+        Args:
+            items: (パス, サイズ, 更新日時（ナノ秒）) のリスト
+
+        Returns:
+            各ファイルの種類（画像でない・読めない場合は None）。items と同じ順序
+        """
+        items = list(items)
+        results: List[Optional[str]] = [None] * len(items)
+        misses = []
+        for i, (path, size, mtime_ns) in enumerate(items):
+            key = f"{path}|{size}|{mtime_ns}"
+            cached = self._cache.get(key)
+            if cached is None:
+                misses.append((i, key, path))
+            else:
+                self._used[key] = cached
+                results[i] = cached or None
+
+        if misses:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="picsort-sniff")
+            for (i, key, path), file_type in zip(misses, self._executor.map(self._sniff_quietly,
+                                                                             [path for _, _, path in misses])):
+                if file_type is not None:
+                    self._cache[key] = self._used[key] = file_type
+                results[i] = file_type or None
+        return results
+
+    @staticmethod
+    def _sniff_quietly(path: str) -> Optional[str]:
+        """種類を判定（画像でなければ空文字。読み込めない場合は None を返し、キャッシュしない）"""
+        try:
+            return sniff_file(path) or ""
+        except OSError:
+            return None
+
+    def save_cache(self):
+        """今回の実行で参照した分だけキャッシュを保存（移動済みなど、もう参照しない分は捨てる）"""
+        if not self.cache_path:
+            return
+        tmp_path = self.cache_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._used, f, ensure_ascii=False)
+        os.replace(tmp_path, self.cache_path)
+
+    def close(self):
+        """キャッシュを保存してスレッドプールを終了"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+        try:
+            self.save_cache()
+        except OSError:
+            pass
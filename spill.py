@@ -0,0 +1,89 @@
+"""
+PicSort - ディスク退避付きキュー
+ファイルごとの保留状態（後回しにする処理など）をメモリ上限付きで保持します。
+"""
+
+import os
+import json
+import tempfile
+from typing import Any, Dict, Iterator, List, Optional
+
+# 既定でメモリ上に保持する件数
+DEFAULT_MAX_IN_MEMORY = 1000
+
+
+class SpillQueue:
+    """
+    メモリ上限付きのFIFOキュー
+
+    max_in_memory 件を超えた分は一時ファイルに JSON Lines 形式で書き出すため、
+    保留件数が何件になってもメモリ使用量は一定に保たれます。
+    要素は JSON に変換できる辞書である必要があります。
+    """
+
+    def __init__(self, max_in_memory: int = DEFAULT_MAX_IN_MEMORY, spill_dir: Optional[str] = None):
+        """
+        初期化
+
+        Args:
+            max_in_memory: メモリ上に保持する最大件数
+            spill_dir: 一時ファイルを作成するフォルダ（省略時はシステムの一時フォルダ）
+        """
+        self.max_in_memory = max_in_memory
+        self.spill_dir = spill_dir
+        self._memory: List[Dict[str, Any]] = []
+        self._spill_file = None
+        self._spilled = 0
+
+    def __len__(self) -> int:
+        return len(self._memory) + self._spilled
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def append(self, item: Dict[str, Any]):
+        """要素を追加"""
+        # 一度退避を始めたら順序を保つため以降はすべてファイルへ
+        if self._spill_file is None and len(self._memory) < self.max_in_memory:
+            self._memory.append(item)
+            return
+        if self._spill_file is None:
+            self._spill_file = tempfile.TemporaryFile(
+                mode="w+", encoding="utf-8", prefix="picsort_spill_", dir=self.spill_dir
+            )
+        self._spill_file.write(json.dumps(item, ensure_ascii=False) + "\n")
+        self._spilled += 1
+
+    def drain(self) -> Iterator[Dict[str, Any]]:
+        """追加順にすべての要素を取り出し、キューを空にする"""
+        memory, self._memory = self._memory, []
+        spill_file, self._spill_file = self._spill_file, None
+        self._spilled = 0
+
+        yield from memory
+        if spill_file is not None:
+            try:
+                spill_file.seek(0)
+                for line in spill_file:
+                    yield json.loads(line)
+            finally:
+                spill_file.close()
+
+    def dump(self, path: str):
+        """残っている要素をすべて JSON Lines ファイルに書き出す（キューは空になる）"""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for item in self.drain():
+                f.write(json.dumps(item, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, path)
+
+    def close(self):
+        """一時ファイルを破棄"""
+        self._memory = []
+        if self._spill_file is not None:
+            self._spill_file.close()
+            self._spill_file = None
+        self._spilled = 0
@@ -0,0 +1,96 @@
+"""
+PicSort - 振り分け先フォルダのテンプレート
+振り分け先に {rule} や {mtime:%Y} などを書くと、ファイルごとにサブフォルダを分けられます。
+
+使えるフィールド:
+    {rule}        マッチしたルールの条件（フォルダ名に使えない文字は _ に置換）
+    {ext}         拡張子（小文字、ドットなし。拡張子がない場合は noext）
+    {name}        拡張子を除いたファイル名
+    {mtime:書式}  更新日時（strftime の書式。省略時は %Y-%m-%d）
+"""
+
+from __future__ import annotations
+
+import re
+
+# typing の読み込みを避けるため（CLI の起動時間）、型ヒントは型チェック時のみ読み込む
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from typing import Callable, List, Optional
+
+FIELDS = ("rule", "ext", "name", "mtime")
+
+# フォルダ名に使えない文字
+_INVALID_CHARS = re.compile(r'[<>:"/\\|?*\x00-\x1f]')
+
+
+def _safe(text: str) -> str:
+    """フォルダ名に使えない文字を _ に置換"""
+    return _INVALID_CHARS.sub("_", text).strip(" .") or "_"
+
+
+def _format_mtime(mtime: float, fmt: str) -> str:
+    """更新日時を書式に従って文字列にする（datetime は書式を使うときに初めて読み込む）"""
+    from datetime import datetime
+    return datetime.fromtimestamp(mtime).strftime(fmt)
+
+
+class DestinationTemplate:
+    """コンパイル済みの振り分け先テンプレート（ルールごと・実行ごとに1回作成）"""
+
+    def __init__(self, template: str):
+        """
+        初期化
+
+        Args:
+            template: 振り分け先フォルダ（例: D:/Art/{rule}/{mtime:%Y}/{mtime:%m}）
+
+        Raises:
+            ValueError: 不明なフィールドや書式の誤りがある場合
+        """
+        self.template = template
+        self.needs_mtime = False
+        self.is_static = True
+        self._parts: List[Callable[[str, str, str, Optional[float]], str]] = []
+        if "{" not in template and "}" not in template:
+            # 書式を含まない振り分け先（ほとんどのルール）は解析しない
+            return
+
+        from string import Formatter
+        for literal, field, spec, conversion in Formatter().parse(template):
+            if literal:
+                self._parts.append(lambda stem, ext, rule, mtime, text=literal: text)
+            if field is None:
+                continue
+            self.is_static = False
+            if field not in FIELDS:
+                raise ValueError(f"不明なフィールドです: {{{field}}}（使用可能: {', '.join(FIELDS)}）")
+            if field == "mtime":
+                self.needs_mtime = True
+                fmt = spec or "%Y-%m-%d"
+                self._parts.append(
+                    lambda stem, ext, rule, mtime, fmt=fmt: _safe(_format_mtime(mtime, fmt))
+                )
+            elif field == "rule":
+                self._parts.append(lambda stem, ext, rule, mtime: _safe(rule))
+            elif field == "ext":
+                self._parts.append(lambda stem, ext, rule, mtime: _safe(ext or "noext"))
+            else:
+                self._parts.append(lambda stem, ext, rule, mtime: _safe(stem))
+
+    def render(self, filename: str, rule: str, mtime: Optional[float] = None) -> str:
+        """
+        ファイルごとの振り分け先フォルダを作成
+
+        Args:
+            filename: ファイル名
+            rule: マッチしたルールの条件
+            mtime: ファイルの更新日時（needs_mtime の場合は必須。走査時の stat を渡す）
+        """
+        if self.is_static:
+            return self.template
+        stem, dot, ext = filename.rpartition(".")
+        if not dot or not stem:
+            stem, ext = filename, ""
+        ext = ext.lower()
+        return "".join(part(stem, ext, rule, mtime) for part in self._parts)
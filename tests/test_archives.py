@@ -0,0 +1,47 @@
+"""ZIP アーカイブ内の画像の振り分けのテスト"""
+
+import os
+import json
+import zipfile
+import tempfile
+import unittest
+
+from organizer import Config, FileOrganizer
+
+
+class ArchiveRerunTest(unittest.TestCase):
+    """ソースフォルダに残ったアーカイブを次回の実行で展開し直さないことを確認"""
+
+    def setUp(self):
+        work_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(work_dir.cleanup)
+        self.root = work_dir.name
+        self.source = os.path.join(self.root, "source")
+        self.destination = os.path.join(self.root, "dest")
+        os.makedirs(self.source)
+        self.archive = os.path.join(self.source, "pack.zip")
+        with zipfile.ZipFile(self.archive, "w") as archive:
+            archive.writestr("artA_1.png", b"1" * 64)
+            archive.writestr("artA_2.png", b"2" * 64)
+
+    def organize_twice(self, original: str):
+        config_path = os.path.join(self.root, "config.json")
+        with open(config_path, "w", encoding="utf-8") as f:
+            json.dump({"source_folder": self.source, "history": {"enabled": False},
+                       "archives": {"enabled": True, "original": original},
+                       "mappings": [{"pattern": "artA", "destination": self.destination}]}, f)
+        for _ in range(2):
+            FileOrganizer(Config(config_path), lambda message: None).organize()
+
+    def test_unmatched_archive_in_move_mode(self):
+        self.organize_twice("move")
+        self.assertEqual(sorted(os.listdir(self.destination)), ["artA_1.png", "artA_2.png"])
+        self.assertTrue(os.path.exists(self.archive))
+
+    def test_keep_mode(self):
+        self.organize_twice("keep")
+        self.assertEqual(sorted(os.listdir(self.destination)), ["artA_1.png", "artA_2.png"])
+
+
+if __name__ == "__main__":
+    unittest.main()
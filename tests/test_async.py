@@ -0,0 +1,154 @@
+"""非同期版の振り分けのテスト"""
+
+import os
+import sys
+import json
+import errno
+import asyncio
+import zipfile
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from organizer import Config, FileOrganizer
+
+
+class AsyncTestCase(unittest.TestCase):
+    """ソースフォルダに cat_a.png を1つ置いて非同期版で振り分ける"""
+
+    def setUp(self):
+        work_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(work_dir.cleanup)
+        self.root = work_dir.name
+        self.source = os.path.join(self.root, "source")
+        self.destination = os.path.join(self.root, "dest")
+        os.makedirs(self.source)
+        with open(os.path.join(self.source, "cat_a.png"), "wb") as f:
+            f.write(b"0" * 64)
+        self.organizer = self.make_organizer()
+
+    def make_organizer(self, **settings) -> FileOrganizer:
+        config_path = os.path.join(self.root, "config.json")
+        mappings = [dict({"pattern": "cat", "destination": self.destination}, **settings.pop("rule", {}))]
+        with open(config_path, "w", encoding="utf-8") as f:
+            json.dump(dict({"source_folder": self.source, "history": {"enabled": False},
+                            "mappings": mappings}, **settings), f)
+        return FileOrganizer(Config(config_path), lambda message: None)
+
+    def organize(self):
+        async def run():
+            return [event async for event in self.organizer.organize_async()]
+
+        return asyncio.run(run())
+
+
+class AsyncRunTest(AsyncTestCase):
+    """実行記録の開始・終了がイベントループのスレッドで行われないことを確認"""
+
+    def test_run_lifecycle_off_event_loop(self):
+        threads = {}
+        for name in ("_begin_run", "_end_run"):
+            original = getattr(self.organizer, name)
+
+            def record(*args, name=name, original=original):
+                threads[name] = threading.current_thread()
+                return original(*args)
+
+            setattr(self.organizer, name, record)
+
+        loop_threads = []
+        original_move = self.organizer._move_async
+
+        async def move_async(*args):
+            loop_threads.append(threading.current_thread())
+            return await original_move(*args)
+
+        self.organizer._move_async = move_async
+        events = self.organize()
+        loop_thread = loop_threads[0]
+        self.assertEqual(events[-1]["stats"]["moved_files"], 1)
+        self.assertIsNot(threads["_begin_run"], loop_thread)
+        # I/O 優先度を戻せるよう、開始と終了は同じスレッドで行う
+        self.assertIs(threads["_begin_run"], threads["_end_run"])
+        self.assertEqual(os.listdir(self.destination), ["cat_a.png"])
+
+
+class AsyncFeaturesTest(AsyncTestCase):
+    """同期版と同じく、再試行・再圧縮・アーカイブの設定が使われることを確認"""
+
+    def test_transient_error_is_retried(self):
+        self.organizer = self.make_organizer(retry={"base_delay": 0.01})
+        real_move = self.organizer.move_func
+        failures = []
+
+        def move(source, destination):
+            if not failures:
+                failures.append(source)
+                raise OSError(errno.EBUSY, "使用中", source)
+            return real_move(source, destination)
+
+        self.organizer.move_func = move
+        events = self.organize()
+        self.assertEqual([event["event"] for event in events if event["event"] in ("retry", "moved")],
+                         ["retry", "moved"])
+        self.assertEqual(events[-1]["stats"]["moved_files"], 1)
+        self.assertEqual(events[-1]["stats"]["errors"], 0)
+        self.assertEqual(os.listdir(self.destination), ["cat_a.png"])
+
+    def test_carried_retries_are_kept(self):
+        # 前回の実行から持ち越した再試行は、非同期版でも処理してから retry.jsonl を書き直す
+        # （ルールを変えた後でも、持ち越した時点の振り分け先へ移動する）
+        carried = os.path.join(self.source, "dog_b.png")
+        with open(carried, "wb") as f:
+            f.write(b"1" * 64)
+        with open(os.path.join(self.root, "retry.jsonl"), "w", encoding="utf-8") as f:
+            f.write(json.dumps({"source": carried, "filename": "dog_b.png",
+                                "destination": self.destination, "rule": "dog", "attempts": 4}) + "\n")
+        events = self.organize()
+        self.assertEqual(events[-1]["stats"]["moved_files"], 2)
+        self.assertEqual(sorted(os.listdir(self.destination)), ["cat_a.png", "dog_b.png"])
+        self.assertFalse(os.path.exists(os.path.join(self.root, "retry.jsonl")))
+
+    def test_transcode_rules_are_used(self):
+        self.organizer = self.make_organizer(rule={"transcode": {"format": "webp"}})
+        with mock.patch("transcode.is_available", return_value=True), \
+                mock.patch.object(FileOrganizer, "_submit_transcode") as submit:
+            self.organize()
+        self.assertEqual(submit.call_count, 1)
+        self.assertEqual(submit.call_args[0][0], "cat_a.png")
+
+    def test_archives_are_extracted(self):
+        with zipfile.ZipFile(os.path.join(self.source, "pack.zip"), "w") as archive:
+            archive.writestr("cat_b.png", b"1" * 64)
+        self.organizer = self.make_organizer(archives={"enabled": True, "original": "keep"})
+        events = self.organize()
+        self.assertIn({"event": "extracted", "filename": "pack.zip"}, events)
+        self.assertEqual(sorted(os.listdir(self.destination)), ["cat_a.png", "cat_b.png"])
+
+
+@unittest.skipUnless(sys.platform.startswith("linux"), "優先度がスレッドごとに設定されるのは Linux のみ")
+class AsyncPriorityTest(AsyncTestCase):
+    """low_priority の設定が、実際にファイルを操作するスレッドに適用されることを確認"""
+
+    def test_moves_run_on_low_priority_threads(self):
+        self.organizer = self.make_organizer(io_limits={"low_priority": True})
+        real_move = self.organizer.move_func
+        seen = []
+
+        def move(source, destination):
+            seen.append((threading.current_thread().name, os.getpriority(os.PRIO_PROCESS, 0)))
+            return real_move(source, destination)
+
+        self.organizer.move_func = move
+        normal = os.getpriority(os.PRIO_PROCESS, 0)
+        self.organize()
+        self.assertEqual(len(seen), 1)
+        self.assertTrue(seen[0][0].startswith("picsort-io-low"))
+        self.assertGreater(seen[0][1], normal)
+        # イベントループのスレッドの優先度は変わらない
+        self.assertEqual(os.getpriority(os.PRIO_PROCESS, 0), normal)
+
+
+if __name__ == "__main__":
+    unittest.main()
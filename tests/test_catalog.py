@@ -0,0 +1,58 @@
+"""カタログのハッシュ記録のテスト"""
+
+import os
+import json
+import asyncio
+import hashlib
+import sqlite3
+import tempfile
+import unittest
+
+from organizer import Config, FileOrganizer
+
+
+class CatalogDigestTest(unittest.TestCase):
+    """非同期版の振り分けで記録したハッシュが正しいことを確認"""
+
+    def setUp(self):
+        self.work_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.work_dir.cleanup)
+        root = self.work_dir.name
+        self.source = os.path.join(root, "source")
+        os.makedirs(self.source)
+        # 読み込みバッファ（1MB）を何回も使い回すサイズにする
+        for i in range(40):
+            with open(os.path.join(self.source, f"cat_{i}.png"), "wb") as f:
+                f.write(os.urandom(3 * 1024 * 1024 + i))
+        self.config_path = os.path.join(root, "config.json")
+        with open(self.config_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "source_folder": self.source,
+                "mappings": [{"pattern": "cat", "destination": os.path.join(root, "dest")}],
+                "catalog": {"enabled": True, "hash": True},
+                "history": {"enabled": False}
+            }, f)
+
+    def test_async_digests_match_hashlib(self):
+        organizer = FileOrganizer(Config(self.config_path), lambda message: None)
+
+        async def run():
+            async for _ in organizer.organize_async(concurrency=8):
+                pass
+
+        asyncio.run(run())
+        organizer.close()
+
+        conn = sqlite3.connect(os.path.join(self.work_dir.name, "catalog.db"))
+        try:
+            rows = conn.execute("SELECT path, hash FROM files").fetchall()
+        finally:
+            conn.close()
+        self.assertEqual(len(rows), 40)
+        for path, digest in rows:
+            with open(path, "rb") as f:
+                self.assertEqual(digest, hashlib.blake2b(f.read()).hexdigest(), path)
+
+
+if __name__ == "__main__":
+    unittest.main()
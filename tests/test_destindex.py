@@ -0,0 +1,77 @@
+"""振り分け先フォルダの索引のテスト"""
+
+import os
+import tempfile
+import unittest
+
+from destindex import DestinationIndex
+
+
+class DestinationIndexTest(unittest.TestCase):
+    """実行中に他のプロセスが追加したファイルを、次回の実行で見落とさないことを確認"""
+
+    def setUp(self):
+        work_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(work_dir.cleanup)
+        self.root = work_dir.name
+        self.folder = os.path.join(self.root, "dest")
+        os.makedirs(self.folder)
+        self.path = os.path.join(self.root, "index.db")
+        self.write("old.png")
+        with DestinationIndex(self.path) as index:
+            index.refresh([self.folder])
+
+    def write(self, name: str):
+        with open(os.path.join(self.folder, name), "wb") as f:
+            f.write(b"0" * 64)
+        # 同じ時刻刻みの中での変更でも区別できるよう、フォルダの更新日時を進める
+        st = os.stat(self.folder)
+        os.utime(self.folder, ns=(st.st_atime_ns, st.st_mtime_ns + 1000000))
+
+    def move(self, index: DestinationIndex, name: str):
+        """索引で名前を予約してからファイルを置く（移動の代わり）"""
+        name = index.reserve(self.folder, name)
+        self.write(name)
+        st = os.stat(os.path.join(self.folder, name))
+        index.update(os.path.join(self.folder, name), st.st_size, st.st_mtime_ns)
+
+    def test_own_moves_keep_index(self):
+        with DestinationIndex(self.path) as index:
+            self.move(index, "a.png")
+            self.move(index, "b.png")
+        with DestinationIndex(self.path) as index:
+            self.assertEqual(index.refresh([self.folder]), 0)
+            self.assertIsNotNone(index.lookup(self.folder, "b.png"))
+
+    def test_foreign_file_during_run(self):
+        with DestinationIndex(self.path) as index:
+            self.move(index, "a.png")
+            self.write("foreign.png")
+            self.move(index, "b.png")
+        with DestinationIndex(self.path) as index:
+            self.assertEqual(index.refresh([self.folder]), 1)
+            self.assertIsNotNone(index.lookup(self.folder, "foreign.png"))
+
+    def test_foreign_file_after_last_move(self):
+        with DestinationIndex(self.path) as index:
+            self.move(index, "a.png")
+            self.write("foreign.png")
+        with DestinationIndex(self.path) as index:
+            self.assertIsNotNone(index.lookup(self.folder, "foreign.png"))
+
+    def test_expected_changes_are_not_foreign(self):
+        with DestinationIndex(self.path) as index:
+            self.move(index, "a.png")
+            # 再圧縮のように、予告してから索引の外で変更する
+            index.expect(os.path.join(self.folder, "a.png"))
+            self.move(index, "b.png")
+            self.write("a.webp")
+            index.settle(os.path.join(self.folder, "a.png"))
+            st = os.stat(os.path.join(self.folder, "a.webp"))
+            index.update(os.path.join(self.folder, "a.webp"), st.st_size, st.st_mtime_ns)
+        with DestinationIndex(self.path) as index:
+            self.assertEqual(index.refresh([self.folder]), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+"""ハッシュ計算サービスのテスト"""
+
+import os
+import hashlib
+import tempfile
+import threading
+import unittest
+
+import hashing
+
+
+class BufferTest(unittest.TestCase):
+    """読み込みバッファがスレッド間で共有されないことを確認"""
+
+    def test_buffer_is_per_thread(self):
+        buffers = []
+        thread = threading.Thread(target=lambda: buffers.append(hashing._get_buffer()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(buffers[0].obj, hashing._get_buffer().obj)
+
+    def test_concurrent_full_digest(self):
+        with tempfile.TemporaryDirectory() as work_dir:
+            paths = []
+            for i in range(8):
+                path = os.path.join(work_dir, f"{i}.bin")
+                with open(path, "wb") as f:
+                    f.write(os.urandom(3 * 1024 * 1024 + i))
+                paths.append(path)
+            results = {}
+            threads = [threading.Thread(target=lambda p=path: results.__setitem__(p, hashing.full_digest(p)))
+                       for path in paths]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            for path in paths:
+                with open(path, "rb") as f:
+                    self.assertEqual(results[path], hashlib.blake2b(f.read()).hexdigest())
+
+
+class CacheTest(unittest.TestCase):
+    """ハッシュのキャッシュが最大件数を超えて増えないことを確認"""
+
+    def test_cache_evicts_least_recently_used(self):
+        with tempfile.TemporaryDirectory() as work_dir:
+            paths = []
+            for i in range(5):
+                path = os.path.join(work_dir, f"{i}.bin")
+                with open(path, "wb") as f:
+                    f.write(os.urandom(1024 + i))
+                paths.append(path)
+            cache_path = os.path.join(work_dir, "cache.json")
+            with hashing.FileHasher(cache_path=cache_path, max_cache=3) as hasher:
+                digests = dict(hasher.hash_many(paths[:3]))
+                # 0 を使い直すと、次に追加したときに捨てられるのは 1
+                self.assertEqual(hasher.full(paths[0]), digests[paths[0]])
+                dict(hasher.hash_many(paths[3:]))
+                self.assertEqual(len(hasher._cache), 3)
+                self.assertIsNotNone(hasher._lookup(os.stat(paths[0]), "full"))
+                self.assertIsNone(hasher._lookup(os.stat(paths[1]), "full"))
+            with hashing.FileHasher(cache_path=cache_path, max_cache=2) as hasher:
+                self.assertEqual(len(hasher._cache), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
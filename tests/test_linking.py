@@ -0,0 +1,43 @@
+"""リンク方式の振り分けのテスト"""
+
+import os
+import json
+import tempfile
+import unittest
+
+from organizer import LINK_INDEX_FILE, Config, FileOrganizer
+
+
+class LinkIndexTest(unittest.TestCase):
+    """作成済みリンクの一覧から、削除・変更された元ファイルの記録が消えることを確認"""
+
+    def setUp(self):
+        work_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(work_dir.cleanup)
+        self.root = work_dir.name
+        self.source = os.path.join(self.root, "source")
+        os.makedirs(self.source)
+        for name in ("cat_a.png", "cat_b.png", "cat_c.png"):
+            with open(os.path.join(self.source, name), "wb") as f:
+                f.write(b"0" * 64)
+        self.config_path = os.path.join(self.root, "config.json")
+        with open(self.config_path, "w", encoding="utf-8") as f:
+            json.dump({"source_folder": self.source, "history": {"enabled": False}, "sort_mode": "hardlink",
+                       "mappings": [{"pattern": "cat", "destination": os.path.join(self.root, "dest")}]}, f)
+
+    def organize(self):
+        FileOrganizer(Config(self.config_path), lambda message: None).organize()
+        with open(os.path.join(self.root, LINK_INDEX_FILE), encoding="utf-8") as f:
+            return sorted(os.path.basename(key.split("|")[0]) for key in json.load(f))
+
+    def test_stale_sources_are_pruned(self):
+        self.assertEqual(self.organize(), ["cat_a.png", "cat_b.png", "cat_c.png"])
+        os.remove(os.path.join(self.source, "cat_a.png"))
+        with open(os.path.join(self.source, "cat_b.png"), "ab") as f:
+            f.write(b"1")
+        # 変更された cat_b.png は新しいキーで記録し直され、古いキーは残らない
+        self.assertEqual(self.organize(), ["cat_b.png", "cat_c.png"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+"""ルールのプレビューのテスト"""
+
+import os
+import tempfile
+import unittest
+
+from preview import RulePreview, SourceSnapshot
+
+
+class RulePreviewTest(unittest.TestCase):
+    """先に並ぶルールと入力中のルールの追加条件が、実行時と同じく判定されることを確認"""
+
+    def setUp(self):
+        work_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(work_dir.cleanup)
+        for name, size in (("cat_a.png", 10), ("cat_b.jpg", 10), ("cat_c.png", 4096)):
+            with open(os.path.join(work_dir.name, name), "wb") as f:
+                f.write(b"0" * size)
+        self.snapshot = SourceSnapshot(work_dir.name)
+
+    def test_earlier_rule_conditions(self):
+        earlier = [{"pattern": "cat", "destination": "/png", "conditions": {"extensions": ["png"], "max_size_kb": 1}}]
+        count, taken, rows = RulePreview(self.snapshot, earlier).preview("cat")
+        self.assertEqual(count, 3)
+        self.assertEqual(taken, 1)
+        self.assertEqual(rows, [("cat_a.png", "cat"), ("cat_b.jpg", None), ("cat_c.png", None)])
+
+    def test_conditions_being_edited(self):
+        preview = RulePreview(self.snapshot, [], normalize=True)
+        count, _, rows = preview.preview("CAT", conditions={"extensions": ["png"], "min_size_kb": 2})
+        self.assertEqual(count, 1)
+        self.assertEqual(rows, [("cat_c.png", None)])
+
+
+if __name__ == "__main__":
+    unittest.main()
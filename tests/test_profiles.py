@@ -0,0 +1,36 @@
+"""複数プロファイルのテスト"""
+
+import os
+import json
+import tempfile
+import unittest
+
+from organizer import Config, FileOrganizer
+
+
+class ProfileNameTest(unittest.TestCase):
+
+    def test_same_basename_profiles_keep_separate_stats(self):
+        with tempfile.TemporaryDirectory() as root:
+            source = os.path.join(root, "source")
+            os.makedirs(source)
+            for name in ("cat1.png", "dog1.png", "dog2.png"):
+                open(os.path.join(source, name), "wb").close()
+            paths = []
+            for folder, pattern in (("a", "cat"), ("b", "dog")):
+                os.makedirs(os.path.join(root, folder))
+                path = os.path.join(root, folder, "config.json")
+                with open(path, "w", encoding="utf-8") as f:
+                    json.dump({"source_folder": source, "history": {"enabled": False},
+                               "mappings": [{"pattern": pattern, "destination": os.path.join(root, pattern)}]}, f)
+                paths.append(path)
+
+            profiles = Config.load_profiles(paths)
+            self.assertEqual([profile["name"] for profile in profiles], ["config", "config (2)"])
+            results = FileOrganizer(Config(paths[0]), lambda message: None).organize_profiles(profiles)
+            self.assertEqual(results["config"]["moved_files"], 1)
+            self.assertEqual(results["config (2)"]["moved_files"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+"""使用中のファイルの再試行のテスト"""
+
+import os
+import json
+import errno
+import functools
+import tempfile
+import unittest
+from unittest import mock
+
+import retry
+from organizer import Config, FileOrganizer
+
+
+class FakeClock:
+    """time.sleep の代わりに進める時計"""
+
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class RetryBackoffTest(unittest.TestCase):
+    """移動関数にエラーを注入し、待ち時間が倍々に延びることを確認"""
+
+    def setUp(self):
+        work_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(work_dir.cleanup)
+        self.root = work_dir.name
+        self.source = os.path.join(self.root, "source")
+        self.destination = os.path.join(self.root, "dest")
+        os.makedirs(self.source)
+        with open(os.path.join(self.source, "cat_a.png"), "wb") as f:
+            f.write(b"0" * 64)
+        self.config_path = os.path.join(self.root, "config.json")
+        with open(self.config_path, "w", encoding="utf-8") as f:
+            json.dump({"source_folder": self.source, "history": {"enabled": False},
+                       "mappings": [{"pattern": "cat", "destination": self.destination}]}, f)
+        self.messages = []
+        self.organizer = FileOrganizer(Config(self.config_path), self.messages.append)
+        self.clock = FakeClock()
+        self.failures = 0
+
+    def busy_move(self, failures: int):
+        real_move = self.organizer.move_func
+
+        def move(source, destination):
+            if self.failures < failures:
+                self.failures += 1
+                raise OSError(errno.EBUSY, "使用中", source)
+            return real_move(source, destination)
+
+        self.organizer.move_func = move
+
+    def organize(self):
+        queue = functools.partial(retry.RetryQueue, clock=self.clock)
+        with mock.patch("retry.RetryQueue", queue), mock.patch("organizer.time.sleep", self.clock.sleep):
+            return self.organizer.organize()
+
+    def logged_delays(self):
+        return [float(message.split("、")[1].split(" 秒後")[0])
+                for message in self.messages if "秒後に再試行" in message]
+
+    def test_backoff_until_success(self):
+        self.busy_move(3)
+        self.organize()
+        self.assertEqual(self.clock.sleeps, [0.5, 1.0, 2.0])
+        # ログの待ち時間は実際に予約した待ち時間と一致する
+        self.assertEqual(self.logged_delays(), [0.5, 1.0, 2.0])
+        self.assertEqual(os.listdir(self.destination), ["cat_a.png"])
+
+    def test_gives_up_after_max_attempts(self):
+        self.busy_move(100)
+        stats = self.organize()
+        # 持ち越した分は未処理の残りとして実行履歴に記録される
+        self.assertEqual(stats["remaining_files"], 1)
+        # 既定の max_attempts=4 回まで再試行し、残りは次回の実行に持ち越す
+        self.assertEqual(self.failures, 5)
+        self.assertEqual(self.logged_delays(), [0.5, 1.0, 2.0, 4.0])
+        with open(os.path.join(self.root, retry.RETRY_FILE), encoding="utf-8") as f:
+            carried = [json.loads(line) for line in f]
+        self.assertEqual([item["filename"] for item in carried], ["cat_a.png"])
+        self.assertEqual(carried[0]["attempts"], 5)
+
+    def test_permanent_error_is_remaining(self):
+        def move(source, destination):
+            raise OSError(errno.ENOSPC, "空き容量不足", destination)
+
+        self.organizer.move_func = move
+        stats = self.organize()
+        self.assertEqual(stats["errors"], 1)
+        self.assertEqual(stats["remaining_files"], 1)
+        self.assertFalse(os.path.exists(os.path.join(self.root, retry.RETRY_FILE)))
+
+
+if __name__ == "__main__":
+    unittest.main()
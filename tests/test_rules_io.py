@@ -0,0 +1,90 @@
+"""振り分けルールの CSV/TSV インポート・エクスポートのテスト"""
+
+import os
+import json
+import tempfile
+import unittest
+
+from organizer import Config
+from rules_io import export_rules, import_rules
+
+
+class RulesRoundTripTest(unittest.TestCase):
+    """書き出したルールを置き換えで読み込んでも、追加の設定が失われないことを確認"""
+
+    def setUp(self):
+        work_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(work_dir.cleanup)
+        self.root = work_dir.name
+        self.photos = os.path.join(self.root, "photos")
+        self.shots = os.path.join(self.root, "shots")
+        self.mappings = [
+            {"pattern": "IMG_", "destination": self.photos,
+             "conditions": {"extensions": ["jpg"], "min_size_kb": 100},
+             "transcode": {"format": "webp", "quality": 80}},
+            {"pattern": "スクリーンショット", "destination": self.shots},
+        ]
+        self.config_path = os.path.join(self.root, "config.json")
+        with open(self.config_path, "w", encoding="utf-8") as f:
+            json.dump({"mappings": self.mappings}, f)
+        self.config = Config(self.config_path)
+
+    def write_rules(self, name: str, text: str) -> str:
+        path = os.path.join(self.root, name)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        return path
+
+    def test_export_then_replace_keeps_extras(self):
+        for name in ("rules.csv", "rules.tsv"):
+            path = os.path.join(self.root, name)
+            self.assertEqual(export_rules(self.config, path), 2)
+            report = import_rules(self.config, path, "replace")
+            self.assertEqual(report["invalid"], [])
+            self.assertEqual(Config(self.config_path).get_mappings(), self.mappings)
+
+    def test_replace_with_two_columns_keeps_existing_extras(self):
+        path = self.write_rules("rules.csv", f"IMG_,{self.photos}\nDSC_,{self.photos}\n")
+        import_rules(self.config, path, "replace")
+        mappings = Config(self.config_path).get_mappings()
+        self.assertEqual(mappings[0], self.mappings[0])
+        self.assertEqual(mappings[1], {"pattern": "DSC_", "destination": self.photos})
+
+    def test_upsert_updates_and_clears_extras(self):
+        path = self.write_rules(
+            "rules.csv",
+            "pattern,destination,conditions,transcode\n"
+            f"IMG_,{self.photos},,\n"
+            f"スクリーンショット,{self.shots},\"{{\"\"extensions\"\": [\"\"png\"\"]}}\"\n",
+        )
+        report = import_rules(self.config, path, "upsert")
+        self.assertEqual(report["updated"], 2)
+        mappings = Config(self.config_path).get_mappings()
+        self.assertEqual(mappings[0], {"pattern": "IMG_", "destination": self.photos})
+        self.assertEqual(mappings[1]["conditions"], {"extensions": ["png"]})
+        self.assertNotIn("transcode", mappings[1])
+
+    def test_invalid_json_is_reported(self):
+        path = self.write_rules("rules.csv", f"pattern,destination,conditions\nDSC_,{self.photos},{{oops\n")
+        report = import_rules(self.config, path, "merge")
+        self.assertEqual(report["added"], 0)
+        self.assertEqual([line for line, _ in report["invalid"]], [2])
+
+    def test_bad_template_is_reported(self):
+        path = self.write_rules("rules.csv", f"DSC_,{self.photos}/{{unknown}}\nRAW_,{self.photos}/{{rule}}\n")
+        report = import_rules(self.config, path, "merge")
+        self.assertEqual([line for line, _ in report["invalid"]], [1])
+        self.assertEqual(report["added"], 1)
+
+    def test_condition_types_are_checked(self):
+        rows = ['"{""min_size_kb"": ""5""}"', '"{""extensions"": ""png""}"', '"{""max_age_minutes"": -1}"',
+                '"{""min_sise_kb"": 5}"', '"{""min_size_kb"": 5, ""extensions"": [""png""]}"']
+        path = self.write_rules("rules.csv", "pattern,destination,conditions\n" + "".join(
+            f"P{i}_,{self.photos},{row}\n" for i, row in enumerate(rows)))
+        report = import_rules(self.config, path, "merge")
+        self.assertEqual([line for line, _ in report["invalid"]], [2, 3, 4, 5])
+        self.assertEqual(report["added"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
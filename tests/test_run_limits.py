@@ -0,0 +1,70 @@
+"""実行上限と残り（backlog）の保存のテスト"""
+
+import os
+import json
+import tempfile
+import unittest
+from unittest import mock
+
+from organizer import BACKLOG_FILE, Config, FileOrganizer
+
+
+class RunLimitsTest(unittest.TestCase):
+    """上限で中断したときの残りの件数と、次回の再開を確認"""
+
+    def setUp(self):
+        work_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(work_dir.cleanup)
+        self.root = work_dir.name
+        self.source = os.path.join(self.root, "source")
+        self.destination = os.path.join(self.root, "dest")
+        os.makedirs(self.source)
+        for i in range(5):
+            with open(os.path.join(self.source, f"cat_{i}.png"), "wb") as f:
+                f.write(os.urandom(256))
+        with open(os.path.join(self.source, "memo.txt"), "wb") as f:
+            f.write(b"memo")
+        self.messages = []
+
+    def make_organizer(self, **settings) -> FileOrganizer:
+        config_path = os.path.join(self.root, "config.json")
+        with open(config_path, "w", encoding="utf-8") as f:
+            json.dump(dict({"source_folder": self.source, "history": {"enabled": False},
+                            "run_limits": {"max_files": 2},
+                            "mappings": [{"pattern": "cat", "destination": self.destination}]}, **settings), f)
+        return FileOrganizer(Config(config_path), self.messages.append)
+
+    def backlog(self):
+        with open(os.path.join(self.root, BACKLOG_FILE), encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def test_remaining_is_saved_and_resumed(self):
+        stats = self.make_organizer().organize()
+        self.assertEqual(stats["moved_files"], 2)
+        self.assertEqual(stats["remaining_files"], 3)
+        self.assertEqual(len(self.backlog()) - 1, 3)
+
+        stats = self.make_organizer().organize()
+        self.assertTrue(any("前回の残り 3 件から再開します" in message for message in self.messages))
+        self.assertEqual(stats["moved_files"], 2)
+        self.assertEqual(stats["remaining_files"], 1)
+
+    def test_bounded_memory_counts_remaining(self):
+        # 1回目で1件移動するため、2回目の残りは1件少ない
+        for order, remaining in (("none", 4), ("oldest", 3)):
+            with self.subTest(order=order):
+                stats = self.make_organizer(bounded_memory=True,
+                                            run_limits={"max_files": 1, "order": order}).organize()
+                self.assertEqual(stats["moved_files"], 1)
+                self.assertEqual(stats["remaining_files"], remaining)
+                self.assertFalse(os.path.exists(os.path.join(self.root, BACKLOG_FILE)))
+
+    def test_backlog_is_saved_after_verification(self):
+        # 検証付きの移動では元ファイルの削除が後から行われるため、その後の更新日時を保存する
+        with mock.patch.object(FileOrganizer, "_destination_device", return_value=-1):
+            self.make_organizer(verify_moves=True).organize()
+        self.assertEqual(self.backlog()[0]["dir_mtime_ns"], os.stat(self.source).st_mtime_ns)
+
+
+if __name__ == "__main__":
+    unittest.main()
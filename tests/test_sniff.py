@@ -0,0 +1,64 @@
+"""ファイルの種類による絞り込みのテスト"""
+
+import os
+import json
+import asyncio
+import tempfile
+import unittest
+
+from organizer import Config, FileOrganizer
+
+FILES = {
+    "cat_real.png": b"\x89PNG\r\n\x1a\n" + b"0" * 32,
+    "cat_fake.png": b"not an image",
+    "cat_jpeg.png": b"\xff\xd8\xff\xe0" + b"0" * 32,
+}
+
+
+class TypeFilterTest(unittest.TestCase):
+    """どの振り分け方法でも、画像でないファイルは移動しないことを確認"""
+
+    def setUp(self):
+        work_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(work_dir.cleanup)
+        self.root = work_dir.name
+        self.source = os.path.join(self.root, "source")
+        self.destination = os.path.join(self.root, "dest")
+        os.makedirs(self.source)
+        for name, data in FILES.items():
+            with open(os.path.join(self.source, name), "wb") as f:
+                f.write(data)
+        self.mappings = [{"pattern": "cat", "destination": self.destination}]
+        config_path = os.path.join(self.root, "config.json")
+        with open(config_path, "w", encoding="utf-8") as f:
+            json.dump({"source_folder": self.source, "mappings": self.mappings, "history": {"enabled": False},
+                       "type_filter": {"enabled": True, "fix_extension": True}}, f)
+        self.organizer = FileOrganizer(Config(config_path), lambda message: None)
+
+    def assert_filtered(self):
+        self.assertEqual(sorted(os.listdir(self.destination)), ["cat_jpeg.jpg", "cat_real.png"])
+        self.assertEqual(os.listdir(self.source), ["cat_fake.png"])
+
+    def test_organize(self):
+        self.organizer.organize()
+        self.assert_filtered()
+
+    def test_organize_profiles(self):
+        self.organizer.organize_profiles([{"name": "p", "source_folder": self.source, "mappings": self.mappings}])
+        self.assert_filtered()
+
+    def test_plan(self):
+        # 予定と実行で対象のファイルが一致する
+        self.assertEqual(sorted(name for name, _ in self.organizer.plan()), ["cat_jpeg.png", "cat_real.png"])
+
+    def test_organize_async(self):
+        async def run():
+            async for _ in self.organizer.organize_async():
+                pass
+
+        asyncio.run(run())
+        self.assert_filtered()
+
+
+if __name__ == "__main__":
+    unittest.main()
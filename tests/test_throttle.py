@@ -0,0 +1,62 @@
+"""自動スロットリングのテスト"""
+
+import unittest
+from unittest import mock
+
+from throttle import IOThrottle, MIN_SCALE
+
+MB = 1024 * 1024
+
+
+class AdaptiveThrottleTest(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch("throttle.time.sleep")
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.throttle = IOThrottle(adaptive=True)
+
+    def test_renames_do_not_make_copies_look_congested(self):
+        # 混雑のない状態で、速い名前の変更と別ドライブへのコピーが混ざる
+        for i in range(200):
+            if i % 2:
+                self.throttle.after(0, 0.00002)
+            else:
+                self.throttle.after(8 * MB, 0.08)
+        self.assertEqual(self.throttle.scale, 1.0)
+        self.sleep.assert_not_called()
+
+    def test_copies_are_normalized_by_size(self):
+        # 1MB あたりの速度が同じなら、ファイルサイズが変わっても混雑とみなさない
+        for size in (1, 50, 2, 200, 5) * 20:
+            self.throttle.after(size * MB, size * 0.01)
+        self.assertEqual(self.throttle.scale, 1.0)
+
+    def test_slowdown_and_recovery(self):
+        for _ in range(20):
+            self.throttle.after(4 * MB, 0.04)
+        for _ in range(20):
+            self.throttle.after(4 * MB, 0.4)
+        self.assertLess(self.throttle.scale, 1.0)
+        for _ in range(200):
+            self.throttle.after(4 * MB, 0.04)
+        self.assertEqual(self.throttle.scale, 1.0)
+
+    def test_single_fast_outlier_does_not_pin_baseline(self):
+        self.throttle.after(4 * MB, 0.0001)
+        for _ in range(500):
+            self.throttle.after(4 * MB, 0.04)
+        self.assertEqual(self.throttle.scale, 1.0)
+
+    def test_disk_probe_is_preferred(self):
+        latencies = iter([0.002] * 5 + [0.05] * 10)
+        throttle = IOThrottle(adaptive=True, latency_probe=lambda device: next(latencies, 0.05))
+        with mock.patch("throttle.PROBE_INTERVAL", 0):
+            for _ in range(15):
+                # 移動自体の所要時間は一定でも、ディスク全体の遅延が増えたら速度を落とす
+                throttle.after(4 * MB, 0.04, device=1)
+        self.assertEqual(throttle.scale, MIN_SCALE)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,28 @@
+"""振り分け時の画像の再圧縮のテスト"""
+
+import unittest
+
+from transcode import needs_transcode, transcode_file
+
+
+class NeedsTranscodeTest(unittest.TestCase):
+    """既に変換先の形式の画像を非可逆で圧縮し直さないことを確認"""
+
+    def test_lossy_targets_skip_same_format(self):
+        self.assertFalse(needs_transcode("/dest/a.webp", "webp"))
+        self.assertFalse(needs_transcode("/dest/a.WEBP", "webp"))
+        self.assertFalse(needs_transcode("/dest/a.avif", "avif"))
+        self.assertTrue(needs_transcode("/dest/a.png", "webp"))
+        self.assertTrue(needs_transcode("/dest/a.webp", "avif"))
+
+    def test_png_optimizes_only_png(self):
+        self.assertTrue(needs_transcode("/dest/a.png", "png"))
+        self.assertFalse(needs_transcode("/dest/a.jpg", "png"))
+
+    def test_transcode_file_returns_none_for_same_format(self):
+        # 画像を開く前に判定するため、ファイルがなくても（Pillow がなくても）None を返す
+        self.assertIsNone(transcode_file("/dest/missing.webp", "webp"))
+
+
+if __name__ == "__main__":
+    unittest.main()
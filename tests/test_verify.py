@@ -0,0 +1,95 @@
+"""検証付きの移動のテスト"""
+
+import os
+import json
+import errno
+import tempfile
+import unittest
+from unittest import mock
+
+import verify
+from organizer import Config, FileOrganizer
+
+
+class VerifiedMoverTest(unittest.TestCase):
+
+    def setUp(self):
+        work_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(work_dir.cleanup)
+        self.source = os.path.join(work_dir.name, "a.png")
+        self.destination = os.path.join(work_dir.name, "b.png")
+        with open(self.source, "wb") as f:
+            f.write(os.urandom(4096))
+
+    def test_verified_move_removes_source(self):
+        failures = []
+        with verify.VerifiedMover() as mover:
+            mover.move(self.source, self.destination, lambda *args: failures.append(args))
+        self.assertEqual(failures, [])
+        self.assertFalse(os.path.exists(self.source))
+        self.assertTrue(os.path.exists(self.destination))
+
+    def test_locked_source_keeps_only_source(self):
+        real_remove = os.remove
+
+        def remove(path):
+            if path == self.source:
+                raise PermissionError(errno.EACCES, "使用中", path)
+            real_remove(path)
+
+        failures = []
+        with mock.patch("verify.os.remove", side_effect=remove):
+            with verify.VerifiedMover() as mover:
+                mover.move(self.source, self.destination, lambda *args: failures.append(args))
+        self.assertEqual(len(failures), 1)
+        self.assertIsInstance(failures[0][2], verify.SourceLockedError)
+        self.assertNotIsInstance(failures[0][2], verify.VerifyError)
+        # 次回の実行で _1 付きの重複ができないよう、コピーは取り消される
+        self.assertTrue(os.path.exists(self.source))
+        self.assertFalse(os.path.exists(self.destination))
+
+
+class VerifyFailureUndoTest(unittest.TestCase):
+    """検証に失敗した移動が、取り消しや条件ごとの件数に残らないことを確認"""
+
+    def setUp(self):
+        work_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(work_dir.cleanup)
+        self.root = work_dir.name
+        self.source = os.path.join(self.root, "source")
+        self.destination = os.path.join(self.root, "dest")
+        os.makedirs(self.source)
+        for name in ("cat_a.png", "cat_b.png"):
+            with open(os.path.join(self.source, name), "wb") as f:
+                f.write(os.urandom(4096))
+        config_path = os.path.join(self.root, "config.json")
+        with open(config_path, "w", encoding="utf-8") as f:
+            json.dump({"source_folder": self.source, "history": {"enabled": False}, "verify_moves": True,
+                       "mappings": [{"pattern": "cat", "destination": self.destination}]}, f)
+        self.organizer = FileOrganizer(Config(config_path), lambda message: None)
+
+    def test_failed_verification_is_not_undone(self):
+        locked = os.path.join(self.source, "cat_a.png")
+        real_remove = os.remove
+
+        def remove(path):
+            if path == locked:
+                raise PermissionError(errno.EACCES, "使用中", path)
+            real_remove(path)
+
+        # 別ドライブへの移動として扱い、検証付きの移動を使わせる
+        with mock.patch.object(FileOrganizer, "_destination_device", return_value=-1), \
+                mock.patch("verify.os.remove", side_effect=remove):
+            stats = self.organizer.organize()
+        self.assertEqual(stats["moved_files"], 1)
+        self.assertEqual(stats["errors"], 1)
+        self.assertEqual(stats["remaining_files"], 1)
+        self.assertEqual(self.organizer._rule_hits, {"cat": 1})
+
+        stats = self.organizer.undo_last_run()
+        self.assertEqual(stats, {"restored_files": 1, "errors": 0})
+        self.assertEqual(sorted(os.listdir(self.source)), ["cat_a.png", "cat_b.png"])
+
+
+if __name__ == "__main__":
+    unittest.main()
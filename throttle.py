@@ -0,0 +1,394 @@
+"""
+PicSort - I/O 帯域制限と優先度制御
+大量のファイルを移動するときにディスクを占有しないよう、
+バイト数・操作数のトークンバケットと、遅延に応じた自動スロットリングを提供します。
+"""
+
+import os
+import sys
+import time
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Any, Optional
+
+# 自動スロットリングのパラメータ
+EWMA_ALPHA = 0.2          # 遅延の移動平均の重み
+BASELINE_DRIFT = 0.01     # 基準遅延を現在の遅延に近づける割合（1サンプルごと。一時的に速かった値に固定されない）
+CONGESTED_RATIO = 3.0     # 基準遅延の何倍で混雑とみなすか
+RELAXED_RATIO = 1.5       # 基準遅延の何倍以下で回復とみなすか
+MIN_SCALE = 0.05          # 速度を落とす下限（本来の速度に対する割合）
+RECOVERY_STEP = 0.05      # 回復時に1サンプルごとに戻す割合
+MIN_COPY_BYTES = 64 * 1024  # コピーの遅延を 1MB あたりに換算するときの最小サイズ（小さなファイルの固定費を薄める）
+PROBE_INTERVAL = 0.25     # ディスク全体の遅延を確認する間隔（秒）
+PROBE_MIN_IOS = 4         # ディスク全体の遅延の計算に必要な、間隔内に完了した I/O の数
+
+# ディスク全体の遅延の取得関数: 移動先のデバイス番号 → 前回からの I/O 1回あたりの平均遅延（秒、不明なら None）
+LatencyProbe = Callable[[Optional[int]], Optional[float]]
+
+
+class TokenBucket:
+    """トークンバケット（rate が 0 以下なら制限なし）"""
+
+    def __init__(self, rate: float, burst: float = None):
+        """
+        初期化
+
+        Args:
+            rate: 1秒あたりに補充されるトークン数
+            burst: バケットの容量（省略時は1秒分）
+        """
+        self.rate = rate
+        self.capacity = burst if burst is not None else rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, amount: float):
+        """トークンを消費し、足りない場合は補充されるまで待つ"""
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # 容量より大きな要求も受け付けられるよう、不足分は借りとして待つ
+            self.tokens -= amount
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+
+
+class LatencyTracker:
+    """遅延の移動平均と、ゆっくり追従する基準遅延"""
+
+    def __init__(self):
+        self.latency: Optional[float] = None
+        self.baseline: Optional[float] = None
+
+    def add(self, cost: float) -> float:
+        """
+        遅延を1サンプル記録
+
+        基準は移動平均がそれより下がればすぐに下げ、上回っている間は BASELINE_DRIFT ずつ近づけます。
+        一度だけ極端に速かった操作に基準が固定され、以降ずっと混雑と判定されることはありません。
+
+        Returns:
+            基準に対する現在の遅延の比
+        """
+        if self.latency is None:
+            self.latency = self.baseline = cost
+        else:
+            self.latency += EWMA_ALPHA * (cost - self.latency)
+            if self.latency < self.baseline:
+                self.baseline = self.latency
+            else:
+                self.baseline += BASELINE_DRIFT * (self.latency - self.baseline)
+        return self.latency / self.baseline if self.baseline > 0 else 1.0
+
+
+class _LinuxDiskStats:
+    """/proc/diskstats から移動先デバイスの I/O 1回あたりの平均遅延を求める（他のアプリの I/O も含む）"""
+
+    def __init__(self):
+        # デバイス番号 → (完了した I/O 数, I/O にかかった時間の合計（ミリ秒）)
+        self._last: Dict[int, Any] = {}
+
+    @staticmethod
+    def _read(device: int):
+        major, minor = os.major(device), os.minor(device)
+        with open("/proc/diskstats", "r") as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 11 and int(fields[0]) == major and int(fields[1]) == minor:
+                    # 読み込み回数・時間、書き込み回数・時間
+                    return int(fields[3]) + int(fields[7]), int(fields[6]) + int(fields[10])
+        return None
+
+    def __call__(self, device: Optional[int]) -> Optional[float]:
+        if device is None:
+            return None
+        try:
+            current = self._read(device)
+        except (OSError, ValueError):
+            return None
+        if current is None:
+            return None
+        last = self._last.get(device)
+        if last is not None and current[0] - last[0] < PROBE_MIN_IOS:
+            # 完了した I/O が少ない間は前回の値を持ち越す
+            return None
+        self._last[device] = current
+        if last is None:
+            return None
+        return (current[1] - last[1]) / (current[0] - last[0]) / 1000
+
+
+class _WindowsDiskCounter:
+    """パフォーマンスカウンター（物理ディスク全体の Avg. Disk sec/Transfer）で平均遅延を求める"""
+
+    PDH_FMT_DOUBLE = 0x00000200
+
+    def __init__(self):
+        import ctypes
+        from ctypes import wintypes
+
+        class PDH_FMT_COUNTERVALUE(ctypes.Structure):
+            _fields_ = [("CStatus", wintypes.DWORD), ("doubleValue", ctypes.c_double)]
+
+        self._ctypes = ctypes
+        self._value_type = PDH_FMT_COUNTERVALUE
+        self._pdh = ctypes.WinDLL("pdh")
+        self._query = ctypes.c_void_p()
+        self._counter = ctypes.c_void_p()
+        if self._pdh.PdhOpenQueryW(None, None, ctypes.byref(self._query)) != 0:
+            raise OSError("PdhOpenQueryW に失敗しました")
+        if self._pdh.PdhAddEnglishCounterW(self._query, "\\PhysicalDisk(_Total)\\Avg. Disk sec/Transfer",
+                                           None, ctypes.byref(self._counter)) != 0:
+            self._pdh.PdhCloseQuery(self._query)
+            raise OSError("PdhAddEnglishCounterW に失敗しました")
+        # 平均値のカウンターは2回目の収集から値が出る
+        self._pdh.PdhCollectQueryData(self._query)
+
+    def __call__(self, device: Optional[int]) -> Optional[float]:
+        value = self._value_type()
+        if self._pdh.PdhCollectQueryData(self._query) != 0:
+            return None
+        if self._pdh.PdhGetFormattedCounterValue(self._counter, self.PDH_FMT_DOUBLE, None,
+                                                 self._ctypes.byref(value)) != 0:
+            return None
+        # I/O がなかった間隔は 0 になる
+        return value.doubleValue or None
+
+
+def disk_latency_probe() -> Optional[LatencyProbe]:
+    """ディスク全体の遅延の取得関数を作成（この OS で取得できない場合は None）"""
+    try:
+        if sys.platform == "win32":
+            return _WindowsDiskCounter()
+        if os.path.exists("/proc/diskstats"):
+            return _LinuxDiskStats()
+    except (OSError, AttributeError):
+        pass
+    return None
+
+
+class IOThrottle:
+    """移動処理の I/O 予算"""
+
+    def __init__(self, bytes_per_sec: float = 0, ops_per_sec: float = 0, adaptive: bool = False,
+                 latency_probe: Optional[LatencyProbe] = None):
+        """
+        初期化
+
+        Args:
+            bytes_per_sec: 1秒あたりのコピーバイト数の上限（0 なら制限なし）
+            ops_per_sec: 1秒あたりの移動操作数の上限（0 なら制限なし）
+            adaptive: ディスクの遅延が増えたら自動的に速度を落とす
+            latency_probe: ディスク全体の遅延の取得関数（None なら移動にかかった時間だけで判断する）
+        """
+        self.bytes = TokenBucket(bytes_per_sec)
+        self.ops = TokenBucket(ops_per_sec, burst=max(1.0, ops_per_sec))
+        self.adaptive = adaptive
+        self.latency_probe = latency_probe
+        # 現在の速度（本来の速度に対する割合）
+        self.scale = 1.0
+        # 名前の変更（同じドライブ）とコピー（別ドライブ）は所要時間の桁が違うため、別々に基準を持つ
+        self._renames = LatencyTracker()
+        self._copies = LatencyTracker()
+        self._disk = LatencyTracker()
+        self._probed = 0.0
+
+    @classmethod
+    def from_settings(cls, settings: Dict[str, Any]) -> "IOThrottle":
+        """設定の io_limits セクションから作成"""
+        adaptive = settings.get("adaptive", False)
+        return cls(
+            bytes_per_sec=settings.get("bytes_per_sec", 0),
+            ops_per_sec=settings.get("ops_per_sec", 0),
+            adaptive=adaptive,
+            latency_probe=disk_latency_probe() if adaptive else None
+        )
+
+    def before(self, nbytes: int):
+        """操作の前に予算を消費（必要なら待つ）"""
+        self.ops.consume(1)
+        if nbytes:
+            self.bytes.consume(nbytes)
+
+    def after(self, nbytes: int, elapsed: float, device: Optional[int] = None):
+        """
+        操作にかかった時間を記録し、混雑していれば待ち時間を挟む
+
+        ディスク全体の I/O 1回あたりの遅延（他のアプリの I/O も含む）を取得できる場合はそれを、
+        できない場合は移動の所要時間（コピーは 1MB あたり、名前の変更は1回あたり）を指標とし、
+        基準より大きく増えたらディスクが混雑していると判断して速度を半分にします。
+
+        Args:
+            nbytes: コピーしたバイト数（同じドライブ内の名前の変更は 0）
+            elapsed: 操作にかかった時間（秒）
+            device: 移動先のデバイス番号
+        """
+        if not self.adaptive:
+            return
+        ratio = None
+        if self.latency_probe is not None:
+            now = time.monotonic()
+            if now - self._probed >= PROBE_INTERVAL:
+                self._probed = now
+                latency = self.latency_probe(device)
+                if latency is not None:
+                    ratio = self._disk.add(latency)
+            if ratio is None and self._disk.latency is not None:
+                # 確認の間隔内や I/O がほとんどなかった間は前回の判断を保つ
+                self._pause(elapsed)
+                return
+        if ratio is None:
+            if nbytes:
+                ratio = self._copies.add(elapsed * (1024 * 1024) / max(nbytes, MIN_COPY_BYTES))
+            else:
+                ratio = self._renames.add(elapsed)
+
+        if ratio > CONGESTED_RATIO:
+            self.scale = max(MIN_SCALE, self.scale / 2)
+        elif ratio < RELAXED_RATIO:
+            self.scale = min(1.0, self.scale + RECOVERY_STEP)
+        self._pause(elapsed)
+
+    def _pause(self, elapsed: float):
+        """速度 scale で動くよう、操作時間に応じた休止を入れる"""
+        if self.scale < 1.0:
+            time.sleep(elapsed * (1 / self.scale - 1))
+
+
+# Linux の ioprio_get / ioprio_set のシステムコール番号
+_IOPRIO_SYSCALLS = {
+    "x86_64": (252, 251),
+    "aarch64": (31, 30),
+    "i686": (290, 289),
+    "i386": (290, 289),
+}
+IOPRIO_WHO_PROCESS = 1
+IOPRIO_CLASS_IDLE = 3
+IOPRIO_CLASS_SHIFT = 13
+
+# low_priority で nice 値を上げたまま戻せなかったかどうか（2回目以降の実行で重ねて上げない）
+_niced = False
+
+
+def _linux_io_priority(value: Optional[int] = None) -> Optional[int]:
+    """
+    呼び出したスレッドの Linux の I/O 優先度を取得（value を指定した場合は設定）
+
+    Returns:
+        設定前の I/O 優先度（取得できない場合は None）
+    """
+    import ctypes
+    import platform
+
+    numbers = _IOPRIO_SYSCALLS.get(platform.machine())
+    if numbers is None:
+        return None
+    get_number, set_number = numbers
+    libc = ctypes.CDLL(None, use_errno=True)
+    previous = libc.syscall(get_number, IOPRIO_WHO_PROCESS, 0)
+    if previous < 0:
+        return None
+    if value is not None and libc.syscall(set_number, IOPRIO_WHO_PROCESS, 0, value) != 0:
+        return None
+    return previous
+
+
+def _can_restore_nice(previous: int) -> bool:
+    """上げた nice 値を previous に戻す権限があるかどうか"""
+    if hasattr(os, "geteuid") and os.geteuid() == 0:
+        return True
+    try:
+        import resource
+    except ImportError:
+        return False
+    if not hasattr(resource, "RLIMIT_NICE"):
+        return False
+    # RLIMIT_NICE が r なら、nice 値を 20 - r まで下げられる
+    soft, _ = resource.getrlimit(resource.RLIMIT_NICE)
+    return soft == resource.RLIM_INFINITY or previous >= 20 - soft
+
+
+def lower_thread_priority():
+    """
+    呼び出したスレッドの CPU・I/O 優先度を下げる（元に戻さない）
+
+    Linux では nice 値も I/O 優先度もスレッドごとに設定されるため、low_priority() を呼んだスレッド以外で
+    ファイルを操作する場合は、実行の終了とともに捨てるワーカースレッドの initializer として使います。
+    """
+    if not sys.platform.startswith("linux"):
+        # Windows・macOS では low_priority() がプロセス全体に効く
+        return
+    try:
+        os.nice(10)
+    except OSError:
+        pass
+    try:
+        _linux_io_priority(IOPRIO_CLASS_IDLE << IOPRIO_CLASS_SHIFT)
+    except OSError:
+        pass
+
+
+@contextmanager
+def low_priority():
+    """
+    処理中だけ CPU・I/O 優先度を下げる
+
+    Windows ではバックグラウンド処理モードを使い、終了時に元に戻します。
+    Linux では I/O 優先度をアイドルクラスにして、終了時に元に戻します。
+    CPU 優先度は nice 値を上げて下げますが、一般ユーザー権限では元に戻せないため、
+    その場合はプロセスの終了まで下がったままになります（GUI や watch で2回目以降に重ねて下げることはない）。
+
+    Yields:
+        CPU 優先度がプロセスの終了まで下がったままになる場合は True（今回初めて下げたときのみ）
+    """
+    global _niced
+
+    if sys.platform == "win32":
+        import ctypes
+        PROCESS_MODE_BACKGROUND_BEGIN = 0x00100000
+        PROCESS_MODE_BACKGROUND_END = 0x00200000
+        kernel32 = ctypes.windll.kernel32
+        handle = kernel32.GetCurrentProcess()
+        entered = bool(kernel32.SetPriorityClass(handle, PROCESS_MODE_BACKGROUND_BEGIN))
+        try:
+            yield False
+        finally:
+            if entered:
+                kernel32.SetPriorityClass(handle, PROCESS_MODE_BACKGROUND_END)
+        return
+
+    previous_nice = None
+    lasting = False
+    if not _niced:
+        try:
+            previous_nice = os.getpriority(os.PRIO_PROCESS, 0)
+            os.nice(10)
+            if not _can_restore_nice(previous_nice):
+                _niced = lasting = True
+                previous_nice = None
+        except OSError:
+            previous_nice = None
+    previous_io = None
+    if sys.platform.startswith("linux"):
+        try:
+            previous_io = _linux_io_priority(IOPRIO_CLASS_IDLE << IOPRIO_CLASS_SHIFT)
+        except OSError:
+            previous_io = None
+    try:
+        yield lasting
+    finally:
+        if previous_io is not None:
+            try:
+                _linux_io_priority(previous_io)
+            except OSError:
+                pass
+        if previous_nice is not None:
+            try:
+                os.setpriority(os.PRIO_PROCESS, 0, previous_nice)
+            except OSError:
+                _niced = True
@@ -0,0 +1,181 @@
+"""
+PicSort - 振り分け時の画像の再圧縮（Pillow が必要）
+ルールに transcode を設定すると、振り分けた画像を PNG の可逆最適化、または WebP / AVIF への変換で
+再圧縮します。変換はプロセスプールで行うため、他のファイルの移動と並行して進みます。
+Exif・ICC プロファイル・PNG のテキスト情報・更新日時は引き継ぎ、小さくならない場合は元のまま残します。
+"""
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+# 変換の種類 → (Pillow の形式名, 拡張子)
+FORMATS = {
+    "png": ("PNG", ".png"),
+    "webp": ("WEBP", ".webp"),
+    "avif": ("AVIF", ".avif"),
+}
+
+# 既定の画質（WebP / AVIF）
+DEFAULT_QUALITY = 80
+
+# 変換結果: (変換後のパス, 変換前のサイズ, 変換後のサイズ)。小さくならず変換しなかった場合は None
+Result = Optional[Tuple[str, int, int]]
+# 変換完了時のコールバック: (変換結果 または None, エラー または None)
+DoneCallback = Callable[[Result, Optional[BaseException]], None]
+
+
+def is_available() -> bool:
+    """Pillow がインストールされているかどうか"""
+    import importlib.util
+    return importlib.util.find_spec("PIL") is not None
+
+
+def _reserve(path: str) -> str:
+    """同名ファイルがあれば番号を付けて、空のファイルを排他的に作成して名前を確保する"""
+    stem, ext = os.path.splitext(path)
+    candidate = path
+    counter = 1
+    while True:
+        try:
+            with open(candidate, "xb"):
+                return candidate
+        except FileExistsError:
+            candidate = f"{stem}_{counter}{ext}"
+            counter += 1
+
+
+def needs_transcode(path: str, fmt: str) -> bool:
+    """
+    再圧縮の対象かどうか（PNG の最適化は PNG だけ、WebP / AVIF への変換は変換先と異なる形式だけ）
+
+    既に変換先の形式になっている画像を非可逆で圧縮し直すと、振り分けのたびに画質が落ちるため対象外です。
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if fmt == "png":
+        return ext == ".png"
+    return ext != FORMATS[fmt][1]
+
+
+def transcode_file(path: str, fmt: str, quality: int = DEFAULT_QUALITY) -> Result:
+    """
+    画像を再圧縮（ワーカープロセスで実行する）
+
+    Args:
+        path: 振り分け済みの画像のパス
+        fmt: "png"（PNG の可逆最適化）/ "webp" / "avif"
+        quality: WebP / AVIF の画質（1〜100）
+
+    Returns:
+        変換結果。対象外・小さくならない場合は None（元のファイルはそのまま）
+    """
+    if not needs_transcode(path, fmt):
+        return None
+    from PIL import Image
+
+    format_name, ext = FORMATS[fmt]
+    stem = os.path.splitext(path)[0]
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        # 移動の検証に失敗して取り消された
+        return None
+
+    tmp_path = path + ".picsort-tmp"
+    with Image.open(path) as image:
+        if getattr(image, "is_animated", False):
+            return None
+        options: Dict[str, Any] = {key: image.info[key] for key in ("exif", "icc_profile") if image.info.get(key)}
+        if fmt == "png":
+            options["optimize"] = True
+            text = getattr(image, "text", None)
+            if text:
+                from PIL.PngImagePlugin import PngInfo
+                info = PngInfo()
+                for key, value in text.items():
+                    info.add_text(key, value)
+                options["pnginfo"] = info
+        else:
+            options["quality"] = quality
+            if image.mode not in ("RGB", "RGBA"):
+                alpha = "A" in image.getbands() or "transparency" in image.info
+                image = image.convert("RGBA" if alpha else "RGB")
+        try:
+            image.save(tmp_path, format=format_name, **options)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    new_size = os.path.getsize(tmp_path)
+    if new_size >= st.st_size:
+        os.remove(tmp_path)
+        return None
+    os.utime(tmp_path, ns=(st.st_atime_ns, st.st_mtime_ns))
+    target = path if fmt == "png" else _reserve(stem + ext)
+    os.replace(tmp_path, target)
+    if target != path:
+        os.remove(path)
+    return target, st.st_size, new_size
+
+
+class Transcoder:
+    """画像の再圧縮をプロセスプールで並行して行う（完了した結果は呼び出し元のスレッドで処理する）"""
+
+    def __init__(self, max_workers: int = 2, max_pending: Optional[int] = None):
+        """
+        初期化
+
+        Args:
+            max_workers: 変換に使うプロセス数
+            max_pending: 変換待ちにできるファイル数の上限（超えた場合は古いものの完了を待つ）
+        """
+        self.max_workers = max(1, max_workers)
+        self.max_pending = max_pending or self.max_workers * 4
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pending: Deque[Tuple[object, DoneCallback]] = deque()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def submit(self, path: str, fmt: str, quality: int, on_done: DoneCallback):
+        """変換を予約（前に予約した変換の結果を先に処理する）"""
+        if self._executor is None:
+            # 変換するファイルがない実行ではプロセスを起動しない
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        self._pending.append((self._executor.submit(transcode_file, path, fmt, quality), on_done))
+        self.collect(block=False)
+
+    def collect(self, block: bool = False):
+        """
+        完了した変換の結果を処理
+
+        Args:
+            block: True ならすべての変換の完了を待つ（False でも上限を超えた分は待つ）
+        """
+        while self._pending:
+            future, on_done = self._pending[0]
+            if not (block or future.done() or len(self._pending) > self.max_pending):
+                return
+            self._pending.popleft()
+            try:
+                result = future.result()
+            except Exception as e:
+                on_done(None, e)
+            else:
+                on_done(result, None)
+
+    def wait(self):
+        """すべての変換の完了を待つ"""
+        self.collect(block=True)
+
+    def close(self):
+        """すべての変換の完了を待って終了"""
+        self.wait()
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
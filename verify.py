@@ -0,0 +1,170 @@
+"""
+PicSort - 別ドライブへの移動の検証
+コピー中に元ファイルのハッシュを計算し（元ファイルの読み込みは1回だけ）、
+コピー先をディスクから読み直したハッシュと一致した場合のみ元ファイルを削除します。
+読み直しは別スレッドで行い、次のファイルのコピーと並行して進めます。
+"""
+
+import os
+import shutil
+import hashlib
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Deque, Optional, Tuple
+
+from hashing import _get_buffer
+
+# 検証待ちにできるファイル数の上限（超えたら古いものの完了を待つ）
+DEFAULT_MAX_PENDING = 4
+
+
+class VerifyError(OSError):
+    """コピー先の内容が元ファイルと一致しない"""
+
+
+class SourceLockedError(OSError):
+    """検証には成功したが、元ファイルを削除できない（他のアプリが使用中など）"""
+
+
+def copy_with_digest(source_path: str, destination_path: str) -> str:
+    """
+    ファイルをコピーしながら元ファイルのハッシュを計算
+
+    コピー先はディスクに書き出してから（fsync）戻ります。
+
+    Returns:
+        元ファイルの16進数のダイジェスト
+    """
+    h = hashlib.blake2b()
+    buf = _get_buffer()
+    with open(source_path, "rb") as src, open(destination_path, "wb") as dst:
+        while True:
+            n = src.readinto(buf)
+            if not n:
+                break
+            chunk = buf[:n]
+            h.update(chunk)
+            dst.write(chunk)
+        dst.flush()
+        os.fsync(dst.fileno())
+    shutil.copystat(source_path, destination_path)
+    return h.hexdigest()
+
+
+def read_back_digest(path: str) -> str:
+    """
+    ファイルをディスクから読み直してハッシュを計算
+
+    Linux ではページキャッシュを破棄してから読むため、書き込んだデータではなく
+    ディスク上の内容を検証します。
+    """
+    h = hashlib.blake2b()
+    buf = _get_buffer()
+    with open(path, "rb") as f:
+        if hasattr(os, "posix_fadvise"):
+            try:
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+            except OSError:
+                pass
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            h.update(buf[:n])
+    return h.hexdigest()
+
+
+def _verify_and_remove(source_path: str, destination_path: str, digest: str):
+    """
+    コピー先を検証し、一致すれば元ファイルを削除
+
+    一致しなければコピー先を削除して VerifyError、元ファイルを削除できなければ
+    同じファイルが2つ残らないようコピー先を削除して SourceLockedError を送出します。
+    """
+    if read_back_digest(destination_path) != digest:
+        os.remove(destination_path)
+        raise VerifyError(f"コピー先の内容が一致しません: {destination_path}")
+    try:
+        os.remove(source_path)
+    except OSError as e:
+        os.remove(destination_path)
+        raise SourceLockedError(e.errno, f"元ファイルを削除できません: {e.strerror or e}", source_path) from e
+
+
+# 検証失敗時のコールバック: (元ファイル, コピー先, エラー)
+FailureCallback = Callable[[str, str, BaseException], None]
+
+
+class VerifiedMover:
+    """検証付きの移動（コピー → 読み直して検証 → 元ファイルを削除）"""
+
+    def __init__(self, max_pending: int = DEFAULT_MAX_PENDING):
+        """
+        初期化
+
+        Args:
+            max_pending: 検証待ちにできるファイル数の上限
+        """
+        self.max_pending = max(1, max_pending)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="picsort-verify")
+        self._pending: Deque[Tuple[object, str, str, Optional[FailureCallback]]] = deque()
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def move(self, source_path: str, destination_path: str, on_failure: Optional[FailureCallback] = None):
+        """
+        ファイルをコピーし、検証と元ファイルの削除を予約
+
+        コピーは呼び出し元のスレッドで行い、検証は前のファイルの検証と並行して進みます。
+        検証に失敗した場合は元ファイルを残し、後で on_failure を呼び出し元のスレッドで呼びます。
+
+        Raises:
+            OSError: コピーに失敗した場合（コピー先は削除される）
+        """
+        try:
+            digest = copy_with_digest(source_path, destination_path)
+        except BaseException:
+            if os.path.exists(destination_path):
+                os.remove(destination_path)
+            raise
+        # 前のファイルの結果を先に処理する（このファイルの失敗は呼び出し元が移動を記録した後で通知する）
+        self._collect(block=False)
+        future = self._executor.submit(_verify_and_remove, source_path, destination_path, digest)
+        with self._lock:
+            self._pending.append((future, source_path, destination_path, on_failure))
+
+    def _collect(self, block: bool):
+        """
+        完了した検証の結果を処理
+
+        Args:
+            block: True ならすべての検証の完了を待つ（False でも上限を超えた分は待つ）
+        """
+        while True:
+            with self._lock:
+                if not self._pending:
+                    return
+                future, source_path, destination_path, on_failure = self._pending[0]
+                if not (block or future.done() or len(self._pending) > self.max_pending):
+                    return
+                self._pending.popleft()
+            try:
+                future.result()
+            except BaseException as e:
+                if on_failure is not None:
+                    on_failure(source_path, destination_path, e)
+
+    def wait(self):
+        """すべての検証の完了を待つ"""
+        self._collect(block=True)
+
+    def close(self):
+        """すべての検証の完了を待って終了"""
+        self.wait()
+        self._executor.shutdown()